@@ -0,0 +1,56 @@
+"""
+Búsqueda del login antes y después de las migraciones de índices:
+
+    python benchmarks/bench_indices.py --usuarios 200000
+
+Siembra la tabla solo con la migración 1 (sin índice en email), mide
+`buscar_credenciales` y muestra el plan (SCAN = recorre la tabla); luego
+aplica el resto de migraciones y repite (SEARCH ... USING INDEX
+UX_Usuarios_email: en SQLite el índice cubriente de la migración 3 no
+existe, ver allí por qué).
+"""
+import argparse
+import random
+
+from comun import base_temporal, email_sintetico, formatear, medir, percentiles
+
+import conexion_sql
+from conexion_sql import buscar_credenciales
+from migraciones import migrar
+
+CONSULTA_LOGIN = "SELECT id, Contraseña FROM Usuarios WHERE email = ? LIMIT 1"
+
+
+def plan(email):
+    with conexion_sql.usar_conexion() as (conn, _):
+        filas = conn.execute("EXPLAIN QUERY PLAN " + CONSULTA_LOGIN, (email,)).fetchall()
+    return "; ".join(fila[-1] for fila in filas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    base_temporal(args.usuarios, version=1)
+    azar = random.Random(2025)
+
+    def buscar():
+        buscar_credenciales(email_sintetico(azar.randrange(args.usuarios)))
+
+    print(f"{args.usuarios} usuarios\n")
+    print(f"plan sin índices: {plan(email_sintetico(0))}")
+    antes = percentiles(medir(buscar, args.repeticiones))
+    print(formatear("login sin índices", antes))
+
+    migrar(informar=lambda texto: print(f"  {texto}"))
+    print(f"plan con índices: {plan(email_sintetico(0))}")
+    despues = percentiles(medir(buscar, args.repeticiones))
+    print(formatear("login con índices", despues))
+    print(f"\nmejora p50: x{antes['p50'] / despues['p50']:.0f}")
+    conexion_sql.cerrar_pool()
+
+
+if __name__ == "__main__":
+    main()
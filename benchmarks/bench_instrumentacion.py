@@ -0,0 +1,67 @@
+"""
+Coste de la instrumentación de consultas:
+
+    python benchmarks/bench_instrumentacion.py --consultas 50000
+
+Ejecuta la búsqueda del login contra SQLite con la conexión tal cual y
+con ConexionInstrumentada, y compara el tiempo por consulta.
+"""
+import argparse
+import random
+import time
+
+from comun import base_temporal, email_sintetico
+
+import conexion_sql
+from instrumentacion import ConexionInstrumentada, Instrumentacion
+
+CONSULTA = "SELECT id, Contraseña FROM Usuarios WHERE email = ? LIMIT 1"
+
+
+def por_consulta(conn, emails) -> float:
+    t0 = time.perf_counter()
+    for email in emails:
+        cursor = conn.cursor()
+        cursor.execute(CONSULTA, (email,))
+        cursor.fetchone()
+        cursor.close()
+    return (time.perf_counter() - t0) / len(emails)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=10_000)
+    parser.add_argument("--consultas", type=int, default=50_000)
+    parser.add_argument("--rondas", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    base_temporal(args.usuarios)
+    backend = conexion_sql.obtener_backend()
+    azar = random.Random(2025)
+    emails = [email_sintetico(azar.randrange(args.usuarios)) for _ in range(args.consultas)]
+
+    crudo = backend.conectar()
+    registro = Instrumentacion()
+    medido = ConexionInstrumentada(backend.conectar(), registro)
+    por_consulta(crudo, emails[:1000])  # calentar caché de páginas
+    por_consulta(medido, emails[:1000])
+
+    # Se alternan rondas y se queda el mejor tiempo de cada uno para quitar ruido
+    sin, con = [], []
+    for _ in range(args.rondas):
+        sin.append(por_consulta(crudo, emails))
+        con.append(por_consulta(medido, emails))
+    sin, con = min(sin), min(con)
+
+    print(f"{args.consultas} consultas x {args.rondas} rondas\n")
+    print(f"sin instrumentar: {sin * 1e6:8.2f} µs/consulta")
+    print(f"instrumentado:    {con * 1e6:8.2f} µs/consulta")
+    print(f"sobrecoste:       {(con - sin) * 1e6:8.2f} µs/consulta ({(con / sin - 1) * 100:.1f} %)")
+    print("\nInstantánea:")
+    for clave, stats in registro.instantanea().items():
+        print(f"  {clave}\n    {stats}")
+    conexion_sql.cerrar_pool()
+
+
+if __name__ == "__main__":
+    main()
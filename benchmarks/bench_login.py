@@ -0,0 +1,49 @@
+"""
+Latencia del login (autenticar) sobre SQLite:
+
+    python benchmarks/bench_login.py --usuarios 100000 --repeticiones 50
+
+Separa la búsqueda en base de datos del verify de Argon2 para ver qué
+parte del tiempo es de cada uno.
+"""
+import argparse
+import random
+
+from comun import CONTRASEÑA, base_temporal, email_sintetico, formatear, medir, percentiles
+
+import conexion_sql
+from conexion_sql import EstadoAutenticacion, autenticar, buscar_credenciales
+from limitador import configurar_limitador
+from security import precalentar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=10_000)
+    parser.add_argument("--repeticiones", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    base_temporal(args.usuarios)
+    configurar_limitador(None)  # se mide el login, no el frenado de intentos
+    precalentar()
+    azar = random.Random(2025)
+
+    def existente():
+        return email_sintetico(azar.randrange(args.usuarios))
+
+    casos = {
+        "busqueda de credenciales": lambda: buscar_credenciales(existente()),
+        "login correcto": lambda: autenticar(existente(), CONTRASEÑA),
+        "contraseña incorrecta": lambda: autenticar(existente(), "Incorrecta999"),
+        "usuario desconocido": lambda: autenticar("nadie@bench.example", CONTRASEÑA),
+    }
+    assert autenticar(existente(), CONTRASEÑA).estado is EstadoAutenticacion.EXITO
+
+    print(f"{args.usuarios} usuarios, {args.repeticiones} repeticiones por caso\n")
+    for nombre, funcion in casos.items():
+        print(formatear(nombre, percentiles(medir(funcion, args.repeticiones))))
+    conexion_sql.cerrar_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Utilidades compartidas por los benchmarks (SQLite temporal, percentiles)."""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "src"))
+
+import conexion_sql  # noqa: E402
+from backends import SQLiteBackend  # noqa: E402
+from security import crear_hash_seguro  # noqa: E402
+
+CONTRASEÑA = "Secreto123"
+
+
+def email_sintetico(i: int) -> str:
+    return f"usuario{i:07d}@bench.example"
+
+
+def base_temporal(n_usuarios: int, contraseña: str = CONTRASEÑA, directorio=None, version=None):
+    """
+    Crea una base SQLite en un archivo temporal con `n_usuarios` usuarios y
+    la deja configurada como backend del proceso. Todos comparten el mismo
+    hash para que sembrar millones de filas no cueste millones de Argon2.
+    `version` deja el esquema en esa migración (None = la última).
+    Devuelve la ruta del archivo.
+    """
+    directorio = directorio or tempfile.mkdtemp(prefix="bench_hackathon_")
+    ruta = os.path.join(directorio, "bench.db")
+    conexion_sql.configurar_backend(SQLiteBackend(ruta))
+    conexion_sql.crear_esquema(hasta=version)
+
+    hash_comun = crear_hash_seguro(contraseña)
+    inicio = datetime(2025, 1, 1)
+    with conexion_sql.usar_conexion() as (conn, _):
+        lote = 10_000
+        for desde in range(0, n_usuarios, lote):
+            conn.executemany(
+                "INSERT INTO Usuarios(nombre, email, Contraseña, fecha_registro) VALUES (?, ?, ?, ?)",
+                [(f"Usuario {i}", email_sintetico(i), hash_comun, inicio + timedelta(seconds=i))
+                 for i in range(desde, min(desde + lote, n_usuarios))],
+            )
+            conn.commit()
+    return ruta
+
+
+def medir(funcion, repeticiones: int) -> list:
+    """Latencias (segundos) de llamar `funcion()` `repeticiones` veces."""
+    muestras = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        muestras.append(time.perf_counter() - t0)
+    return muestras
+
+
+def percentiles(muestras) -> dict:
+    ordenadas = sorted(muestras)
+    if not ordenadas:
+        return {"n": 0}
+
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+    return {
+        "n": len(ordenadas),
+        "media": sum(ordenadas) / len(ordenadas),
+        "p50": p(0.50),
+        "p95": p(0.95),
+        "p99": p(0.99),
+        "max": ordenadas[-1],
+    }
+
+
+def formatear(nombre: str, stats: dict) -> str:
+    if not stats.get("n"):
+        return f"{nombre:<32} sin muestras"
+    return (f"{nombre:<32} n={stats['n']:<6} p50={stats['p50'] * 1e3:8.3f} ms  "
+            f"p95={stats['p95'] * 1e3:8.3f} ms  p99={stats['p99'] * 1e3:8.3f} ms")
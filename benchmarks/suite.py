@@ -0,0 +1,164 @@
+"""
+Suite de benchmarks reproducible sobre SQLite:
+
+    python benchmarks/suite.py                        # mide y compara con la baseline
+    python benchmarks/suite.py --guardar-baseline     # mide y guarda la baseline
+    python benchmarks/suite.py --concurrencia 1,4,16 --salida resultados.json
+
+Siembra N usuarios sintéticos y mide latencia (p50/p95/p99) y rendimiento
+(operaciones/s) de register, el login (autenticar), mostrar_tabla y
+crear_hash_seguro/verificar_contraseña, con varios niveles de concurrencia
+(hilos). Los resultados van a JSON; si existe una baseline, se compara
+caso a caso y el proceso sale con código 1 si algo empeora más que
+`--tolerancia`. La baseline es propia de cada máquina: se regenera en la
+máquina donde se vaya a comparar.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from comun import CONTRASEÑA, RAIZ, base_temporal, email_sintetico, percentiles
+
+import conexion_sql
+from conexion_sql import EstadoAutenticacion, autenticar, mostrar_tabla, register
+from limitador import configurar_limitador
+from security import cargar_parametros_argon2, crear_hash_seguro, precalentar, verificar_contraseña
+
+BASELINE = os.path.join(RAIZ, "benchmarks", "baseline.json")
+
+
+def ejecutar(funcion, operaciones: int, concurrencia: int) -> dict:
+    """Lanza `operaciones` llamadas repartidas entre `concurrencia` hilos."""
+    def medida(i):
+        t0 = time.perf_counter()
+        funcion(i)
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        inicio = time.perf_counter()
+        muestras = list(ejecutor.map(medida, range(operaciones)))
+        total = time.perf_counter() - inicio
+    stats = percentiles(muestras)
+    stats["ops_s"] = operaciones / total
+    return stats
+
+
+def casos(n_usuarios: int, limite_tabla: int) -> dict:
+    """nombre -> funcion(i). Cada llamada es una operación independiente."""
+    hash_referencia = crear_hash_seguro(CONTRASEÑA)
+    nuevos = itertools.count(n_usuarios)
+
+    def registrar(_):
+        email = email_sintetico(next(nuevos))  # next() sobre count es atómico con el GIL
+        if register("Usuarios", None, "Bench", email, CONTRASEÑA) is not True:
+            raise RuntimeError(f"register falló para {email}")
+
+    def login(i):
+        email = email_sintetico((i * 7919) % n_usuarios)
+        if autenticar(email, CONTRASEÑA).estado is not EstadoAutenticacion.EXITO:
+            raise RuntimeError(f"login falló para {email}")
+
+    return {
+        "register": registrar,
+        "login": login,
+        "mostrar_tabla": lambda _: mostrar_tabla("Usuarios", limite=limite_tabla),
+        "crear_hash_seguro": lambda _: crear_hash_seguro(CONTRASEÑA),
+        "verificar_contraseña": lambda _: verificar_contraseña(hash_referencia, CONTRASEÑA),
+    }
+
+
+def comparar(actual: dict, baseline: dict, tolerancia: float) -> list:
+    """Regresiones como textos; vacío si todo está dentro de la tolerancia."""
+    regresiones = []
+    for clave, stats in actual["resultados"].items():
+        base = baseline["resultados"].get(clave)
+        if base is None:
+            continue
+        if stats["p50"] > base["p50"] * (1 + tolerancia):
+            regresiones.append(f"{clave}: p50 {base['p50'] * 1e3:.3f} -> {stats['p50'] * 1e3:.3f} ms")
+        if stats["ops_s"] < base["ops_s"] / (1 + tolerancia):
+            regresiones.append(f"{clave}: {base['ops_s']:.1f} -> {stats['ops_s']:.1f} ops/s")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=10_000)
+    parser.add_argument("--operaciones", type=int, default=24, help="operaciones por caso y nivel")
+    parser.add_argument("--concurrencia", default="1,4", help="niveles separados por comas")
+    parser.add_argument("--limite-tabla", type=int, default=1000, help="filas por mostrar_tabla")
+    parser.add_argument("--casos", help="solo estos casos, separados por comas")
+    parser.add_argument("--salida", help="JSON con los resultados")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--guardar-baseline", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="empeoramiento admitido (0.25 = 25 %%)")
+    args = parser.parse_args(argv)
+    niveles = [int(n) for n in args.concurrencia.split(",")]
+
+    base_temporal(args.usuarios)
+    configurar_limitador(None)  # se mide el login, no el frenado de intentos
+    precalentar()
+    todos = casos(args.usuarios, args.limite_tabla)
+    elegidos = args.casos.split(",") if args.casos else list(todos)
+    conexion_sql.obtener_pool(max_tamaño=max(niveles))
+
+    resultados = {}
+    print(f"{args.usuarios} usuarios, {args.operaciones} operaciones por caso\n")
+    for nombre in elegidos:
+        for concurrencia in niveles:
+            # register y mostrar_tabla imprimen; se silencian mientras se miden
+            with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                stats = ejecutar(todos[nombre], args.operaciones, concurrencia)
+            resultados[f"{nombre}@{concurrencia}"] = stats
+            print(f"{nombre:<22} c={concurrencia:<3} {stats['ops_s']:9.1f} ops/s  "
+                  f"p50={stats['p50'] * 1e3:8.3f} ms  p95={stats['p95'] * 1e3:8.3f} ms  "
+                  f"p99={stats['p99'] * 1e3:8.3f} ms")
+    conexion_sql.cerrar_pool()
+
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "maquina": {
+            "python": platform.python_version(),
+            "sistema": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "argon2": cargar_parametros_argon2(),
+        "usuarios": args.usuarios,
+        "operaciones": args.operaciones,
+        "resultados": resultados,
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+    if args.guardar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline guardada en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nSin baseline con la que comparar (usa --guardar-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("argon2") != informe["argon2"]:
+        print("\nAviso: la baseline usa otros parámetros de Argon2; los tiempos de hash no son comparables")
+    regresiones = comparar(informe, baseline, args.tolerancia)
+    if regresiones:
+        print(f"\nRegresiones (> {args.tolerancia:.0%}) respecto a la baseline del {baseline['fecha']}:")
+        for texto in regresiones:
+            print(f"  {texto}")
+        return 1
+    print(f"\nSin regresiones respecto a la baseline del {baseline['fecha']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Acceso a datos para código asyncio.
+
+Las llamadas a la base de datos corren en un pool de hilos propio, del
+mismo tamaño que el pool de conexiones (más hilos solo esperarían
+conexión), y Argon2 corre en el EjecutorHash sin ocupar ninguno de esos
+hilos: un solo event loop puede tener miles de logins en vuelo mientras
+la base de datos ve como mucho `max_tamaño` consultas a la vez.
+
+Todas las operaciones aceptan `timeout` (segundos). Si se cancelan o
+vencen con la consulta ya en marcha, se interrumpe en el motor y la
+conexión se descarta en vez de volver al pool.
+
+    acceso = obtener_acceso_async()
+    resultado = await acceso.autenticar(email, contraseña, timeout=2)
+    async with acceso.conectar() as conn:
+        filas = await conn.consultar("SELECT id FROM Usuarios WHERE email = ?", (email,))
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import conexion_sql
+from conexion_sql import EstadoAutenticacion, ResultadoAutenticacion
+from limitador import obtener_limitador
+from security import hash_ficticio, normalizar_email, obtener_ejecutor, validar_email
+
+
+class _ConexionVigilada:
+    """Conexión que recuerda sus cursores para poder cancelarlos desde el loop."""
+
+    __slots__ = ("_conn", "backend", "cursores")
+
+    def __init__(self, conn, backend):
+        self._conn = conn
+        self.backend = backend
+        self.cursores = []
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        self.cursores.append(cursor)
+        return cursor
+
+
+class _Operacion:
+    """Lo que hace un hilo por cuenta de una corrutina, para poder interrumpirlo."""
+
+    __slots__ = ("conn", "cancelada")
+
+    def __init__(self):
+        self.conn = None
+        self.cancelada = False
+
+    def interrumpir(self):
+        self.cancelada = True
+        conn = self.conn
+        if conn is not None:
+            try:
+                conn.backend.interrumpir(conn._conn, list(conn.cursores))
+            except Exception:
+                pass  # ya terminó o el driver no sabe cancelar; se descarta igual
+
+
+class ConexionAsync:
+    """Conexión del pool prestada a una corrutina; cada llamada va a un hilo."""
+
+    def __init__(self, acceso, conn):
+        self._acceso = acceso
+        self._conn = conn
+        self.backend = conn.backend
+        self.interrumpida = False
+
+    async def _llamar(self, funcion, *args, timeout=None):
+        try:
+            return await self._acceso._en_hilo(self._con_esta, funcion, *args, timeout=timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self.interrumpida = True
+            raise
+
+    def _con_esta(self, operacion, funcion, *args):
+        operacion.conn = self._conn
+        try:
+            return funcion(self._conn, *args)
+        finally:
+            operacion.conn = None
+
+    async def consultar(self, sql, parametros=(), timeout=None) -> list:
+        return await self._llamar(_consultar, sql, parametros, timeout=timeout)
+
+    async def ejecutar(self, sql, parametros=(), timeout=None) -> int:
+        """Ejecuta sin commit; devuelve las filas afectadas."""
+        return await self._llamar(_ejecutar, sql, parametros, timeout=timeout)
+
+    async def commit(self):
+        await self._llamar(lambda conn: conn.commit())
+
+    async def rollback(self):
+        await self._llamar(lambda conn: conn.rollback())
+
+
+def _consultar(conn, sql, parametros):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, parametros)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _ejecutar(conn, sql, parametros):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, parametros)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+async def _credenciales(email, pedir):
+    """
+    Como conexion_sql._buscar_credenciales pero desde el loop: un acierto
+    de caché no ocupa hilo ni conexión, y `pedir()` (que devuelve un
+    Future) solo se llama en un fallo.
+    """
+    cache = conexion_sql._cache_usuarios
+    futuro = cache.futuro(email, pedir) if cache is not None else pedir()
+    credenciales = await asyncio.shield(asyncio.wrap_future(futuro))
+    cache = conexion_sql._cache_negativo
+    if credenciales is None and cache is not None:
+        cache.agregar(email)
+    return credenciales
+
+
+class AccesoAsync:
+    """API asyncio sobre un PoolConexiones (por defecto el del proceso)."""
+
+    def __init__(self, pool=None, hilos=None):
+        self.pool = pool or conexion_sql.obtener_pool()
+        self.backend = self.pool.backend or conexion_sql.obtener_backend()
+        self.hilos = hilos or self.pool.max_tamaño
+        self._hilos = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="sql-async")
+
+    async def _en_hilo(self, funcion, *args, timeout=None):
+        operacion = _Operacion()
+        futuro = asyncio.get_running_loop().run_in_executor(self._hilos, funcion, operacion, *args)
+        try:
+            return await asyncio.wait_for(futuro, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            operacion.interrumpir()
+            raise
+
+    def _prestada(self, operacion, funcion, *args):
+        """Presta una conexión del pool solo mientras corre `funcion(conn, *args)`."""
+        conn = _ConexionVigilada(self.pool.obtener(), self.backend)
+        operacion.conn = conn
+        try:
+            if operacion.cancelada:
+                raise asyncio.CancelledError()
+            return funcion(conn, *args)
+        finally:
+            operacion.conn = None
+            self.pool.devolver(conn._conn, descartar=operacion.cancelada)
+
+    def _tomar(self, operacion, timeout):
+        conn = self.pool.obtener(timeout)
+        if operacion.cancelada:  # nadie la va a recoger
+            self.pool.devolver(conn)
+            raise asyncio.CancelledError()
+        return conn
+
+    @asynccontextmanager
+    async def conectar(self, timeout=None):
+        """Presta una conexión para varias llamadas seguidas (p.ej. una transacción)."""
+        conn = await self._en_hilo(self._tomar, timeout, timeout=timeout)
+        conexion = ConexionAsync(self, _ConexionVigilada(conn, self.backend))
+        try:
+            yield conexion
+        finally:
+            self.pool.devolver(conn, descartar=conexion.interrumpida)
+
+    async def consultar(self, sql, parametros=(), timeout=None) -> list:
+        return await self._en_hilo(self._prestada, _consultar, sql, parametros, timeout=timeout)
+
+    async def ejecutar(self, sql, parametros=(), timeout=None) -> int:
+        """Ejecuta y hace commit; devuelve las filas afectadas."""
+        def con_commit(conn):
+            filas = _ejecutar(conn, sql, parametros)
+            conn.commit()
+            return filas
+        return await self._en_hilo(self._prestada, con_commit, timeout=timeout)
+
+    async def register(self, nombre_tabla, nombre, email, contraseña, timeout=None) -> bool:
+        """
+        Como conexion_sql.register pero sin imprimir: los errores se lanzan.
+        El hash se calcula antes de pedir conexión.
+        """
+        return await asyncio.wait_for(self._register(nombre_tabla, nombre, email, contraseña), timeout)
+
+    async def _register(self, nombre_tabla, nombre, email, contraseña):
+        email = normalizar_email(email)
+        if not validar_email(email):
+            raise ValueError(f"Email inválido: {email!r}")
+        hash_nuevo = await obtener_ejecutor().hash_async(contraseña)
+
+        def insertar(conn):
+            backend = conn.backend
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"INSERT INTO {backend.citar(nombre_tabla)}(nombre,email,contraseña,fecha_registro) "
+                    f"VALUES ({backend.marcadores(4)})",
+                    (nombre, email, hash_nuevo, datetime.now()),
+                )
+                conn.commit()
+            finally:
+                cursor.close()
+            conexion_sql._usuario_registrado(email)
+            return True
+        return await self._en_hilo(self._prestada, insertar)
+
+    async def autenticar(self, email, contraseña, cliente=None, timeout=None) -> ResultadoAutenticacion:
+        """Como conexion_sql.autenticar; `timeout` cubre búsqueda y verify."""
+        return await asyncio.wait_for(self._autenticar(email, contraseña, cliente), timeout)
+
+    async def _autenticar(self, email, contraseña, cliente):
+        email = normalizar_email(email)
+        limitador = obtener_limitador()
+        if limitador is not None:
+            espera = limitador.permitir(email, cliente)
+            if espera:
+                return ResultadoAutenticacion(EstadoAutenticacion.BLOQUEADO, reintentar_en=espera)
+
+        credenciales = None
+        if not conexion_sql._en_cache_negativo(email):
+            credenciales = await _credenciales(email, self._pedir_credenciales(email))
+        hash_guardado = credenciales[1] if credenciales else hash_ficticio()
+        valida = await obtener_ejecutor().verificar_async(hash_guardado, contraseña)
+        resultado = conexion_sql._resultado(email, contraseña, credenciales, valida, self.pool)
+
+        if limitador is not None:
+            if resultado.ok:
+                limitador.registrar_exito(email, cliente)
+            else:
+                limitador.registrar_fallo(email, cliente)
+        return resultado
+
+    def _pedir_credenciales(self, email):
+        """Cómo buscar `email` si no está en caché: por lotes o con una conexión prestada."""
+        cargador = conexion_sql._cargador_para(self.pool)
+        if cargador is not None:
+            return lambda: cargador.cargar(email)
+        # La comparten todos los que esperan este email: no se interrumpe si uno se cancela
+        return lambda: self._hilos.submit(self._prestada, _Operacion(),
+                                          lambda conn: conexion_sql.buscar_credenciales(email, conn))
+
+    def cerrar(self, esperar=True):
+        self._hilos.shutdown(wait=esperar)
+
+
+_acceso = None
+_acceso_lock = threading.Lock()
+
+
+def obtener_acceso_async(**opciones) -> AccesoAsync:
+    """AccesoAsync sobre el pool del proceso; `opciones` solo cuentan la primera vez."""
+    global _acceso
+    pool = conexion_sql.obtener_pool()
+    with _acceso_lock:
+        if _acceso is None or _acceso.pool is not pool:
+            if _acceso is not None:
+                _acceso.cerrar(esperar=False)  # el pool anterior ya se cerró
+            _acceso = AccesoAsync(pool, **opciones)
+        return _acceso
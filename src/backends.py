@@ -0,0 +1,246 @@
+import itertools
+import os
+import sqlite3
+from datetime import datetime
+
+CADENA_SQL_SERVER = (
+    "DRIVER={ODBC Driver 17 for SQL Server};"
+    "SERVER=localhost;"
+    "DATABASE=Hackathon2025;"
+    "Trusted_Connection=yes;"
+)
+
+# Estado final de base_de_datos/consulta hackatthon.sql. Lo usa la
+# migración 1 (migraciones.py): no cambiar, cualquier cambio va en una
+# migración nueva.
+DDL_USUARIOS_SQLSERVER = """
+IF OBJECT_ID(N'dbo.Usuarios', N'U') IS NULL
+CREATE TABLE dbo.Usuarios (
+    id INT IDENTITY(1,1) NOT NULL PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL,
+    Apellidos VARCHAR(50) NULL,
+    email VARCHAR(100) NOT NULL,
+    fecha_registro DATETIME NOT NULL DEFAULT GETDATE(),
+    Contraseña VARCHAR(100) NOT NULL DEFAULT 'Sin telefono',
+    hora_registro DATETIME2 NOT NULL DEFAULT SYSDATETIME()
+)
+"""
+
+DDL_USUARIOS_SQLITE = """
+CREATE TABLE IF NOT EXISTS Usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    Apellidos VARCHAR(50) NULL,
+    email VARCHAR(100) NOT NULL,
+    fecha_registro DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    Contraseña VARCHAR(100) NOT NULL DEFAULT 'Sin telefono',
+    hora_registro DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+)
+"""
+
+# sqlite3 ya no trae adaptador de datetime por defecto (deprecado en 3.12)
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+
+
+class Backend:
+    """
+    Lo que cambia de un motor a otro: cómo conectar, el estilo de
+    parámetros y el dialecto SQL (DDL, citado de nombres, TOP/LIMIT).
+    """
+
+    nombre = "generico"
+    paramstyle = "qmark"
+    sql_ping = "SELECT 1"
+
+    def conectar(self):
+        raise NotImplementedError
+
+    def marcadores(self, n: int) -> str:
+        """'?, ?, ?' para n parámetros."""
+        return ", ".join(["?"] * n)
+
+    def citar(self, identificador: str) -> str:
+        """Cita un nombre de tabla/columna; rechaza cualquier cosa rara."""
+        partes = identificador.split(".")
+        for parte in partes:
+            if not parte.isidentifier():
+                raise ValueError(f"Identificador SQL inválido: {identificador!r}")
+        return ".".join(self._citar(parte) for parte in partes)
+
+    def _citar(self, nombre: str) -> str:
+        return f'"{nombre}"'
+
+    def select(self, columnas, tabla, where=None, orden=None, limite=None) -> str:
+        """Arma un SELECT con el límite de filas propio del dialecto."""
+        sql = f"SELECT {columnas} FROM {tabla}"
+        if where:
+            sql += f" WHERE {where}"
+        if orden:
+            sql += f" ORDER BY {orden}"
+        if limite is not None:
+            sql += f" LIMIT {int(limite)}"
+        return sql
+
+    def preparar_cursor_masivo(self, cursor):
+        """Ajustes del driver para executemany con muchos parámetros."""
+
+    def interrumpir(self, conn, cursores=()):
+        """
+        Aborta lo que esté ejecutando `conn` (se llama desde otro hilo).
+        Con ODBC se cancela cursor a cursor.
+        """
+        for cursor in cursores:
+            cancelar = getattr(cursor, "cancel", None)
+            if cancelar is not None:
+                cancelar()
+
+    def ddl_usuarios(self) -> list:
+        raise NotImplementedError
+
+    def columnas_tabla(self, conn, tabla: str) -> list:
+        """[(nombre, tipo, nulable), ...] leído del catálogo."""
+        raise NotImplementedError
+
+    def conteo_y_tamaño(self, conn, tabla: str) -> tuple:
+        """(filas, bytes) sin recorrer la tabla desde el cliente; bytes puede ser None."""
+        raise NotImplementedError
+
+    def crear_esquema(self, conn):
+        cursor = conn.cursor()
+        for sentencia in self.ddl_usuarios():
+            cursor.execute(sentencia)
+        conn.commit()
+
+
+class SQLServerBackend(Backend):
+    nombre = "sqlserver"
+
+    def __init__(self, cadena_conexion: str = CADENA_SQL_SERVER):
+        self.cadena_conexion = cadena_conexion
+
+    def conectar(self):
+        import pyodbc  # solo hace falta con SQL Server
+        return pyodbc.connect(self.cadena_conexion)
+
+    def _citar(self, nombre: str) -> str:
+        return f"[{nombre}]"
+
+    def preparar_cursor_masivo(self, cursor):
+        # Manda todos los parámetros en un solo paquete en vez de fila a fila
+        cursor.fast_executemany = True
+
+    def select(self, columnas, tabla, where=None, orden=None, limite=None) -> str:
+        top = f"TOP ({int(limite)}) " if limite is not None else ""
+        sql = f"SELECT {top}{columnas} FROM {tabla}"
+        if where:
+            sql += f" WHERE {where}"
+        if orden:
+            sql += f" ORDER BY {orden}"
+        return sql
+
+    def ddl_usuarios(self) -> list:
+        return [DDL_USUARIOS_SQLSERVER]
+
+    def columnas_tabla(self, conn, tabla: str) -> list:
+        self.citar(tabla)  # valida el nombre
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_NAME = ? ORDER BY ORDINAL_POSITION",
+            (tabla.split(".")[-1],),
+        )
+        return [(nombre, tipo, nulable == "YES") for nombre, tipo, nulable in cursor.fetchall()]
+
+    def conteo_y_tamaño(self, conn, tabla: str) -> tuple:
+        # Contadores que SQL Server ya mantiene: no toca las filas
+        self.citar(tabla)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT SUM(CASE WHEN index_id IN (0, 1) THEN row_count ELSE 0 END), "
+            "SUM(used_page_count) * 8192 "
+            "FROM sys.dm_db_partition_stats WHERE object_id = OBJECT_ID(?)",
+            (tabla,),
+        )
+        filas, tamaño = cursor.fetchone()
+        return int(filas or 0), int(tamaño or 0)
+
+
+class SQLiteBackend(Backend):
+    """
+    Sustituto de SQL Server para pruebas y benchmarks en Linux.
+    ruta=":memory:" crea una base en memoria compartida entre las
+    conexiones del mismo backend (mientras el backend exista).
+    """
+
+    nombre = "sqlite"
+    _contador = itertools.count()
+
+    def __init__(self, ruta: str = ":memory:", timeout: float = 5.0):
+        self.ruta = ruta
+        self.timeout = timeout
+        self._ancla = None
+        if ruta == ":memory:":
+            self._uri = f"file:hackathon_{os.getpid()}_{next(self._contador)}?mode=memory&cache=shared"
+        else:
+            self._uri = None
+
+    def conectar(self):
+        if self._uri is not None:
+            conn = sqlite3.connect(self._uri, uri=True, timeout=self.timeout,
+                                   check_same_thread=False)
+            if self._ancla is None:
+                # Mantiene viva la base en memoria aunque el pool cierre todo
+                self._ancla = sqlite3.connect(self._uri, uri=True,
+                                              check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.ruta, timeout=self.timeout,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def interrumpir(self, conn, cursores=()):
+        conn.interrupt()
+
+    def ddl_usuarios(self) -> list:
+        return [DDL_USUARIOS_SQLITE]
+
+    def columnas_tabla(self, conn, tabla: str) -> list:
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA table_info({self.citar(tabla)})")
+        return [(fila[1], fila[2], not fila[3] and not fila[5]) for fila in cursor.fetchall()]
+
+    def conteo_y_tamaño(self, conn, tabla: str) -> tuple:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {self.citar(tabla)}")
+        filas = cursor.fetchone()[0]
+        try:
+            # dbstat solo existe si SQLite se compiló con SQLITE_ENABLE_DBSTAT_VTAB
+            cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (tabla,))
+            tamaño = cursor.fetchone()[0]
+        except sqlite3.Error:
+            tamaño = None
+        return filas, tamaño
+
+
+def backend_desde_url(url: str) -> Backend:
+    """
+    'sqlite:///ruta.db', 'sqlite:////ruta/absoluta.db', 'sqlite:///:memory:'
+    o 'mssql://<cadena ODBC>'
+    ('mssql://' sin nada más usa la cadena de siempre).
+    """
+    if url.startswith("sqlite://"):
+        ruta = url[len("sqlite://"):]
+        if ruta.startswith("/"):
+            ruta = ruta[1:]
+        return SQLiteBackend(ruta or ":memory:")
+    if url.startswith("mssql://"):
+        cadena = url[len("mssql://"):]
+        return SQLServerBackend(cadena or CADENA_SQL_SERVER)
+    raise ValueError(f"URL de base de datos no soportada: {url!r}")
+
+
+def backend_por_defecto() -> Backend:
+    """Usa HACKATHON_DB si está definida; si no, el SQL Server local."""
+    url = os.environ.get("HACKATHON_DB")
+    return backend_desde_url(url) if url else SQLServerBackend()
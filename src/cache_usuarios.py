@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future
+
+
+class CacheNegativo:
+    """
+    Emails que se buscaron y no existían, durante `ttl` segundos (LRU con
+    tope de `max_entradas`). Sirve para que los sondeos repetidos de un
+    email inexistente no vuelvan a la base de datos. Hay que invalidar al
+    registrar; lo registrado en otro proceso tarda como mucho `ttl` en verse,
+    por eso conexion_sql solo la usa si se activa con configurar_cache_negativo.
+    """
+
+    def __init__(self, ttl=30.0, max_entradas=100_000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # email -> caduca_en
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def contiene(self, email) -> bool:
+        ahora = time.monotonic()
+        with self._lock:
+            caduca = self._entradas.get(email)
+            if caduca is not None and caduca > ahora:
+                self.aciertos += 1
+                return True
+            if caduca is not None:
+                del self._entradas[email]
+            self.fallos += 1
+            return False
+
+    def agregar(self, email):
+        with self._lock:
+            self._entradas[email] = time.monotonic() + self.ttl
+            self._entradas.move_to_end(email)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, email):
+        with self._lock:
+            self._entradas.pop(email, None)
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class CacheUsuarios:
+    """
+    Registros de login (id, hash guardado) por email: LRU con tope de
+    `max_entradas` y caducidad de `ttl` segundos. Si varios hilos piden
+    a la vez un email que no está, solo uno va a la base de datos y el
+    resto espera su resultado (single-flight), así una cuenta muy usada
+    cuesta una lectura por ventana de `ttl`.
+
+    Hay que invalidar al registrar, al cambiar la contraseña y al
+    reescribir el hash; un cambio hecho en otro proceso tarda como mucho
+    `ttl` en verse. Lo que no existe no se guarda (eso es CacheNegativo).
+    """
+
+    def __init__(self, ttl=30.0, max_entradas=100_000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # email -> (caduca_en, registro)
+        self._cargando = {}             # email -> Future de la carga en curso
+        self._lock = threading.Lock()
+        self._stats = {"aciertos": 0, "fallos": 0, "esperas": 0, "invalidaciones": 0}
+
+    def _buscar(self, email):
+        """
+        (futuro, propio): ya resuelto si está en caché, el de la carga en
+        curso si alguien lo está buscando, o uno nuevo (propio=True) que
+        resuelve quien llama con `_terminar`.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(email)
+            if entrada is not None:
+                if entrada[0] > ahora:
+                    self._entradas.move_to_end(email)
+                    self._stats["aciertos"] += 1
+                    futuro = Future()
+                    futuro.set_result(entrada[1])
+                    return futuro, False
+                del self._entradas[email]
+            carga = self._cargando.get(email)
+            if carga is not None:
+                self._stats["esperas"] += 1
+                return carga, False
+            carga = self._cargando[email] = Future()
+            self._stats["fallos"] += 1
+            return carga, True
+
+    def _terminar(self, email, carga, valor=None, error=None):
+        with self._lock:
+            # Si se invalidó mientras cargaba, el valor puede ser viejo: no se guarda
+            if self._cargando.get(email) is carga:
+                del self._cargando[email]
+                if error is None and valor is not None:
+                    self._guardar(email, valor)
+        if carga.done():
+            return
+        if error is not None:
+            carga.set_exception(error)
+        else:
+            carga.set_result(valor)
+
+    def obtener(self, email, cargar):
+        """El registro de `email`; si no está, `cargar()` (una sola vez aunque haya varios pidiendo)."""
+        carga, propia = self._buscar(email)
+        if not propia:
+            return carga.result()
+        try:
+            valor = cargar()
+        except BaseException as e:
+            self._terminar(email, carga, error=e)
+            raise
+        self._terminar(email, carga, valor)
+        return valor
+
+    def futuro(self, email, pedir) -> Future:
+        """
+        Como obtener pero sin bloquear: `pedir()` devuelve un Future con
+        el registro (p.ej. CargadorCredenciales.cargar) y se devuelve otro
+        que comparten todos los que piden el mismo email.
+        """
+        carga, propia = self._buscar(email)
+        if propia:
+            try:
+                pedido = pedir()
+            except BaseException as e:
+                self._terminar(email, carga, error=e)
+                raise
+            pedido.add_done_callback(lambda f: self._terminar(email, carga, *_desenlace(f)))
+        return carga
+
+    def _guardar(self, email, registro):
+        self._entradas[email] = (time.monotonic() + self.ttl, registro)
+        self._entradas.move_to_end(email)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def invalidar(self, email):
+        with self._lock:
+            self._entradas.pop(email, None)
+            self._cargando.pop(email, None)
+            self._stats["invalidaciones"] += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._cargando.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._stats)
+            datos["entradas"] = len(self._entradas)
+        consultas = datos["aciertos"] + datos["fallos"] + datos["esperas"]
+        datos["tasa_aciertos"] = (datos["aciertos"] + datos["esperas"]) / consultas if consultas else 0.0
+        return datos
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def _desenlace(futuro):
+    """(valor, error) de un Future ya terminado."""
+    if futuro.cancelled():
+        return None, CancelledError()
+    error = futuro.exception()
+    return (None, error) if error is not None else (futuro.result(), None)
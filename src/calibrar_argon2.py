@@ -0,0 +1,136 @@
+"""
+Calibra Argon2 para esta máquina y guarda el resultado en argon2.json
+(security.py lo carga al arrancar).
+
+    python calibrar_argon2.py --objetivo-ms 250 --concurrencia 8 --memoria-mb 1024
+
+Busca la combinación más costosa (memory_cost * time_cost) cuyo p95 de
+verificación, con `concurrencia` logins a la vez, quede por debajo del
+objetivo, sin que los hashes simultáneos pasen del presupuesto de memoria.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+
+from argon2 import PasswordHasher
+
+from security import PARAMETROS_ARGON2, RUTA_CONFIG_ARGON2
+
+# Mínimo recomendado por OWASP para argon2id (19 MiB)
+MEMORIA_MINIMA_KIB = 19456
+TIME_COST_MAXIMO = 10
+
+
+def medir_p95(parametros: dict, concurrencia: int, muestras: int) -> float:
+    """p95 (segundos) de verify con `concurrencia` hilos verificando a la vez."""
+    hasher = PasswordHasher(**parametros)
+    hash_prueba = hasher.hash("Calibracion123")
+    latencias = []
+    lock = threading.Lock()
+    salida = threading.Barrier(concurrencia)
+
+    def trabajador():
+        salida.wait()
+        propias = []
+        for _ in range(muestras):
+            t0 = time.perf_counter()
+            hasher.verify(hash_prueba, "Calibracion123")
+            propias.append(time.perf_counter() - t0)
+        with lock:
+            latencias.extend(propias)
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(concurrencia)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    latencias.sort()
+    return latencias[min(len(latencias) - 1, int(0.95 * len(latencias)))]
+
+
+def calibrar(objetivo_ms: float, concurrencia: int, memoria_mb: int, muestras: int = 3,
+             parallelism: int = None, informar=print) -> dict:
+    objetivo = objetivo_ms / 1000
+    nucleos = os.cpu_count() or 1
+    parallelism = parallelism or max(1, min(4, nucleos // concurrencia))
+
+    # Memoria por hash: la que toca a cada login simultáneo, en potencias de 2
+    tope_kib = (memoria_mb * 1024) // concurrencia
+    candidatos = []
+    memoria = 1 << (max(tope_kib, 1).bit_length() - 1)
+    while memoria >= MEMORIA_MINIMA_KIB:
+        candidatos.append(memoria)
+        memoria //= 2
+    if not candidatos:
+        raise SystemExit(
+            f"El presupuesto ({memoria_mb} MiB para {concurrencia} logins) no llega al "
+            f"mínimo de {MEMORIA_MINIMA_KIB // 1024} MiB por hash"
+        )
+
+    mejor = None
+    for memory_cost in candidatos:
+        base = dict(PARAMETROS_ARGON2, memory_cost=memory_cost, parallelism=parallelism, time_cost=1)
+        p95_t1 = medir_p95(base, concurrencia, muestras)
+        informar(f"memory_cost={memory_cost:>8} KiB  time_cost=1  p95={p95_t1 * 1e3:8.1f} ms")
+        if p95_t1 > objetivo:
+            continue  # ni con t=1 entra; probar con menos memoria
+
+        # La latencia crece casi lineal con time_cost: estimar y confirmar
+        time_cost = max(1, min(TIME_COST_MAXIMO, int(objetivo / p95_t1)))
+        p95 = p95_t1
+        while time_cost > 1:
+            p95 = medir_p95(dict(base, time_cost=time_cost), concurrencia, muestras)
+            informar(f"memory_cost={memory_cost:>8} KiB  time_cost={time_cost}  p95={p95 * 1e3:8.1f} ms")
+            if p95 <= objetivo:
+                break
+            time_cost -= 1
+        else:
+            p95 = p95_t1
+
+        candidato = dict(base, time_cost=time_cost)
+        if mejor is None or memory_cost * time_cost > mejor[0]["memory_cost"] * mejor[0]["time_cost"]:
+            mejor = (candidato, p95)
+    if mejor is None:
+        raise SystemExit(f"Ninguna configuración cumple {objetivo_ms} ms con {concurrencia} logins simultáneos")
+
+    parametros, p95 = mejor
+    parametros["calibracion"] = {
+        "objetivo_ms": objetivo_ms,
+        "concurrencia": concurrencia,
+        "memoria_mb": memoria_mb,
+        "p95_ms": round(p95 * 1e3, 2),
+        "nucleos": nucleos,
+        "host": platform.node(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+    }
+    return parametros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibra los parámetros de Argon2 para esta máquina")
+    parser.add_argument("--objetivo-ms", type=float, default=250, help="p95 máximo de verificación")
+    parser.add_argument("--concurrencia", type=int, default=os.cpu_count() or 1,
+                        help="logins simultáneos a soportar")
+    parser.add_argument("--memoria-mb", type=int, default=1024,
+                        help="RAM máxima para todos los hashes simultáneos")
+    parser.add_argument("--muestras", type=int, default=3, help="verificaciones por hilo y configuración")
+    parser.add_argument("--parallelism", type=int, help="carriles de Argon2 (por defecto según núcleos)")
+    parser.add_argument("--salida", default=RUTA_CONFIG_ARGON2)
+    args = parser.parse_args(argv)
+
+    parametros = calibrar(args.objetivo_ms, args.concurrencia, args.memoria_mb,
+                          args.muestras, args.parallelism)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(parametros, f, indent=2)
+    print(f"\nGuardado en {args.salida}:")
+    print(json.dumps(parametros, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+Generador de carga para el login:
+
+    python carga.py --sembrar 10000 --concurrencia 16 --duracion 30
+    python carga.py --corpus credenciales.csv --tasa 50 --peticiones 2000 --modo asyncio
+
+Reproduce un corpus de credenciales válidas (CSV con columnas email y
+contraseña) mezclando logins correctos, contraseñas incorrectas y
+usuarios desconocidos. Con --concurrencia N hay N peticiones en vuelo
+todo el rato (lazo cerrado); con --tasa R se lanzan R peticiones por
+segundo pase lo que pase (lazo abierto) y la latencia se cuenta desde el
+momento en que tocaba lanzarla, así un servidor atascado no se disimula.
+
+Al final informa del rendimiento conseguido, percentiles de latencia por
+tipo, tasas de error y el pico de memoria residente del proceso, que es
+donde viven los hilos de Argon2.
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import conexion_sql
+from async_sql import obtener_acceso_async
+from backends import SQLiteBackend, backend_desde_url
+from cargador import CargadorCredenciales
+from conexion_sql import EstadoAutenticacion, autenticar, insertar_lote
+from limitador import configurar_limitador
+from security import crear_hash_seguro, obtener_ejecutor
+
+ESPERADO = {
+    "valido": EstadoAutenticacion.EXITO,
+    "invalido": EstadoAutenticacion.CONTRASEÑA_INCORRECTA,
+    "desconocido": EstadoAutenticacion.USUARIO_DESCONOCIDO,
+}
+
+
+def leer_corpus(ruta) -> list:
+    """[(email, contraseña), ...] desde un CSV con cabecera."""
+    with open(ruta, encoding="utf-8", newline="") as archivo:
+        return [(fila["email"], fila["contraseña"]) for fila in csv.DictReader(archivo)]
+
+
+def sembrar(n_usuarios, contraseña="Carga12345") -> list:
+    """
+    Crea una base SQLite temporal con `n_usuarios` y la deja como backend
+    del proceso. Todos comparten un hash para no pagar n Argon2 al sembrar.
+    """
+    ruta = os.path.join(tempfile.mkdtemp(prefix="carga_hackathon_"), "carga.db")
+    conexion_sql.configurar_backend(SQLiteBackend(ruta))
+    conexion_sql.crear_esquema()
+    hash_comun = crear_hash_seguro(contraseña)
+    ahora = datetime.now()
+    corpus = [(f"carga{i:07d}@carga.example", contraseña) for i in range(n_usuarios)]
+    with conexion_sql.usar_conexion() as (conn, backend):
+        for desde in range(0, n_usuarios, 10_000):
+            filas = [(f"Carga {desde + i}", email, hash_comun, ahora)
+                     for i, (email, _) in enumerate(corpus[desde:desde + 10_000])]
+            insertar_lote(conn, backend, "Usuarios", filas)
+    return corpus
+
+
+class Generador:
+    """Reparte peticiones (tipo, email, contraseña) según la mezcla pedida."""
+
+    def __init__(self, corpus, mezcla, peticiones=None, duracion=None, semilla=2025):
+        self.corpus = corpus
+        self.tipos = list(ESPERADO)
+        self.pesos = mezcla
+        self.peticiones = peticiones
+        self.fin = time.monotonic() + duracion if duracion else None
+        self._azar = random.Random(semilla)
+        self._emitidas = itertools.count()
+        self._lock = threading.Lock()
+
+    def siguiente(self):
+        """La próxima petición, o None si ya se alcanzó el límite."""
+        if self.fin is not None and time.monotonic() >= self.fin:
+            return None
+        with self._lock:
+            n = next(self._emitidas)
+            if self.peticiones is not None and n >= self.peticiones:
+                return None
+            tipo = self._azar.choices(self.tipos, self.pesos)[0]
+            email, contraseña = self._azar.choice(self.corpus)
+        if tipo == "invalido":
+            contraseña += "x"
+        elif tipo == "desconocido":
+            email = f"desconocido{n}@carga.invalid"  # siempre nuevo: no lo tapa la caché negativa
+        return tipo, email, contraseña
+
+
+class Registro:
+    """Latencias y resultados por tipo de petición."""
+
+    def __init__(self):
+        self.latencias = {tipo: [] for tipo in ESPERADO}
+        self.estados = {tipo: Counter() for tipo in ESPERADO}
+        self.errores = Counter()
+        self._lock = threading.Lock()
+
+    def anotar(self, tipo, latencia, estado=None, error=None):
+        with self._lock:
+            self.latencias[tipo].append(latencia)
+            if error is not None:
+                self.errores[type(error).__name__] += 1
+                self.estados[tipo]["error"] += 1
+            else:
+                self.estados[tipo][estado.value] += 1
+
+    def total(self) -> int:
+        return sum(len(muestras) for muestras in self.latencias.values())
+
+
+def _login(registro, peticion, desde):
+    tipo, email, contraseña = peticion
+    try:
+        estado = autenticar(email, contraseña).estado
+    except Exception as e:
+        registro.anotar(tipo, time.perf_counter() - desde, error=e)
+    else:
+        registro.anotar(tipo, time.perf_counter() - desde, estado)
+
+
+def correr_hilos(generador, registro, concurrencia, tasa=None):
+    if tasa is None:
+        def trabajador():
+            while (peticion := generador.siguiente()) is not None:
+                _login(registro, peticion, time.perf_counter())
+
+        hilos = [threading.Thread(target=trabajador, daemon=True) for _ in range(concurrencia)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        inicio = time.perf_counter()
+        for i in itertools.count():
+            objetivo = inicio + i / tasa
+            pausa = objetivo - time.perf_counter()
+            if pausa > 0:
+                time.sleep(pausa)
+            peticion = generador.siguiente()
+            if peticion is None:
+                break
+            ejecutor.submit(_login, registro, peticion, objetivo)
+
+
+async def correr_asyncio(generador, registro, concurrencia, tasa=None):
+    """Todo en un event loop: cada login es una corrutina de async_sql."""
+    acceso = obtener_acceso_async()
+
+    async def login(peticion, desde):
+        tipo, email, contraseña = peticion
+        try:
+            resultado = await acceso.autenticar(email, contraseña)
+        except Exception as e:
+            registro.anotar(tipo, time.perf_counter() - desde, error=e)
+        else:
+            registro.anotar(tipo, time.perf_counter() - desde, resultado.estado)
+
+    if tasa is None:
+        async def trabajador():
+            while (peticion := generador.siguiente()) is not None:
+                await login(peticion, time.perf_counter())
+
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        return
+
+    tareas = set()
+    inicio = time.perf_counter()
+    for i in itertools.count():
+        objetivo = inicio + i / tasa
+        pausa = objetivo - time.perf_counter()
+        if pausa > 0:
+            await asyncio.sleep(pausa)
+        peticion = generador.siguiente()
+        if peticion is None:
+            break
+        tarea = asyncio.ensure_future(login(peticion, objetivo))
+        tareas.add(tarea)
+        tarea.add_done_callback(tareas.discard)
+    if tareas:
+        await asyncio.gather(*tareas)
+
+
+def rss_pico():
+    """Pico de memoria residente del proceso en bytes (None si no se puede saber)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024  # macOS da bytes, Linux KiB
+
+
+def _percentiles(muestras) -> dict:
+    ordenadas = sorted(muestras)
+    if not ordenadas:
+        return {"n": 0}
+
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1e3
+
+    return {"n": len(ordenadas), "p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99),
+            "max_ms": ordenadas[-1] * 1e3}
+
+
+def informe(registro, segundos) -> dict:
+    total = registro.total()
+    por_tipo = {}
+    inesperados = 0
+    for tipo, esperado in ESPERADO.items():
+        estados = registro.estados[tipo]
+        malos = sum(n for estado, n in estados.items() if estado != esperado.value)
+        inesperados += malos
+        por_tipo[tipo] = dict(_percentiles(registro.latencias[tipo]), estados=dict(estados),
+                              tasa_error=malos / len(registro.latencias[tipo]) if registro.latencias[tipo] else 0.0)
+    pico = rss_pico()
+    return {
+        "peticiones": total,
+        "segundos": segundos,
+        "rendimiento_rps": total / segundos if segundos else 0.0,
+        "latencia": _percentiles([x for muestras in registro.latencias.values() for x in muestras]),
+        "tasa_error": inesperados / total if total else 0.0,
+        "errores": dict(registro.errores),
+        "por_tipo": por_tipo,
+        "rss_pico_mib": pico / 2**20 if pico is not None else None,
+        "ejecutor_hash": obtener_ejecutor().estadisticas(),
+    }
+
+
+def imprimir(datos):
+    lat = datos["latencia"]
+    print(f"{datos['peticiones']} peticiones en {datos['segundos']:.1f} s: {datos['rendimiento_rps']:.1f} logins/s")
+    if lat["n"]:
+        print(f"latencia: p50={lat['p50_ms']:.1f} ms  p95={lat['p95_ms']:.1f} ms  "
+              f"p99={lat['p99_ms']:.1f} ms  max={lat['max_ms']:.1f} ms")
+    print(f"tasa de error: {datos['tasa_error']:.2%}")
+    for nombre, n in datos["errores"].items():
+        print(f"  {nombre}: {n}")
+    for tipo, stats in datos["por_tipo"].items():
+        if stats["n"]:
+            print(f"  {tipo:<12} n={stats['n']:<6} p50={stats['p50_ms']:8.1f} ms  "
+                  f"p99={stats['p99_ms']:8.1f} ms  {stats['estados']}")
+    if "cargador" in datos:
+        c = datos["cargador"]
+        print(f"Lotes: {c['lotes']} consultas para {c['emails']} emails (medio {c['lote_medio']:.1f}, "
+              f"máx {c['lote_max']})")
+    if datos["rss_pico_mib"] is not None:
+        print(f"RSS pico: {datos['rss_pico_mib']:.0f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("--corpus", help="CSV con columnas email,contraseña de usuarios existentes")
+    origen.add_argument("--sembrar", type=int, metavar="N", help="crear una SQLite temporal con N usuarios")
+    parser.add_argument("--db", help="URL de la base (sqlite:///x.db, mssql://...); por defecto HACKATHON_DB")
+    parser.add_argument("--modo", choices=("hilos", "asyncio"), default="hilos")
+    parser.add_argument("--concurrencia", type=int, default=8,
+                        help="peticiones en vuelo (con --tasa, hilos disponibles en modo hilos)")
+    parser.add_argument("--tasa", type=float, help="peticiones por segundo (lazo abierto)")
+    parser.add_argument("--peticiones", type=int, help="parar tras este número de peticiones")
+    parser.add_argument("--duracion", type=float, help="parar tras estos segundos")
+    parser.add_argument("--mezcla", default="80,15,5", help="%% válidos,incorrectos,desconocidos")
+    parser.add_argument("--con-limitador", action="store_true", help="dejar activo el limitador de intentos")
+    parser.add_argument("--lotes", type=float, metavar="MS",
+                        help="buscar las credenciales por lotes con esta ventana en ms (ver cargador.py)")
+    parser.add_argument("--json", help="guardar el informe en este archivo")
+    args = parser.parse_args(argv)
+    if args.peticiones is None and args.duracion is None:
+        args.peticiones = 1000
+
+    if args.db:
+        conexion_sql.configurar_backend(backend_desde_url(args.db))
+    corpus = sembrar(args.sembrar) if args.sembrar else leer_corpus(args.corpus)
+    if not corpus:
+        print("El corpus está vacío")
+        return 1
+    if not args.con_limitador:
+        configurar_limitador(None)  # el corpus repite emails y acabaría todo BLOQUEADO
+    conexion_sql.obtener_pool(max_tamaño=args.concurrencia)
+    cargador = None
+    if args.lotes is not None:
+        cargador = CargadorCredenciales(ventana=args.lotes / 1000)
+        conexion_sql.configurar_cargador(cargador)
+
+    mezcla = [float(x) for x in args.mezcla.split(",")]
+    generador = Generador(corpus, mezcla, args.peticiones, args.duracion)
+    registro = Registro()
+    inicio = time.perf_counter()
+    try:
+        if args.modo == "hilos":
+            correr_hilos(generador, registro, args.concurrencia, args.tasa)
+        else:
+            asyncio.run(correr_asyncio(generador, registro, args.concurrencia, args.tasa))
+    except KeyboardInterrupt:
+        print("\nInterrumpido; informe parcial:")
+    datos = informe(registro, time.perf_counter() - inicio)
+    if cargador is not None:
+        conexion_sql.configurar_cargador(None)
+        cargador.cerrar()
+        datos["cargador"] = cargador.estadisticas()
+    conexion_sql.cerrar_pool()
+
+    imprimir(datos)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
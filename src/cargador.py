@@ -0,0 +1,134 @@
+"""
+Búsqueda de credenciales por lotes (al estilo DataLoader).
+
+Con muchos logins a la vez cada uno mandaría su SELECT de una fila. El
+cargador junta los emails que llegan dentro de `ventana` segundos (o
+hasta `max_lote`) y los resuelve con un solo `WHERE email IN (...)`;
+cada petición recibe su fila en un Future.
+
+    cargador = CargadorCredenciales(ventana=0.002, max_lote=64)
+    conexion_sql.configurar_cargador(cargador)   # autenticar ya lo usa
+    cargador.obtener(email)                      # desde un hilo
+    await cargador.obtener_async(email)          # desde asyncio
+
+La ventana se abre con el primer email pendiente: con poca carga un
+login espera como mucho `ventana` de más. Con `hilos` lotes ya en vuelo
+el siguiente no sale hasta que uno termina, y mientras tanto sigue
+juntando emails, así que los lotes crecen justo cuando la base está más
+ocupada. Cada lote tiene prestada una conexión solo durante su consulta.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+
+import conexion_sql
+from security import normalizar_email
+
+
+class CargadorCredenciales:
+    """
+    - conexion: de dónde se lee (pool, Enrutador, Fragmentador; None = pool del proceso)
+    - ventana: segundos que se juntan emails desde el primero pendiente
+    - max_lote: emails por lote; al llegar a este número sale sin esperar
+    - hilos: lotes en vuelo a la vez
+    """
+
+    def __init__(self, conexion=None, ventana=0.002, max_lote=64, hilos=4, nombre_tabla="Usuarios"):
+        if max_lote < 1 or hilos < 1:
+            raise ValueError("max_lote e hilos deben ser al menos 1")
+        self.conexion = conexion
+        self.ventana = ventana
+        self.max_lote = max_lote
+        self.nombre_tabla = nombre_tabla
+        self._pendientes = {}  # email -> Future, en orden de llegada
+        self._abierto_en = 0.0
+        self._cerrado = False
+        self._cond = threading.Condition()
+        self._libres = threading.Semaphore(hilos)
+        self._hilos = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="cargador")
+        self._stats = {"peticiones": 0, "lotes": 0, "emails": 0, "lote_max": 0, "errores": 0}
+        self._despachador = threading.Thread(target=self._despachar, name="cargador-despacho", daemon=True)
+        self._despachador.start()
+
+    def cargar(self, email) -> Future:
+        """Future con (id, hash) o None. Si el email ya espera lote, se comparte su Future."""
+        email = normalizar_email(email)
+        with self._cond:
+            if self._cerrado:
+                raise RuntimeError("El cargador está cerrado")
+            self._stats["peticiones"] += 1
+            futuro = self._pendientes.get(email)
+            if futuro is None:
+                futuro = self._pendientes[email] = Future()
+                if len(self._pendientes) == 1:
+                    self._abierto_en = time.monotonic()
+                    self._cond.notify()
+                elif len(self._pendientes) == self.max_lote:
+                    self._cond.notify()
+            return futuro
+
+    def obtener(self, email, timeout=None):
+        return self.cargar(email).result(timeout)
+
+    async def obtener_async(self, email):
+        # shield: cancelar a quien espera no cancela el Future que comparte con otros
+        return await asyncio.shield(asyncio.wrap_future(self.cargar(email)))
+
+    def _despachar(self):
+        while True:
+            self._libres.acquire()
+            with self._cond:
+                while not self._pendientes and not self._cerrado:
+                    self._cond.wait()
+                if not self._pendientes:
+                    self._libres.release()
+                    return  # cerrado y sin nada pendiente
+                while len(self._pendientes) < self.max_lote and not self._cerrado:
+                    resto = self._abierto_en + self.ventana - time.monotonic()
+                    if resto <= 0:
+                        break
+                    self._cond.wait(resto)
+                lote = dict(islice(self._pendientes.items(), self.max_lote))
+                for email in lote:
+                    del self._pendientes[email]
+                # Lo que sobró ya esperó su ventana: sale en la siguiente vuelta
+            self._hilos.submit(self._resolver, lote)
+
+    def _resolver(self, lote):
+        try:
+            vivos = {email: f for email, f in lote.items() if f.set_running_or_notify_cancel()}
+            if not vivos:
+                return
+            try:
+                encontrados = conexion_sql.buscar_credenciales_lote(vivos, self.conexion, self.nombre_tabla)
+            except Exception as e:
+                with self._cond:
+                    self._stats["errores"] += 1
+                for futuro in vivos.values():
+                    futuro.set_exception(e)
+                return
+            with self._cond:
+                self._stats["lotes"] += 1
+                self._stats["emails"] += len(vivos)
+                self._stats["lote_max"] = max(self._stats["lote_max"], len(vivos))
+            for email, futuro in vivos.items():
+                futuro.set_result(encontrados.get(email))
+        finally:
+            self._libres.release()
+
+    def cerrar(self):
+        """Resuelve lo pendiente y para los hilos."""
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify()
+        self._despachador.join()
+        self._hilos.shutdown(wait=True)
+
+    def estadisticas(self) -> dict:
+        with self._cond:
+            datos = dict(self._stats)
+            datos["pendientes"] = len(self._pendientes)
+        datos["lote_medio"] = datos["emails"] / datos["lotes"] if datos["lotes"] else 0.0
+        return datos
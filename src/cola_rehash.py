@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+
+from conexion_sql import invalidar_usuario, usar_conexion
+from security import obtener_ejecutor
+
+
+class ColaRehash:
+    """
+    Write-behind para actualizar hashes viejos después de un login correcto.
+
+    `encolar` no bloquea: el nuevo hash se calcula en un hilo de fondo y
+    los UPDATE se mandan en lotes (cada `tamaño_lote` hashes o cada
+    `intervalo` segundos). El UPDATE solo pisa la fila si el hash guardado
+    sigue siendo el viejo, así no se pierde un cambio de contraseña hecho
+    mientras tanto. Si la cola está llena se descarta: el siguiente login
+    lo volverá a intentar.
+    """
+
+    def __init__(self, tamaño_lote=100, intervalo=0.5, max_pendientes=10_000,
+                 nombre_tabla="Usuarios"):
+        self.tamaño_lote = tamaño_lote
+        self.intervalo = intervalo
+        self.nombre_tabla = nombre_tabla
+        self._cola = queue.Queue(max_pendientes)
+        self._en_cola = set()  # claves de _clave(): los id se repiten entre fragmentos
+        self._lock = threading.Lock()
+        self._stats = {"encolados": 0, "descartados": 0, "escritos": 0, "errores": 0}
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="cola-rehash", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, id_usuario, hash_viejo, contraseña, fuente=None, email=None) -> bool:
+        """
+        `fuente` es el pool, Enrutador o Fragmentador (o None = pool del
+        proceso) donde escribir. Con `email` la fila se busca por email (el
+        id se repite entre fragmentos) y su entrada de la caché de login se
+        invalida al escribir.
+        """
+        clave = _clave(fuente, id_usuario, email)
+        with self._lock:
+            if clave in self._en_cola:
+                return False
+            try:
+                self._cola.put_nowait((fuente, id_usuario, hash_viejo, contraseña, email))
+            except queue.Full:
+                self._stats["descartados"] += 1
+                return False
+            self._en_cola.add(clave)
+            self._stats["encolados"] += 1
+        return True
+
+    def _bucle(self):
+        pendientes = []
+        limite = time.monotonic() + self.intervalo
+        while True:
+            try:
+                pendientes.append(self._cola.get(timeout=max(0.0, limite - time.monotonic())))
+                if len(pendientes) < self.tamaño_lote:
+                    continue
+            except queue.Empty:
+                pass
+            if pendientes:
+                try:
+                    self._escribir(pendientes)
+                except Exception as e:
+                    print(f"Error al reescribir hashes: {e}")
+                    with self._lock:
+                        self._stats["errores"] += len(pendientes)
+                finally:
+                    with self._lock:
+                        for fuente, id_usuario, _, _, email in pendientes:
+                            self._en_cola.discard(_clave(fuente, id_usuario, email))
+                    for _ in pendientes:
+                        self._cola.task_done()
+                pendientes = []
+            if self._parar.is_set() and self._cola.empty():
+                return
+            limite = time.monotonic() + self.intervalo
+
+    def _escribir(self, pendientes):
+        nuevos = obtener_ejecutor().hash_muchos([p[3] for p in pendientes], validar=False)
+
+        # Agrupa por fuente (y fragmento): cada grupo recibe un único executemany
+        por_fuente = {}
+        for (fuente, id_usuario, hash_viejo, _, email), hash_nuevo in zip(pendientes, nuevos):
+            _, por_email, por_id = por_fuente.setdefault(_grupo(fuente, email), (fuente, [], []))
+            if email is not None:
+                por_email.append((hash_nuevo, email, hash_viejo))
+            else:
+                por_id.append((hash_nuevo, id_usuario, hash_viejo))
+
+        for fuente, por_email, por_id in por_fuente.values():
+            try:
+                self._actualizar(fuente, por_email, por_id)
+                for _, email, _ in por_email:
+                    invalidar_usuario(email)
+                with self._lock:
+                    self._stats["escritos"] += len(por_email) + len(por_id)
+            except Exception as e:
+                print(f"Error al reescribir hashes: {e}")
+                with self._lock:
+                    self._stats["errores"] += len(por_email) + len(por_id)
+
+    def _actualizar(self, fuente, por_email, por_id):
+        """
+        Con email, la escritura va por la misma ruta que cambiar_contraseña:
+        con un Fragmentador respeta la pausa del rebalanceo y queda anotada.
+        """
+        clave = por_email[0][1] if por_email else None
+        with usar_conexion(fuente, clave=clave) as (conn, backend):
+            tabla, contraseña = backend.citar(self.nombre_tabla), backend.citar("Contraseña")
+            cursor = conn.cursor()
+            backend.preparar_cursor_masivo(cursor)
+            for columna, filas in (("email", por_email), ("id", por_id)):
+                if filas:
+                    cursor.executemany(
+                        f"UPDATE {tabla} SET {contraseña} = ? "
+                        f"WHERE {backend.citar(columna)} = ? AND {contraseña} = ?",
+                        filas,
+                    )
+            marcar = getattr(fuente, "marcar_escritura", None)
+            if marcar is not None:
+                for _, email, _ in por_email:
+                    marcar(email)
+            conn.commit()
+            cursor.close()
+
+    def vaciar(self):
+        """Espera a que todo lo encolado esté escrito."""
+        self._cola.join()
+
+    def cerrar(self):
+        self._parar.set()
+        self._hilo.join()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._stats)
+        datos["pendientes"] = self._cola.qsize()
+        return datos
+
+
+def _grupo(fuente, email):
+    """
+    Identidad estable de la fuente; con un Fragmentador, la del fragmento
+    del email. La vista de un fragmento (sharding.py) se agrupa por el pool
+    que hay detrás.
+    """
+    if email is not None and hasattr(fuente, "fragmento_de"):
+        return id(fuente), fuente.fragmento_de(email)
+    return id(getattr(fuente, "fuente", fuente))
+
+
+def _clave(fuente, id_usuario, email):
+    """El email identifica al usuario en cualquier fragmento; sin él, la fuente y el id."""
+    return ("email", email) if email is not None else ("id", fuente, id_usuario)
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def obtener_cola_rehash(**opciones) -> ColaRehash:
+    """Cola del proceso; `opciones` solo cuentan la primera vez."""
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaRehash(**opciones)
+        return _cola
@@ -1,96 +1,556 @@
-import pyodbc
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
+from enum import Enum
+from itertools import islice
 from tabulate import tabulate  # Para formato de tabla más bonito (opcional)
-from security import validar_contraseña,crear_hash_seguro,verificar_contraseña
+from security import validar_contraseña,normalizar_email,validar_email,obtener_ejecutor,necesita_rehash,hash_ficticio
+from pool_conexiones import PoolConexiones
+from limitador import obtener_limitador
+from cache_usuarios import CacheUsuarios
+from instrumentacion import ConexionInstrumentada, obtener_instrumentacion
+from backends import CADENA_SQL_SERVER, SQLiteBackend, backend_por_defecto
+
+CADENA_CONEXION = CADENA_SQL_SERVER
+
+# Backend y pool compartidos por todo el proceso (se crean al primer uso)
+_backend = None
+_pool = None
+_pool_lock = threading.Lock()
+
+# Emails buscados en el login que no existían; desactivado salvo configurar_cache_negativo,
+# porque un alta hecha en otro proceso no lo invalida
+_cache_negativo = None
+# (id, hash) de los que sí, para no releerlos en cada login; con varios procesos
+# hay que quitarlo (configurar_cache_usuarios(None)): las invalidaciones son locales
+_cache_usuarios = CacheUsuarios()
+# Búsquedas del login agrupadas en lotes (ver cargador.py); None = una consulta por login
+_cargador = None
+# Emails ya registrados, para saltarse la comprobación en las altas (ver filtro_bloom.py)
+_filtro_emails = None
+
+# Emails por `WHERE email IN (...)`; SQL Server admite 2100 parámetros, SQLite viejo 999
+MAX_EMAILS_IN = 500
+
+def invalidar_usuario(email):
+    """Olvida lo cacheado de `email`; llamar tras cualquier escritura de su fila."""
+    email = normalizar_email(email)
+    if _cache_negativo is not None:
+        _cache_negativo.invalidar(email)
+    if _cache_usuarios is not None:
+        _cache_usuarios.invalidar(email)
+
+def _usuario_registrado(email):
+    """Avisar después de cada alta para que ningún caché lo dé por inexistente."""
+    invalidar_usuario(email)
+    filtro = _filtro_emails
+    if filtro is not None:
+        filtro.agregar(email)
+
+def configurar_filtro_emails(filtro):
+    """Filtro de emails registrados que consultan las altas; None lo desactiva."""
+    global _filtro_emails
+    _filtro_emails = filtro
+
+def obtener_filtro_emails():
+    return _filtro_emails
+
+def email_registrado(email, conexion=None) -> bool:
+    """
+    ¿Existe ya un usuario con `email`? Si el filtro dice que no, no se
+    consulta nada; si no, se mira en los cachés y en la base de datos.
+    """
+    email = normalizar_email(email)
+    filtro = _filtro_emails
+    if filtro is not None and not filtro.puede_estar(email):
+        return False
+    return _credenciales(email, conexion) is not None
+
+def configurar_cache_negativo(cache):
+    """
+    Caché de emails inexistentes del login, p.ej. CacheNegativo(ttl=5);
+    None la desactiva. Solo conviene con un único proceso: en los demás
+    un alta tarda hasta `ttl` en verse.
+    """
+    global _cache_negativo
+    _cache_negativo = cache
+
+def configurar_cache_usuarios(cache):
+    """
+    Caché de registros de login del proceso; None la desactiva. Un cambio
+    de contraseña solo la invalida en este proceso, así que con varios
+    procesos atendiendo logins no debe usarse.
+    """
+    global _cache_usuarios
+    _cache_usuarios = cache
+
+def configurar_cargador(cargador):
+    """Hace que los logins sobre la fuente del cargador busquen por lotes; None lo desactiva."""
+    global _cargador
+    _cargador = cargador
+
+def obtener_cargador():
+    return _cargador
+
+def _cargador_para(conexion):
+    """El cargador del proceso si lee de la misma fuente que `conexion`."""
+    cargador = _cargador
+    if cargador is None:
+        return None
+    if cargador.conexion is conexion or (cargador.conexion is None and conexion is _pool):
+        return cargador
+    return None
+
+def configurar_backend(backend):
+    """Cambia el motor de base de datos del proceso (cierra el pool anterior)."""
+    global _backend
+    cerrar_pool()
+    with _pool_lock:
+        _backend = backend
+
+def obtener_backend():
+    global _backend
+    with _pool_lock:
+        if _backend is None:
+            _backend = backend_por_defecto()
+        return _backend
+
+def _abrir_conexion():
+    return obtener_backend().conectar()
+
 def conectar_sql_server():
     
-    connection_string = (
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        "SERVER=localhost;"  
-        "DATABASE=Hackathon2025;"   
-        "Trusted_Connection=yes;"
-    )
-    
     try:
-        conn = pyodbc.connect(connection_string)
+        conn = _abrir_conexion()
         print("Conexión exitosa a SQL Server")
         return conn
     except Exception as e:
         print(f"Error al conectar: {e}")
         return None
 
-def mostrar_tabla(nombre_tabla, conexion):
-    
+def crear_pool(backend, **opciones):
+    """Pool nuevo para `backend`; sus conexiones se miden si la instrumentación está activa."""
+    def fabrica():
+        conn = backend.conectar()
+        registro = obtener_instrumentacion()
+        return ConexionInstrumentada(conn, registro) if registro is not None else conn
+    opciones.setdefault("sql_ping", backend.sql_ping)
+    return PoolConexiones(fabrica, backend=backend, **opciones)
+
+def obtener_pool(**opciones):
+    """Devuelve el pool del proceso; `opciones` solo cuentan la primera vez."""
+    global _pool
+    backend = obtener_backend()
+    with _pool_lock:
+        if _pool is None:
+            _pool = crear_pool(backend, **opciones)
+        return _pool
+
+def cerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+            _pool = None
+
+def crear_esquema(conexion=None, hasta=None):
+    """Deja el esquema al día aplicando las migraciones pendientes."""
+    from migraciones import migrar
+    return migrar(conexion, hasta=hasta)
+
+def _backend_de(conexion):
+    backend = getattr(conexion, "backend", None)
+    if backend is not None:
+        return backend
+    if isinstance(conexion, sqlite3.Connection):
+        return SQLiteBackend()  # solo se usa el dialecto
+    return obtener_backend()
+
+@contextmanager
+def usar_conexion(conexion=None, solo_lectura=False, clave=None):
+    """
+    Acepta una conexión suelta, un pool o None (pool del proceso) y
+    entrega (conexión, backend). Con pool, la conexión se presta y se
+    devuelve al salir del bloque. Con un enrutador (ver enrutador.py)
+    `solo_lectura` permite ir a una réplica y `clave` (el email) mantiene
+    read-your-writes.
+    """
+    if conexion is None:
+        conexion = obtener_pool()
+    backend = _backend_de(conexion)
+    if isinstance(conexion, PoolConexiones):
+        with conexion.conexion() as conn:
+            yield conn, backend
+    elif hasattr(conexion, "conexion") and hasattr(conexion, "backend"):
+        with conexion.conexion(solo_lectura=solo_lectura, clave=clave) as conn:
+            yield conn, backend
+    else:
+        yield conexion, backend
+
+def leer_tabla(nombre_tabla, conexion=None, columnas=None, tamaño_lote=1000, limite=None):
+    """
+    Generador que recorre la tabla por lotes de `tamaño_lote` filas
+    (fetchmany), así la memoria no depende del tamaño de la tabla.
+    - columnas: lista de columnas a traer (None = todas)
+    - limite: número máximo de filas (None = sin límite)
+    La conexión se devuelve al pool cuando el generador termina o se cierra.
+    """
+    with usar_conexion(conexion, solo_lectura=True) as (conn, backend):
+        lista = ", ".join(backend.citar(c) for c in columnas) if columnas else "*"
+        cursor = conn.cursor()
+        try:
+            cursor.arraysize = tamaño_lote
+            cursor.execute(backend.select(lista, backend.citar(nombre_tabla), limite=limite))
+            while True:
+                filas = cursor.fetchmany(tamaño_lote)
+                if not filas:
+                    break
+                yield from filas
+        finally:
+            cursor.close()
+
+def mostrar_tabla(nombre_tabla, conexion=None, columnas=None, limite=None, tamaño_lote=1000):
+    """Imprime las filas según van llegando y devuelve cuántas se mostraron."""
     try:
-        cursor = conexion.cursor()
-        
-        # Obtener datos de la tabla
-        cursor.execute(f"SELECT * FROM {nombre_tabla}")
-        registros = cursor.fetchall()
-        
-        # Obtener nombres de columnas
-        #columnas = [column[0] for column in cursor.description]
-        
-        # Mostrar tabla con formato (usando tabulate)
-       # print(f"\nContenido de la tabla '{nombre_tabla}':")
-        #print(tabulate(registros, headers=columnas, tablefmt="grid"))
-        print(registros[0][1])
-        return registros
+        total = 0
+        for fila in leer_tabla(nombre_tabla, conexion, columnas, tamaño_lote, limite):
+            print(tuple(fila))
+            total += 1
+        return total
         
     except Exception as e:
         print(f"Error al obtener datos: {e}")
-        return []
+        return 0
 def register (nombre_tabla,conexion,nombre,email,contraseña):
     try:
-        cursor = conexion.cursor()
-        date = datetime.now()
-        contra = validar_contraseña(contraseña)
-        contra = crear_hash_seguro(contraseña)
-        cursor.execute(f"INSERT INTO {nombre_tabla}(nombre,email,contraseña,fecha_registro) VALUES (?,?,?,?);",(nombre,email,contra,date))
-        print("Exitooo")
-        cursor.commit()
-        return True
+        if _filtro_emails is not None and email_registrado(email, conexion):
+            print(f"Error al registrar: el email {normalizar_email(email)} ya está registrado")
+            return []
+        # El hash va por el ejecutor acotado y antes de pedir conexión, para no tenerla ocupada
+        contra = obtener_ejecutor().hash(contraseña)
+        email = normalizar_email(email)
+        with usar_conexion(conexion, clave=email) as (conn, backend):
+            cursor = conn.cursor()
+            date = datetime.now()
+            cursor.execute(f"INSERT INTO {backend.citar(nombre_tabla)}(nombre,email,contraseña,fecha_registro) VALUES ({backend.marcadores(4)});",(nombre,email,contra,date))
+            print("Exitooo")
+            conn.commit()
+            _usuario_registrado(email)
+            return True
         
     except Exception as e:
        print(f"Error al obtener datos: {e}")
        return []
 
 
-def inicio(email,contraseña_user,conexion):
+def cambiar_contraseña(email, nueva, conexion=None, nombre_tabla="Usuarios"):
+    """
+    Guarda el hash de `nueva` para `email` (valida que sea fuerte) y
+    devuelve si había tal usuario. Comprobar la contraseña actual y
+    revocar sesiones es cosa de quien llama.
+    """
+    email = normalizar_email(email)
+    hash_nuevo = obtener_ejecutor().hash(nueva)
+    with usar_conexion(conexion, clave=email) as (conn, backend):
+        cursor = conn.cursor()
+        cursor.execute(
+            f"UPDATE {backend.citar(nombre_tabla)} SET {backend.citar('Contraseña')} = ? "
+            f"WHERE {backend.citar('email')} = ?",
+            (hash_nuevo, email),
+        )
+        cambiadas = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    invalidar_usuario(email)
+    return cambiadas > 0
+
+@dataclass
+class FalloRegistro:
+    indice: int   # posición del usuario en la entrada
+    email: str
+    motivo: str
+
+@dataclass
+class ResultadoRegistro:
+    insertados: int = 0
+    fallos: list = field(default_factory=list)
+
+def insertar_lote(conn, backend, nombre_tabla, filas):
+    """
+    Inserta [(nombre, email, hash, fecha), ...] en una sola transacción.
+    Si el lote falla se reintenta fila a fila para aislar las malas.
+    Devuelve [(posición en `filas`, motivo), ...] de las que no entraron.
+    """
+    sql = f"INSERT INTO {backend.citar(nombre_tabla)}(nombre,email,contraseña,fecha_registro) VALUES ({backend.marcadores(4)})"
+    cursor = conn.cursor()
+    backend.preparar_cursor_masivo(cursor)
     try:
-        cursor = conexion.cursor()
-        cursor.execute(f"SELECT Contraseña FROM Usuarios WHERE email = ?;",(email))
-        contrag = cursor
-        contraseña = crear_hash_seguro(contraseña_user)
-        print({contrag})
-        entrada = verificar_contraseña(contrag,contraseña)
-        if True == entrada:
+        cursor.executemany(sql, filas)
+        conn.commit()
+        for fila in filas:
+            _usuario_registrado(fila[1])
+        return []
+    except Exception:
+        conn.rollback()
+
+    fallos = []
+    for pos, fila in enumerate(filas):
+        try:
+            cursor.execute(sql, fila)
+            conn.commit()
+            _usuario_registrado(fila[1])
+        except Exception as e:
+            conn.rollback()
+            fallos.append((pos, str(e)))
+    return fallos
+
+def register_many(nombre_tabla, conexion, usuarios, tamaño_lote=500,
+                  latencia_objetivo=0.5, lote_min=50, lote_max=5000):
+    """
+    Registra muchos usuarios [(nombre, email, contraseña), ...] por lotes:
+    valida, hashea e inserta cada lote con executemany en una transacción.
+    Los usuarios inválidos o duplicados se reportan en `fallos` sin
+    abortar el resto. El tamaño del lote se ajusta para que cada inserción
+    tarde cerca de `latencia_objetivo` segundos.
+    """
+    resultado = ResultadoRegistro()
+    fecha = datetime.now()
+    usuarios = iter(usuarios)
+    indice = 0
+    marcar_escritura = getattr(conexion, "marcar_escritura", None)  # enrutador: read-your-writes
+
+    while True:
+        lote = list(islice(usuarios, tamaño_lote))
+        if not lote:
+            break
+
+        validos, indices = [], []
+        for i, (nombre, email, contraseña) in enumerate(lote, start=indice):
+            email = normalizar_email(email)
+            if not validar_email(email):
+                resultado.fallos.append(FalloRegistro(i, email, "Email inválido"))
+            elif not validar_contraseña(contraseña):
+                resultado.fallos.append(FalloRegistro(i, email, "Contraseña débil"))
+            else:
+                validos.append((nombre, email, contraseña))
+                indices.append(i)
+        indice += len(lote)
+        if not validos:
+            continue
+
+        hashes = obtener_ejecutor().hash_muchos([c for _, _, c in validos])
+        filas = [(nombre, email, h, fecha) for (nombre, email, _), h in zip(validos, hashes)]
+
+        # La conexión se pide ya con los hashes hechos: Argon2 no ocupa el pool
+        with usar_conexion(conexion) as (conn, backend):
+            inicio_lote = time.perf_counter()
+            fallos = insertar_lote(conn, backend, nombre_tabla, filas)
+            duracion = time.perf_counter() - inicio_lote
+
+        for pos, motivo in fallos:
+            resultado.fallos.append(FalloRegistro(indices[pos], filas[pos][1], motivo))
+        resultado.insertados += len(filas) - len(fallos)
+        if marcar_escritura is not None:
+            fallidas = {pos for pos, _ in fallos}
+            for pos, fila in enumerate(filas):
+                if pos not in fallidas:
+                    marcar_escritura(fila[1])
+
+        # Lote ideal según la latencia medida, suavizado con el actual
+        if duracion > 0 and not fallos:
+            ideal = len(filas) * latencia_objetivo / duracion
+            tamaño_lote = int(min(lote_max, max(lote_min, (tamaño_lote + ideal) / 2)))
+
+    resultado.fallos.sort(key=lambda f: f.indice)
+    return resultado
+
+
+class EstadoAutenticacion(Enum):
+    EXITO = "exito"
+    USUARIO_DESCONOCIDO = "usuario_desconocido"
+    CONTRASEÑA_INCORRECTA = "contraseña_incorrecta"
+    BLOQUEADO = "bloqueado"
+
+@dataclass
+class ResultadoAutenticacion:
+    estado: EstadoAutenticacion
+    id_usuario: int = None
+    reintentar_en: float = 0.0  # segundos, solo si está BLOQUEADO
+
+    @property
+    def ok(self) -> bool:
+        return self.estado is EstadoAutenticacion.EXITO
+
+def buscar_credenciales(email, conexion=None, nombre_tabla="Usuarios"):
+    """(id, hash guardado) del usuario, o None. Lee una sola fila y dos columnas."""
+    email = normalizar_email(email)
+    with usar_conexion(conexion, solo_lectura=True, clave=email) as (conn, backend):
+        cursor = conn.cursor()
+        cursor.execute(
+            backend.select(f"{backend.citar('id')}, {backend.citar('Contraseña')}",
+                           backend.citar(nombre_tabla), where=f"{backend.citar('email')} = ?", limite=1),
+            (email,),
+        )
+        fila = cursor.fetchone()
+        cursor.close()
+    return (fila[0], fila[1]) if fila else None
+
+def _grupos_lectura(emails, conexion):
+    """
+    Reparte `emails` en grupos que se leen con una misma conexión, como
+    [(clave, emails)]: uno por fragmento con un Fragmentador, y con un
+    Enrutador los escritos hace poco aparte, para que vayan al primario.
+    """
+    if hasattr(conexion, "fragmento_de"):
+        grupos = {}
+        for email in emails:
+            grupos.setdefault(conexion.fragmento_de(email), []).append(email)
+        return [(grupo[0], grupo) for grupo in grupos.values()]
+    if hasattr(conexion, "pegajosa"):
+        pegajosos, resto = [], []
+        for email in emails:
+            (pegajosos if conexion.pegajosa(email) else resto).append(email)
+        grupos = [(pegajosos[0], pegajosos)] if pegajosos else []
+        return grupos + ([(None, resto)] if resto else [])
+    return [(None, emails)]
+
+def buscar_credenciales_lote(emails, conexion=None, nombre_tabla="Usuarios"):
+    """
+    {email: (id, hash)} de los que existen, con un `WHERE email IN (...)`
+    cada MAX_EMAILS_IN emails en vez de una consulta por email.
+    """
+    emails = list(dict.fromkeys(normalizar_email(e) for e in emails))
+    encontrados = {}
+    for clave, grupo in _grupos_lectura(emails, conexion):
+        with usar_conexion(conexion, solo_lectura=True, clave=clave) as (conn, backend):
+            columnas = ", ".join(backend.citar(c) for c in ("id", "Contraseña", "email"))
+            cursor = conn.cursor()
+            try:
+                for inicio in range(0, len(grupo), MAX_EMAILS_IN):
+                    trozo = grupo[inicio:inicio + MAX_EMAILS_IN]
+                    cursor.execute(
+                        backend.select(columnas, backend.citar(nombre_tabla),
+                                       where=f"{backend.citar('email')} IN ({backend.marcadores(len(trozo))})"),
+                        tuple(trozo),
+                    )
+                    for id_usuario, hash_guardado, email in cursor.fetchall():
+                        encontrados[normalizar_email(email)] = (id_usuario, hash_guardado)
+            finally:
+                cursor.close()
+    return encontrados
+
+def autenticar(email, contraseña, conexion=None, cliente=None):
+    """
+    Login: una consulta para traer (id, hash) y un único verify de Argon2.
+    La conexión se devuelve al pool antes de verificar, así no queda
+    ocupada mientras dura el hash. Si el hash se hizo con parámetros
+    viejos se rehashea en segundo plano (ver cola_rehash.py).
+    `cliente` (IP, etc.) alimenta el limitador de intentos: lo que este
+    rechaza no llega ni a la base de datos ni a Argon2.
+    """
+    email = normalizar_email(email)
+    limitador = obtener_limitador()
+    if limitador is not None:
+        espera = limitador.permitir(email, cliente)
+        if espera:
+            return ResultadoAutenticacion(EstadoAutenticacion.BLOQUEADO, reintentar_en=espera)
+
+    resultado = _autenticar(email, contraseña, conexion)
+    if limitador is not None:
+        if resultado.ok:
+            limitador.registrar_exito(email, cliente)
+        else:
+            # También los emails que no existen (aunque los resuelva la caché
+            # negativa): si solo se bloquearan los reales, el bloqueo los delataría
+            limitador.registrar_fallo(email, cliente)
+    return resultado
+
+def _en_cache_negativo(email) -> bool:
+    cache = _cache_negativo
+    return cache is not None and cache.contiene(email)
+
+def _credenciales(email, conexion):
+    """(id, hash) del usuario o None; con caché negativa, los que no existen se recuerdan un rato."""
+    if _en_cache_negativo(email):
+        return None
+    return _buscar_credenciales(email, conexion)
+
+def _buscar_credenciales(email, conexion):
+    cargador = _cargador_para(conexion)
+    if cargador is not None:
+        cargar = lambda: cargador.obtener(email)
+    else:
+        cargar = lambda: buscar_credenciales(email, conexion)
+    cache = _cache_usuarios
+    credenciales = cache.obtener(email, cargar) if cache is not None else cargar()
+    negativo = _cache_negativo
+    if credenciales is None and negativo is not None:
+        negativo.agregar(email)
+    return credenciales
+
+def _resultado(email, contraseña, credenciales, valida, conexion):
+    """Traduce lo buscado y el verify a un ResultadoAutenticacion."""
+    if credenciales is None:
+        return ResultadoAutenticacion(EstadoAutenticacion.USUARIO_DESCONOCIDO)
+    id_usuario, hash_guardado = credenciales
+    if valida:
+        # Con una conexión suelta no se puede escribir desde otro hilo
+        if necesita_rehash(hash_guardado) and (conexion is None or hasattr(conexion, "conexion")):
+            from cola_rehash import obtener_cola_rehash
+            obtener_cola_rehash().encolar(id_usuario, hash_guardado, contraseña, conexion, email)
+        return ResultadoAutenticacion(EstadoAutenticacion.EXITO, id_usuario)
+    return ResultadoAutenticacion(EstadoAutenticacion.CONTRASEÑA_INCORRECTA, id_usuario)
+
+def _autenticar(email, contraseña, conexion):
+    credenciales = _credenciales(email, conexion)
+    # Sin usuario se verifica contra un hash ficticio: mismo trabajo que una
+    # contraseña incorrecta, así el tiempo no delata si el email existe
+    hash_guardado = credenciales[1] if credenciales else hash_ficticio()
+    valida = obtener_ejecutor().verificar(hash_guardado, contraseña)
+    return _resultado(email, contraseña, credenciales, valida, conexion)
+
+def inicio(email,contraseña_user,conexion=None):
+    try:
+        resultado = autenticar(email, contraseña_user, conexion)
+        if resultado.ok:
             print("todo exquisito mi rey")
         else:
             print("error mi rey")
+        return resultado.ok
     except Exception as e:
         print(f"Error al obtener datos: {e}")
-        return []
+        return False
 
 if __name__ == "__main__":
     
-    conexion = conectar_sql_server()
+    try:
+        conexion = obtener_pool()
+    except Exception as e:
+        print(f"Error al conectar: {e}")
+        conexion = None
     
     if conexion:
         try:
             tabla = "Usuarios"  
-            registros = mostrar_tabla(tabla, conexion)
+            total = mostrar_tabla(tabla, conexion)
             
             
-            if registros:
+            if total:
+                from estadisticas import estadisticas_tabla
+                stats = estadisticas_tabla(tabla, conexion)
                 print(f"\nEstadísticas:")
-                print(f"- Cantidad total de registros: {len(registros)}")
-                print(f"- Cantidad de columnas: {len(registros[0]) if registros else 0}")
+                print(f"- Cantidad total de registros: {stats.filas}")
+                print(f"- Cantidad de columnas: {stats.num_columnas}")
+                if stats.tamaño_bytes is not None:
+                    print(f"- Tamaño en disco: {stats.tamaño_bytes / 1024:.1f} KiB")
             else:
                 print("\nLa tabla está vacía o no existe")
                 
         finally:
             
-            conexion.close()
+            cerrar_pool()
             print("\nConexión cerrada")
     
\ No newline at end of file
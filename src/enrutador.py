@@ -0,0 +1,187 @@
+"""
+Separación de lecturas y escrituras entre un primario y sus réplicas.
+
+    enrutador = Enrutador(SQLServerBackend(PRIMARIO),
+                          replicas=[(SQLServerBackend(REPLICA_1), 2), SQLServerBackend(REPLICA_2)])
+    autenticar(email, contraseña, enrutador)      # la búsqueda va a una réplica
+    register("Usuarios", enrutador, ...)          # la escritura va al primario
+
+Un Enrutador se pasa en lugar de un pool a cualquier función que acepte
+`conexion`. Las que solo leen (mostrar_tabla, buscar_credenciales,
+estadisticas_tabla, paginar_usuarios) piden `solo_lectura=True` y van a
+una réplica por round-robin ponderado; el resto va al primario.
+
+Read-your-writes: tras escribir con una `clave` (el email), las lecturas
+con esa misma clave van al primario durante `ventana` segundos, que debe
+cubrir el retraso de replicación. Así el primer login de un usuario
+recién registrado no depende de que la réplica ya lo tenga. Esta memoria
+es de cada proceso.
+
+Si una réplica no da conexión se aparta `reintento` segundos y se usa la
+siguiente. Una que solo está ocupada (su pool lleno) no se espera más de
+`espera_replica` ni se aparta: se pasa a la siguiente. Sin réplicas
+disponibles se lee del primario.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import conexion_sql
+from pool_conexiones import PoolAgotado, PoolConexiones
+
+
+class _Nodo:
+    __slots__ = ("pool", "peso", "actual", "caido_hasta")
+
+    def __init__(self, pool, peso):
+        if peso <= 0:
+            raise ValueError("El peso de una réplica debe ser positivo")
+        self.pool = pool
+        self.peso = peso
+        self.actual = 0       # round-robin ponderado "suave" (el de nginx)
+        self.caido_hasta = 0.0
+
+
+class Enrutador:
+    """
+    - primario / réplicas: Backend o PoolConexiones; las réplicas pueden
+      ir como (nodo, peso)
+    - ventana: segundos que una clave escrita se sigue leyendo del primario
+    - reintento: segundos que se aparta una réplica que falló
+    - espera_replica: segundos que se espera conexión de una réplica con
+      el pool lleno antes de probar la siguiente
+    - opciones_pool: se pasan a los pools que se creen a partir de backends
+    """
+
+    def __init__(self, primario, replicas=(), ventana=5.0, reintento=10.0, max_claves=100_000,
+                 espera_replica=0.0, **opciones_pool):
+        self.primario = self._pool(primario, opciones_pool)
+        self.backend = self.primario.backend
+        self.ventana = ventana
+        self.reintento = reintento
+        self.espera_replica = espera_replica
+        self.max_claves = max_claves
+        self._replicas = []
+        for replica in replicas:
+            nodo, peso = replica if isinstance(replica, tuple) else (replica, 1)
+            # Abiertas a demanda: una réplica caída no impide arrancar
+            self._replicas.append(_Nodo(self._pool(nodo, dict(opciones_pool, min_tamaño=0)), peso))
+        self._escrituras = {}  # clave -> momento en que deja de ser pegajosa
+        self._lock = threading.Lock()
+        self._stats = {"primario": 0, "replicas": 0, "pegajosas": 0, "fallos_replica": 0,
+                       "replicas_ocupadas": 0}
+
+    @staticmethod
+    def _pool(nodo, opciones):
+        if isinstance(nodo, PoolConexiones):
+            return nodo
+        return conexion_sql.crear_pool(nodo, **opciones)
+
+    def marcar_escritura(self, clave):
+        """Las lecturas con `clave` irán al primario durante `ventana` segundos."""
+        ahora = time.monotonic()
+        with self._lock:
+            if len(self._escrituras) >= self.max_claves:
+                for vieja in [c for c, hasta in self._escrituras.items() if hasta <= ahora]:
+                    del self._escrituras[vieja]
+                if len(self._escrituras) >= self.max_claves:
+                    self._escrituras.clear()  # mejor leer de réplica que crecer sin fin
+            self._escrituras[clave] = ahora + self.ventana
+
+    def pegajosa(self, clave) -> bool:
+        """True si las lecturas de `clave` todavía van al primario."""
+        with self._lock:
+            return self._pegajosa(clave, time.monotonic())
+
+    def _pegajosa(self, clave, ahora) -> bool:
+        hasta = self._escrituras.get(clave)
+        if hasta is None:
+            return False
+        if hasta <= ahora:
+            del self._escrituras[clave]
+            return False
+        return True
+
+    def _elegir_replica(self, ahora, excluir):
+        """Round-robin ponderado suave entre las réplicas disponibles."""
+        disponibles = [n for n in self._replicas if n.caido_hasta <= ahora and n not in excluir]
+        if not disponibles:
+            return None
+        total = 0
+        elegido = None
+        for nodo in disponibles:
+            nodo.actual += nodo.peso
+            total += nodo.peso
+            if elegido is None or nodo.actual > elegido.actual:
+                elegido = nodo
+        elegido.actual -= total
+        return elegido
+
+    def _obtener_lectura(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            if clave is not None and self._pegajosa(clave, ahora):
+                self._stats["pegajosas"] += 1
+                self._stats["primario"] += 1
+                return self.primario, self.primario.obtener()
+        probadas = []
+        while True:
+            with self._lock:
+                nodo = self._elegir_replica(ahora, probadas)
+            if nodo is None:
+                break
+            try:
+                conn = nodo.pool.obtener(timeout=self.espera_replica)
+            except PoolAgotado:
+                with self._lock:
+                    self._stats["replicas_ocupadas"] += 1  # ocupada, no caída
+                probadas.append(nodo)
+                continue
+            except Exception:
+                with self._lock:
+                    nodo.caido_hasta = time.monotonic() + self.reintento
+                    self._stats["fallos_replica"] += 1
+                probadas.append(nodo)
+                continue
+            with self._lock:
+                self._stats["replicas"] += 1
+            return nodo.pool, conn
+        with self._lock:
+            self._stats["primario"] += 1
+        return self.primario, self.primario.obtener()
+
+    @contextmanager
+    def conexion(self, solo_lectura=False, clave=None):
+        """
+        Conexión del nodo que toque. Una escritura con `clave` que termina
+        sin excepción la deja pegajosa en el primario.
+        """
+        if solo_lectura:
+            pool, conn = self._obtener_lectura(clave)
+        else:
+            pool, conn = self.primario, self.primario.obtener()
+            with self._lock:
+                self._stats["primario"] += 1
+        try:
+            yield conn
+        except Exception:
+            pool.devolver(conn, error=True)
+            raise
+        except BaseException:
+            pool.devolver(conn)
+            raise
+        pool.devolver(conn)
+        if not solo_lectura and clave is not None:
+            self.marcar_escritura(clave)
+
+    def cerrar(self):
+        self.primario.cerrar()
+        for nodo in self._replicas:
+            nodo.pool.cerrar()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._stats)
+            datos["claves_pegajosas"] = len(self._escrituras)
+            datos["replicas_caidas"] = sum(n.caido_hasta > time.monotonic() for n in self._replicas)
+        return datos
@@ -0,0 +1,99 @@
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+
+from conexion_sql import obtener_pool, usar_conexion
+
+
+@dataclass
+class ColumnaInfo:
+    nombre: str
+    tipo: str
+    nulable: bool
+    nulos: int = None      # solo si se pidió perfilar
+    distintos: int = None
+
+
+@dataclass
+class EstadisticasTabla:
+    tabla: str
+    filas: int
+    tamaño_bytes: int      # None si el motor no lo expone
+    columnas: list = field(default_factory=list)
+    generado_en: float = 0.0
+
+    @property
+    def num_columnas(self) -> int:
+        return len(self.columnas)
+
+
+# fuente (pool, enrutador o conexión) -> {(tabla, perfilar): (calculado_en, EstadisticasTabla)};
+# por el objeto y no por id(): un id se reutiliza cuando la fuente se recoge
+_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+
+def _perfilar(conn, backend, tabla, columnas):
+    """Nulos y distintos por columna con un único SELECT de agregados."""
+    partes = []
+    for col in columnas:
+        c = backend.citar(col.nombre)
+        partes.append(f"COUNT(*) - COUNT({c})")
+        partes.append(f"COUNT(DISTINCT {c})")
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(partes)} FROM {backend.citar(tabla)}")
+    fila = cursor.fetchone()
+    cursor.close()
+    for i, col in enumerate(columnas):
+        col.nulos = int(fila[2 * i])
+        col.distintos = int(fila[2 * i + 1])
+
+
+def estadisticas_tabla(nombre_tabla="Usuarios", conexion=None, ttl=60.0,
+                       perfilar=False) -> EstadisticasTabla:
+    """
+    Filas, columnas y tamaño de la tabla sacados del catálogo del motor
+    (o de agregados que corren en el servidor), nunca bajando filas.
+    Con perfilar=True calcula también nulos/distintos por columna.
+    Se reutiliza un resultado de hace menos de `ttl` segundos (ttl=0
+    siempre recalcula).
+    """
+    fuente = conexion if conexion is not None else obtener_pool()
+    clave = (nombre_tabla, perfilar)
+    with _cache_lock:
+        guardado = _cache.get(fuente, {}).get(clave) if _se_puede_cachear(fuente) else None
+        if guardado and time.monotonic() - guardado[0] < ttl:
+            return guardado[1]
+
+    with usar_conexion(conexion, solo_lectura=True) as (conn, backend):
+        columnas = [ColumnaInfo(nombre, tipo, nulable)
+                    for nombre, tipo, nulable in backend.columnas_tabla(conn, nombre_tabla)]
+        if not columnas:
+            raise ValueError(f"La tabla {nombre_tabla!r} no existe")
+        filas, tamaño = backend.conteo_y_tamaño(conn, nombre_tabla)
+        if perfilar:
+            _perfilar(conn, backend, nombre_tabla, columnas)
+
+    resultado = EstadisticasTabla(nombre_tabla, filas, tamaño, columnas, time.time())
+    if _se_puede_cachear(fuente):
+        with _cache_lock:
+            _cache.setdefault(fuente, {})[clave] = (time.monotonic(), resultado)
+    return resultado
+
+
+def _se_puede_cachear(fuente) -> bool:
+    # Algunas conexiones de driver (pyodbc) no admiten weakref: esas no se cachean
+    try:
+        weakref.ref(fuente)
+    except TypeError:
+        return False
+    return True
+
+
+def invalidar_estadisticas(nombre_tabla=None):
+    """Borra la caché (de una tabla o entera)."""
+    with _cache_lock:
+        for guardados in list(_cache.values()):
+            for clave in [c for c in guardados if nombre_tabla is None or c[0] == nombre_tabla]:
+                del guardados[clave]
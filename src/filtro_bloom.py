@@ -0,0 +1,135 @@
+"""
+Filtro de Bloom con los emails registrados, para no preguntar a la base
+de datos por cada alta.
+
+    filtro = FiltroBloom.desde_tabla()                  # un recorrido por lotes
+    conexion_sql.configurar_filtro_emails(filtro)       # register y el servidor lo usan
+    filtro.guardar("emails.bloom")                      # el próximo arranque no recorre
+    filtro = FiltroBloom.cargar("emails.bloom")
+
+"No está" es seguro y la comprobación de existencia se salta; "puede
+estar" (un `error` de las veces, aunque no esté) se confirma con
+conexion_sql.email_registrado, que tira de los cachés antes que de la
+base. Cada alta lo actualiza vía _usuario_registrado.
+
+Las altas hechas en otro proceso, o después de guardar el archivo, no
+están en el filtro: esas se cuelan hasta el INSERT y las para el índice
+único UX_Usuarios_email, como sin filtro. Los emails no se pueden
+quitar; al borrar usuarios solo sube la tasa de falsos positivos.
+"""
+import hashlib
+import math
+import os
+import struct
+import threading
+
+import conexion_sql
+from estadisticas import estadisticas_tabla
+from security import normalizar_email
+
+_CABECERA = struct.Struct(">4sQIQQd")  # firma, bits, funciones hash, elementos, capacidad, error
+_FIRMA = b"BLM1"
+
+
+class FiltroBloom:
+    """
+    - capacidad: emails previstos; con más, la tasa de error sube
+    - error: tasa de falsos positivos buscada a plena capacidad
+    """
+
+    def __init__(self, capacidad=1_000_000, error=0.01):
+        if capacidad < 1 or not 0 < error < 1:
+            raise ValueError("La capacidad debe ser positiva y el error estar entre 0 y 1")
+        bits = math.ceil(-capacidad * math.log(error) / math.log(2) ** 2)
+        self._iniciar(capacidad, error, bits, max(1, round(bits / capacidad * math.log(2))), 0)
+
+    def _iniciar(self, capacidad, error, bits, funciones, elementos, datos=None):
+        self.capacidad = capacidad
+        self.error = error
+        self.bits = bits
+        self.funciones = funciones
+        self.elementos = elementos
+        self._datos = datos if datos is not None else bytearray((bits + 7) // 8)
+        self._lock = threading.Lock()  # |= sobre un byte no es atómico entre hilos
+        self._stats = {"descartados": 0, "posibles": 0}  # sin lock: aproximados
+
+    def _posiciones(self, email):
+        # Doble hash (Kirsch-Mitzenmacher): k posiciones a partir de dos valores de 64 bits
+        resumen = hashlib.blake2b(normalizar_email(email).encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(resumen[:8], "big")
+        h2 = int.from_bytes(resumen[8:], "big") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.funciones)]
+
+    def agregar(self, email):
+        posiciones = self._posiciones(email)
+        with self._lock:
+            for p in posiciones:
+                self._datos[p >> 3] |= 1 << (p & 7)
+            self.elementos += 1
+
+    def puede_estar(self, email) -> bool:
+        """False: seguro que no está. True: puede que sí."""
+        datos = self._datos
+        presente = all(datos[p >> 3] & (1 << (p & 7)) for p in self._posiciones(email))
+        self._stats["posibles" if presente else "descartados"] += 1
+        return presente
+
+    __contains__ = puede_estar
+
+    def __len__(self):
+        return self.elementos
+
+    @classmethod
+    def desde_tabla(cls, conexion=None, nombre_tabla="Usuarios", capacidad=None, error=0.01,
+                    tamaño_lote=10_000):
+        """
+        Construye el filtro leyendo solo la columna email por lotes. Sin
+        `capacidad` se dimensiona al doble de las filas actuales (catálogo
+        del motor), para dejar sitio a las altas.
+        """
+        fuentes = list(getattr(conexion, "fragmentos", {}).values()) or [conexion]
+        if capacidad is None:
+            filas = sum(estadisticas_tabla(nombre_tabla, fuente).filas or 0 for fuente in fuentes)
+            capacidad = max(2 * filas, 100_000)
+        filtro = cls(capacidad, error)
+        for fuente in fuentes:
+            for (email,) in conexion_sql.leer_tabla(nombre_tabla, fuente, columnas=["email"],
+                                                    tamaño_lote=tamaño_lote):
+                filtro.agregar(email)
+        return filtro
+
+    def guardar(self, ruta):
+        """Escribe el filtro en `ruta` (reemplazo atómico)."""
+        temporal = f"{ruta}.tmp"
+        with self._lock:
+            cabecera = _CABECERA.pack(_FIRMA, self.bits, self.funciones, self.elementos,
+                                      self.capacidad, self.error)
+            datos = bytes(self._datos)
+        with open(temporal, "wb") as f:
+            f.write(cabecera)
+            f.write(datos)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, "rb") as f:
+            firma, bits, funciones, elementos, capacidad, error = _CABECERA.unpack(f.read(_CABECERA.size))
+            if firma != _FIRMA:
+                raise ValueError(f"{ruta} no es un filtro de emails")
+            datos = bytearray(f.read())
+        if len(datos) != (bits + 7) // 8:
+            raise ValueError(f"{ruta} está truncado")
+        filtro = cls.__new__(cls)
+        filtro._iniciar(capacidad, error, bits, funciones, elementos, datos)
+        return filtro
+
+    def tasa_error(self, elementos=None) -> float:
+        """Falsos positivos esperados con `elementos` dentro (por defecto los actuales)."""
+        n = self.elementos if elementos is None else elementos
+        return (1 - math.exp(-self.funciones * n / self.bits)) ** self.funciones
+
+    def estadisticas(self) -> dict:
+        datos = dict(self._stats)
+        datos.update(elementos=self.elementos, bits=self.bits, funciones=self.funciones,
+                     tasa_error=self.tasa_error())
+        return datos
@@ -0,0 +1,169 @@
+"""
+Importa usuarios desde un CSV o JSONL (campos: nombre, email, contraseña).
+
+    python importar_usuarios.py usuarios.csv --checkpoint importacion.json
+
+Las filas se leen en streaming, los hashes Argon2 se calculan en un pool
+de procesos y cada lote se inserta con executemany. Después de cada lote
+se guarda el progreso en el checkpoint: si la importación se cae, volver
+a lanzar el mismo comando continúa donde se quedó.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from conexion_sql import insertar_lote, usar_conexion
+from security import _hasher, crear_hash_seguro, normalizar_email, validar_contraseña, validar_email
+
+
+def leer_filas(ruta, formato=None):
+    """Genera (nombre, email, contraseña) sin cargar el archivo entero."""
+    formato = formato or ("jsonl" if ruta.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(ruta, encoding="utf-8", newline="") as archivo:
+        if formato == "csv":
+            for fila in csv.DictReader(archivo):
+                yield fila.get("nombre", ""), fila.get("email", ""), fila.get("contraseña", "")
+        elif formato == "jsonl":
+            for linea in archivo:
+                if linea.strip():
+                    fila = json.loads(linea)
+                    yield fila.get("nombre", ""), fila.get("email", ""), fila.get("contraseña", "")
+        else:
+            raise ValueError(f"Formato no soportado: {formato!r}")
+
+
+def _memoria_disponible():
+    try:
+        with open("/proc/meminfo") as f:
+            for linea in f:
+                if linea.startswith("MemAvailable:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def procesos_recomendados():
+    """Un proceso por núcleo, sin pasar de lo que cabe en RAM (memory_cost por hash)."""
+    nucleos = os.cpu_count() or 1
+    memoria = _memoria_disponible()
+    if memoria is None:
+        return nucleos
+    por_hash = _hasher.memory_cost * 1024
+    # Deja un 25 % de margen para el resto del sistema
+    return max(1, min(nucleos, int(memoria * 0.75) // por_hash))
+
+
+def _preparar(fila):
+    """Corre en los procesos hijos: valida y hashea una fila."""
+    nombre, email, contraseña = fila
+    email = normalizar_email(email)
+    if not validar_email(email):
+        return None, email, "Email inválido"
+    if not validar_contraseña(contraseña):
+        return None, email, "Contraseña débil"
+    return (nombre, email, crear_hash_seguro(contraseña)), email, None
+
+
+def _leer_checkpoint(ruta, archivo):
+    if not ruta or not os.path.exists(ruta):
+        return {"archivo": archivo, "procesadas": 0, "insertados": 0, "fallos": 0}
+    with open(ruta, encoding="utf-8") as f:
+        estado = json.load(f)
+    if estado.get("archivo") != archivo:
+        raise SystemExit(f"El checkpoint {ruta} es de otro archivo: {estado.get('archivo')}")
+    return estado
+
+
+def _guardar_checkpoint(ruta, estado):
+    if not ruta:
+        return
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)  # atómico: nunca queda un checkpoint a medias
+
+
+def importar(ruta, formato=None, tabla="Usuarios", tamaño_lote=1000, procesos=None,
+             checkpoint=None, rechazos=None, conexion=None):
+    archivo = os.path.abspath(ruta)
+    estado = _leer_checkpoint(checkpoint, archivo)
+    filas = islice(leer_filas(ruta, formato), estado["procesadas"], None)
+    if estado["procesadas"]:
+        print(f"Reanudando después de {estado['procesadas']} filas")
+
+    procesos = procesos or procesos_recomendados()
+    salida_rechazos = open(rechazos, "a", encoding="utf-8") if rechazos else None
+
+    def guardar(lote, resultados):
+        fecha = datetime.now()
+        buenas, malas = [], []
+        for i, (datos, email, motivo) in enumerate(resultados, start=estado["procesadas"]):
+            if datos is None:
+                malas.append((i, email, motivo))
+            else:
+                buenas.append((i, datos + (fecha,)))
+        if buenas:
+            with usar_conexion(conexion) as (conn, backend):
+                fallos = insertar_lote(conn, backend, tabla, [d for _, d in buenas])
+            malas.extend((buenas[pos][0], buenas[pos][1][1], motivo) for pos, motivo in fallos)
+            estado["insertados"] += len(buenas) - len(fallos)
+        estado["fallos"] += len(malas)
+        estado["procesadas"] += len(lote)
+        if salida_rechazos:
+            for fila, email, motivo in sorted(malas):
+                salida_rechazos.write(json.dumps({"fila": fila, "email": email, "motivo": motivo}) + "\n")
+            salida_rechazos.flush()
+        _guardar_checkpoint(checkpoint, estado)
+        print(f"{estado['procesadas']} filas procesadas, {estado['insertados']} insertadas, "
+              f"{estado['fallos']} rechazadas")
+
+    try:
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+            pendiente = None
+            while True:
+                lote = list(islice(filas, tamaño_lote))
+                if not lote:
+                    break
+                # map encola el lote ya: se hashea mientras se inserta el anterior
+                resultados = ejecutor.map(_preparar, lote, chunksize=max(1, len(lote) // (procesos * 4)))
+                if pendiente:
+                    guardar(*pendiente)
+                pendiente = (lote, resultados)
+            if pendiente:
+                guardar(*pendiente)
+    finally:
+        if salida_rechazos:
+            salida_rechazos.close()
+    return estado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa usuarios desde CSV/JSONL")
+    parser.add_argument("archivo")
+    parser.add_argument("--formato", choices=("csv", "jsonl"))
+    parser.add_argument("--tabla", default="Usuarios")
+    parser.add_argument("--lote", type=int, default=1000, help="filas por lote")
+    parser.add_argument("--procesos", type=int, help="procesos de hashing (por defecto según CPU y RAM)")
+    parser.add_argument("--checkpoint", help="archivo de progreso para poder reanudar")
+    parser.add_argument("--rechazos", help="JSONL donde se anotan las filas rechazadas")
+    args = parser.parse_args(argv)
+
+    estado = importar(args.archivo, args.formato, args.tabla, args.lote, args.procesos,
+                      args.checkpoint, args.rechazos)
+    print(f"\nListo: {estado['insertados']} insertados, {estado['fallos']} rechazados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
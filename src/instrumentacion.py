@@ -0,0 +1,218 @@
+import bisect
+import functools
+import logging
+import os
+import re
+import threading
+import time
+
+log_lentas = logging.getLogger("conexion_sql.lentas")
+
+# Límites de las cubetas del histograma: de 10 µs a ~2 min, cada una un 25 % más
+# ancha que la anterior. Los percentiles salen con ese error como mucho.
+_LIMITES = []
+_limite = 10e-6
+while _limite < 120:
+    _LIMITES.append(_limite)
+    _limite *= 1.25
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
+def huella(sql: str) -> str:
+    """
+    Normaliza una sentencia para agrupar las que solo cambian en valores:
+    literales -> ?, listas IN (?, ?, ...) -> (...), espacios colapsados.
+    """
+    sql = _LITERALES.sub("?", sql)
+    sql = _LISTAS.sub("(...)", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+class _Estadistica:
+    __slots__ = ("llamadas", "errores", "filas", "total", "maximo", "cubetas")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.filas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.cubetas = [0] * (len(_LIMITES) + 1)
+
+    def percentil(self, q):
+        objetivo = q * self.llamadas
+        acumulado = 0
+        for i, cuenta in enumerate(self.cubetas):
+            acumulado += cuenta
+            if acumulado >= objetivo and cuenta:
+                return min(self.maximo, _LIMITES[i] if i < len(_LIMITES) else self.maximo)
+        return self.maximo
+
+
+class Instrumentacion:
+    """
+    Métricas por huella de sentencia: llamadas, errores, filas devueltas e
+    histograma de latencias (p50/p95/p99). Lo que tarde más de
+    `umbral_lento` segundos se anota en el logger "conexion_sql.lentas".
+    """
+
+    def __init__(self, umbral_lento=0.5):
+        self.umbral_lento = umbral_lento
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, sql, duracion, error=False):
+        """Anota una ejecución; devuelve el acumulador para sumarle las filas."""
+        clave = huella(sql)
+        with self._lock:
+            stats = self._stats.get(clave)
+            if stats is None:
+                stats = self._stats[clave] = _Estadistica()
+            stats.llamadas += 1
+            stats.errores += error
+            stats.total += duracion
+            if duracion > stats.maximo:
+                stats.maximo = duracion
+            stats.cubetas[bisect.bisect_left(_LIMITES, duracion)] += 1
+        if duracion >= self.umbral_lento:
+            log_lentas.warning("%.1f ms%s: %s", duracion * 1e3, " (error)" if error else "", clave)
+        return stats
+
+    def sumar_filas(self, stats, filas):
+        with self._lock:
+            stats.filas += filas
+
+    def instantanea(self) -> dict:
+        """{huella: {llamadas, errores, filas, media_ms, p50_ms, p95_ms, p99_ms, max_ms}}"""
+        with self._lock:
+            copia = {clave: (s.llamadas, s.errores, s.filas, s.total, s.maximo, list(s.cubetas))
+                     for clave, s in self._stats.items()}
+        resultado = {}
+        for clave, (llamadas, errores, filas, total, maximo, cubetas) in copia.items():
+            stats = _Estadistica()
+            stats.llamadas, stats.maximo, stats.cubetas = llamadas, maximo, cubetas
+            resultado[clave] = {
+                "llamadas": llamadas,
+                "errores": errores,
+                "filas": filas,
+                "media_ms": total / llamadas * 1e3 if llamadas else 0.0,
+                "p50_ms": stats.percentil(0.50) * 1e3,
+                "p95_ms": stats.percentil(0.95) * 1e3,
+                "p99_ms": stats.percentil(0.99) * 1e3,
+                "max_ms": maximo * 1e3,
+            }
+        return resultado
+
+    def reiniciar(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class CursorInstrumentado:
+    """Envuelve un cursor DB-API; lo que no se mide se delega tal cual."""
+
+    __slots__ = ("_cursor", "_registro", "_stats")
+
+    def __init__(self, cursor, registro):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_registro", registro)
+        object.__setattr__(self, "_stats", None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._cursor, nombre, valor)  # p.ej. fast_executemany, arraysize
+
+    def _medir(self, metodo, sql, args):
+        inicio = time.perf_counter()
+        try:
+            metodo(sql, *args)
+        except Exception:
+            self._registro.registrar(sql, time.perf_counter() - inicio, error=True)
+            raise
+        object.__setattr__(self, "_stats", self._registro.registrar(sql, time.perf_counter() - inicio))
+        return self
+
+    def execute(self, sql, *args):
+        return self._medir(self._cursor.execute, sql, args)
+
+    def executemany(self, sql, *args):
+        return self._medir(self._cursor.executemany, sql, args)
+
+    def _contar(self, filas):
+        if filas and self._stats is not None:
+            self._registro.sumar_filas(self._stats, filas)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        self._contar(fila is not None)
+        return fila
+
+    def fetchmany(self, *args):
+        filas = self._cursor.fetchmany(*args)
+        self._contar(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._contar(len(filas))
+        return filas
+
+    def __iter__(self):
+        for fila in self._cursor:
+            self._contar(1)
+            yield fila
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionInstrumentada:
+    """Envuelve una conexión para que sus cursores se midan."""
+
+    __slots__ = ("_conn", "_registro")
+
+    def __init__(self, conn, registro):
+        self._conn = conn
+        self._registro = registro
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def cursor(self):
+        return CursorInstrumentado(self._conn.cursor(), self._registro)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+# Activa por defecto; HACKATHON_INSTRUMENTAR=0 la apaga
+_instrumentacion = None if os.environ.get("HACKATHON_INSTRUMENTAR") == "0" else Instrumentacion()
+
+
+def obtener_instrumentacion():
+    """Registro de métricas del proceso (None si está desactivado)."""
+    return _instrumentacion
+
+
+def configurar_instrumentacion(instrumentacion):
+    """Cambia el registro del proceso; None lo desactiva (afecta a conexiones nuevas)."""
+    global _instrumentacion
+    _instrumentacion = instrumentacion
@@ -0,0 +1,157 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+class _Cubeta:
+    __slots__ = ("fichas", "ultimo", "fallos", "bloqueado_hasta")
+
+    def __init__(self, fichas, ahora):
+        self.fichas = fichas
+        self.ultimo = ahora
+        self.fallos = 0
+        self.bloqueado_hasta = 0.0
+
+
+class CubetasFragmentadas:
+    """
+    Token buckets por clave repartidos en `fragmentos` tablas, cada una con
+    su lock, para que los hilos no se peleen por uno solo. Cada clave ocupa
+    un objeto pequeño de tamaño fijo; pasado `max_claves` se expulsan las
+    menos usadas (LRU).
+
+    - capacidad / recarga_por_s: ráfaga permitida y ritmo sostenido
+    - umbral_bloqueo: fallos seguidos a partir de los que se bloquea la
+      clave durante bloqueo_base * 2^(fallos - umbral), hasta bloqueo_max
+    """
+
+    def __init__(self, capacidad=10, recarga_por_s=10 / 60, umbral_bloqueo=5,
+                 bloqueo_base=1.0, bloqueo_max=900.0, max_claves=100_000, fragmentos=16):
+        self.capacidad = capacidad
+        self.recarga_por_s = recarga_por_s
+        self.umbral_bloqueo = umbral_bloqueo
+        self.bloqueo_base = bloqueo_base
+        self.bloqueo_max = bloqueo_max
+        self._max_por_fragmento = max(1, max_claves // fragmentos)
+        self._fragmentos = [(threading.Lock(), OrderedDict()) for _ in range(fragmentos)]
+
+    def _fragmento(self, clave):
+        return self._fragmentos[zlib.crc32(clave.encode("utf-8")) % len(self._fragmentos)]
+
+    def _cubeta(self, tabla, clave, ahora):
+        cubeta = tabla.get(clave)
+        if cubeta is None:
+            cubeta = tabla[clave] = _Cubeta(self.capacidad, ahora)
+            if len(tabla) > self._max_por_fragmento:
+                tabla.popitem(last=False)
+        else:
+            tabla.move_to_end(clave)
+            cubeta.fichas = min(self.capacidad, cubeta.fichas + (ahora - cubeta.ultimo) * self.recarga_por_s)
+            cubeta.ultimo = ahora
+        return cubeta
+
+    def espera(self, clave, ahora) -> float:
+        """Segundos hasta que la clave pueda intentarlo (0 = ya)."""
+        lock, tabla = self._fragmento(clave)
+        with lock:
+            cubeta = self._cubeta(tabla, clave, ahora)
+            if cubeta.bloqueado_hasta > ahora:
+                return cubeta.bloqueado_hasta - ahora
+            if cubeta.fichas < 1:
+                return (1 - cubeta.fichas) / self.recarga_por_s
+            return 0.0
+
+    def consumir(self, clave, ahora):
+        lock, tabla = self._fragmento(clave)
+        with lock:
+            self._cubeta(tabla, clave, ahora).fichas -= 1
+
+    def fallo(self, clave, ahora):
+        lock, tabla = self._fragmento(clave)
+        with lock:
+            cubeta = self._cubeta(tabla, clave, ahora)
+            cubeta.fallos += 1
+            exceso = cubeta.fallos - self.umbral_bloqueo
+            if exceso >= 0:
+                cubeta.bloqueado_hasta = ahora + min(self.bloqueo_max, self.bloqueo_base * 2 ** min(exceso, 32))
+
+    def exito(self, clave):
+        lock, tabla = self._fragmento(clave)
+        with lock:
+            cubeta = tabla.get(clave)
+            if cubeta is not None:
+                cubeta.fallos = 0
+                cubeta.bloqueado_hasta = 0.0
+
+    def __len__(self):
+        return sum(len(tabla) for _, tabla in self._fragmentos)
+
+
+class LimitadorIntentos:
+    """
+    Frena los intentos de login por email y por cliente (IP, etc.) antes
+    de que lleguen a Argon2: un intento rechazado no gasta ni CPU ni RAM
+    de hashing.
+    """
+
+    def __init__(self, por_email=None, por_cliente=None):
+        # `is None`: unas cubetas vacías son falsas (tienen __len__)
+        self.por_email = por_email if por_email is not None else CubetasFragmentadas()
+        if por_cliente is None:
+            por_cliente = CubetasFragmentadas(capacidad=50, recarga_por_s=50 / 60, umbral_bloqueo=20)
+        self.por_cliente = por_cliente
+        self._lock = threading.Lock()
+        self._rechazados = 0
+
+    def _claves(self, email, cliente):
+        claves = [(self.por_email, "e:" + email)]
+        if cliente:
+            claves.append((self.por_cliente, "c:" + str(cliente)))
+        return claves
+
+    def permitir(self, email, cliente=None) -> float:
+        """
+        0 si el intento puede seguir (y gasta una ficha de cada cubeta);
+        si no, los segundos que hay que esperar.
+        """
+        ahora = time.monotonic()
+        claves = self._claves(email, cliente)
+        espera = max(cubetas.espera(clave, ahora) for cubetas, clave in claves)
+        if espera > 0:
+            with self._lock:
+                self._rechazados += 1
+            return espera
+        for cubetas, clave in claves:
+            cubetas.consumir(clave, ahora)
+        return 0.0
+
+    def registrar_fallo(self, email, cliente=None):
+        ahora = time.monotonic()
+        for cubetas, clave in self._claves(email, cliente):
+            cubetas.fallo(clave, ahora)
+
+    def registrar_exito(self, email, cliente=None):
+        # Solo se perdona al email: un cliente que prueba muchas cuentas
+        # no se limpia acertando una
+        self.por_email.exito("e:" + email)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            rechazados = self._rechazados
+        return {"rechazados": rechazados, "emails": len(self.por_email),
+                "clientes": len(self.por_cliente)}
+
+
+_limitador = LimitadorIntentos()
+
+
+def obtener_limitador():
+    """Limitador del proceso (None si se desactivó)."""
+    return _limitador
+
+
+def configurar_limitador(limitador):
+    """Cambia el limitador del proceso; None lo desactiva (benchmarks, pruebas)."""
+    global _limitador
+    _limitador = limitador
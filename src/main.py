@@ -1,6 +1,8 @@
-from conexion_sql import mostrar_tabla,conectar_sql_server,register,inicio
+from conexion_sql import mostrar_tabla,obtener_pool,register,inicio
+from security import precalentar
 
-conexion = conectar_sql_server()
+conexion = obtener_pool()
+precalentar()
 contraseña = input("Ingresa tu contraseña: ")
 email = input("Ingrese su email mi rey:")
 #nombre = input("nombre\n")
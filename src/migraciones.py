@@ -0,0 +1,173 @@
+"""
+Migraciones de esquema versionadas, para SQL Server y SQLite.
+
+    python migraciones.py            # aplica las pendientes
+    python migraciones.py --estado   # muestra qué está aplicado
+
+Cada migración tiene un número, una descripción y sus sentencias por
+dialecto. Las aplicadas se anotan en `schema_version` con un checksum:
+si alguien edita una migración ya aplicada, `migrar` se niega a seguir.
+Las migraciones nunca se editan; los cambios van en una nueva.
+"""
+import argparse
+import hashlib
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+
+from backends import DDL_USUARIOS_SQLITE, DDL_USUARIOS_SQLSERVER
+from conexion_sql import usar_conexion
+
+
+class MigracionAlterada(Exception):
+    """Una migración ya aplicada no coincide con su checksum."""
+
+
+@dataclass(frozen=True)
+class Migracion:
+    version: int
+    descripcion: str
+    sql: dict  # nombre del backend -> [sentencias]
+
+    def sentencias(self, backend) -> list:
+        try:
+            return self.sql[backend.nombre]
+        except KeyError:
+            raise ValueError(f"La migración {self.version} no tiene SQL para {backend.nombre}") from None
+
+    def checksum(self, backend) -> str:
+        return hashlib.sha256("\n;\n".join(self.sentencias(backend)).encode("utf-8")).hexdigest()
+
+
+MIGRACIONES = [
+    Migracion(1, "Tabla Usuarios", {
+        "sqlserver": [DDL_USUARIOS_SQLSERVER],
+        "sqlite": [DDL_USUARIOS_SQLITE],
+    }),
+    Migracion(2, "Emails normalizados y únicos", {
+        # El login busca por email exacto ya normalizado (strip + lower)
+        "sqlserver": [
+            "UPDATE dbo.Usuarios SET email = LOWER(LTRIM(RTRIM(email)))",
+            "CREATE UNIQUE INDEX UX_Usuarios_email ON dbo.Usuarios(email)",
+        ],
+        "sqlite": [
+            "UPDATE Usuarios SET email = lower(trim(email))",
+            "CREATE UNIQUE INDEX IF NOT EXISTS UX_Usuarios_email ON Usuarios(email)",
+        ],
+    }),
+    Migracion(3, "Índice cubriente para el login en SQL Server (email -> id, Contraseña)", {
+        # En SQL Server el índice único pasa a incluir Contraseña (id va
+        # gratis por ser la clave del clustered): el login es un solo seek.
+        # SQLite no tiene INCLUDE y su planificador siempre elige el índice
+        # único, así que un índice (email, Contraseña) solo encarecería las
+        # escrituras: ahí no se hace nada y el login sigue siendo un SEARCH
+        # por UX_Usuarios_email más la lectura de la fila.
+        "sqlserver": [
+            "CREATE UNIQUE INDEX UX_Usuarios_email ON dbo.Usuarios(email) "
+            "INCLUDE (Contraseña) WITH (DROP_EXISTING = ON)",
+        ],
+        "sqlite": [],
+    }),
+    Migracion(4, "Índice para paginar por fecha de registro", {
+        "sqlserver": [
+            "CREATE INDEX IX_Usuarios_fecha_registro ON dbo.Usuarios(fecha_registro, id)",
+        ],
+        "sqlite": [
+            "CREATE INDEX IF NOT EXISTS IX_Usuarios_fecha_registro ON Usuarios(fecha_registro, id)",
+        ],
+    }),
+]
+
+_DDL_VERSIONES = {
+    "sqlserver": """
+        IF OBJECT_ID(N'dbo.schema_version', N'U') IS NULL
+        CREATE TABLE dbo.schema_version (
+            version INT NOT NULL PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            aplicada_en DATETIME2 NOT NULL
+        )
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER NOT NULL PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            aplicada_en DATETIME NOT NULL
+        )
+    """,
+}
+
+
+def _aplicadas(conn, backend) -> dict:
+    cursor = conn.cursor()
+    cursor.execute(_DDL_VERSIONES[backend.nombre])
+    conn.commit()
+    cursor.execute("SELECT version, checksum FROM schema_version")
+    return {version: checksum.strip() for version, checksum in cursor.fetchall()}
+
+
+def estado(conexion=None, migraciones=MIGRACIONES) -> list:
+    """[(version, descripcion, aplicada), ...]"""
+    with usar_conexion(conexion) as (conn, backend):
+        aplicadas = _aplicadas(conn, backend)
+    return [(m.version, m.descripcion, m.version in aplicadas) for m in migraciones]
+
+
+def migrar(conexion=None, hasta=None, migraciones=MIGRACIONES, informar=None) -> list:
+    """
+    Aplica en orden las migraciones pendientes (hasta la versión `hasta`,
+    incluida). Cada una va en su propia transacción junto con su fila en
+    schema_version. Devuelve las versiones aplicadas.
+    """
+    aplicadas_ahora = []
+    with usar_conexion(conexion) as (conn, backend):
+        aplicadas = _aplicadas(conn, backend)
+        for migracion in sorted(migraciones, key=lambda m: m.version):
+            if hasta is not None and migracion.version > hasta:
+                break
+            checksum = migracion.checksum(backend)
+            if migracion.version in aplicadas:
+                if aplicadas[migracion.version] != checksum:
+                    raise MigracionAlterada(
+                        f"La migración {migracion.version} ({migracion.descripcion}) "
+                        f"cambió después de aplicarse"
+                    )
+                continue
+
+            if informar:
+                informar(f"Aplicando {migracion.version}: {migracion.descripcion}")
+            cursor = conn.cursor()
+            try:
+                for sentencia in migracion.sentencias(backend):
+                    cursor.execute(sentencia)
+                cursor.execute(
+                    "INSERT INTO schema_version(version, descripcion, checksum, aplicada_en) "
+                    f"VALUES ({backend.marcadores(4)})",
+                    (migracion.version, migracion.descripcion, checksum, datetime.now()),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            aplicadas_ahora.append(migracion.version)
+    return aplicadas_ahora
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones de esquema")
+    parser.add_argument("--hasta", type=int, help="última versión a aplicar")
+    parser.add_argument("--estado", action="store_true", help="solo mostrar el estado")
+    args = parser.parse_args(argv)
+
+    if args.estado:
+        for version, descripcion, aplicada in estado():
+            print(f"{'[x]' if aplicada else '[ ]'} {version:>3}  {descripcion}")
+        return 0
+    aplicadas = migrar(hasta=args.hasta, informar=print)
+    print(f"{len(aplicadas)} migraciones aplicadas" if aplicadas else "El esquema ya está al día")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
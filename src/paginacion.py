@@ -0,0 +1,100 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from conexion_sql import usar_conexion
+
+# orden -> (columna principal, desempate). Siempre se pagina por keyset
+# (WHERE clave > última vista), nunca por OFFSET.
+ORDENES = {
+    "fecha": ("fecha_registro", "id"),
+    "email": ("email", "id"),
+}
+
+COLUMNAS_LISTADO = ("id", "nombre", "Apellidos", "email", "fecha_registro")
+
+
+@dataclass
+class Pagina:
+    filas: list
+    columnas: list
+    siguiente: str = None  # token para pedir la página siguiente (None = última)
+
+
+def _codificar_valor(valor):
+    if isinstance(valor, datetime):
+        return {"dt": valor.isoformat()}
+    return valor
+
+
+def _decodificar_valor(valor):
+    if isinstance(valor, dict) and "dt" in valor:
+        return datetime.fromisoformat(valor["dt"])
+    return valor
+
+
+def codificar_token(orden: str, clave: tuple) -> str:
+    datos = {"o": orden, "k": [_codificar_valor(v) for v in clave]}
+    crudo = json.dumps(datos, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_token(token: str, orden: str) -> tuple:
+    try:
+        relleno = "=" * (-len(token) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(token + relleno))
+        if datos["o"] != orden or len(datos["k"]) != 2:
+            raise ValueError
+        return tuple(_decodificar_valor(v) for v in datos["k"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Token de paginación inválido") from None
+
+
+def paginar_usuarios(conexion=None, orden="fecha", tamaño=50, token=None,
+                     columnas=COLUMNAS_LISTADO, nombre_tabla="Usuarios") -> Pagina:
+    """
+    Devuelve una página de usuarios ordenada por (fecha_registro, id) o
+    por (email, id). El coste es el mismo en la página 1 que en la 1000:
+    la consulta arranca justo después de la última clave vista.
+    """
+    if orden not in ORDENES:
+        raise ValueError(f"Orden no soportado: {orden!r} (usa {', '.join(ORDENES)})")
+    if tamaño < 1:
+        raise ValueError("El tamaño de página debe ser al menos 1")
+
+    principal, desempate = ORDENES[orden]
+    columnas = list(columnas)
+    # Las columnas de la clave tienen que venir para poder armar el token
+    for col in (principal, desempate):
+        if col not in columnas:
+            columnas.append(col)
+    i_principal = columnas.index(principal)
+    i_desempate = columnas.index(desempate)
+
+    with usar_conexion(conexion, solo_lectura=True) as (conn, backend):
+        p, d = backend.citar(principal), backend.citar(desempate)
+        where, params = None, ()
+        if token:
+            ultimo_principal, ultimo_desempate = decodificar_token(token, orden)
+            where = f"({p} > ? OR ({p} = ? AND {d} > ?))"
+            params = (ultimo_principal, ultimo_principal, ultimo_desempate)
+
+        sql = backend.select(
+            ", ".join(backend.citar(c) for c in columnas),
+            backend.citar(nombre_tabla),
+            where=where,
+            orden=f"{p}, {d}",
+            limite=tamaño + 1,  # una de más para saber si hay otra página
+        )
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        filas = [tuple(f) for f in cursor.fetchall()]
+        cursor.close()
+
+    siguiente = None
+    if len(filas) > tamaño:
+        filas = filas[:tamaño]
+        ultima = filas[-1]
+        siguiente = codificar_token(orden, (ultima[i_principal], ultima[i_desempate]))
+    return Pagina(filas=filas, columnas=columnas, siguiente=siguiente)
@@ -0,0 +1,249 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolAgotado(Exception):
+    """No se pudo obtener una conexión del pool antes del timeout."""
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones reutilizables.
+
+    - min_tamaño / max_tamaño: conexiones que se mantienen abiertas / tope total
+    - timeout: segundos máximos esperando una conexión libre
+    - max_inactividad: segundos que una conexión puede quedarse sin usar
+      antes de cerrarse (nunca se baja de min_tamaño)
+    - pre_ping: comprueba con `sql_ping` antes de prestarla una conexión
+      que lleva más de `ping_tras` segundos sin usarse (0 = siempre); las
+      usadas hace poco se prestan sin más y, si fallan, se descartan al
+      devolverlas
+    - backend: dialecto de las conexiones (ver backends.py), opcional
+    """
+
+    def __init__(self, fabrica, min_tamaño=1, max_tamaño=10, timeout=30.0,
+                 max_inactividad=300.0, pre_ping=True, sql_ping="SELECT 1",
+                 backend=None, ping_tras=30.0):
+        if min_tamaño < 0 or max_tamaño < 1 or min_tamaño > max_tamaño:
+            raise ValueError("Tamaños de pool inválidos")
+        self._fabrica = fabrica
+        self.min_tamaño = min_tamaño
+        self.max_tamaño = max_tamaño
+        self.timeout = timeout
+        self.max_inactividad = max_inactividad
+        self.pre_ping = pre_ping
+        self.ping_tras = ping_tras
+        self.sql_ping = sql_ping
+        self.backend = backend
+
+        self._libres = deque()  # (conexion, momento_devolucion)
+        self._total = 0
+        self._cerrado = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "creadas": 0,
+            "cerradas": 0,
+            "prestamos": 0,
+            "esperas": 0,
+            "agotamientos": 0,
+            "pings": 0,
+            "ping_fallidos": 0,
+            "descartadas_error": 0,
+            "espera_total_s": 0.0,
+        }
+        self.llenar()
+
+    # ------------------------------------------------------------------
+    def llenar(self):
+        """Abre conexiones hasta llegar a min_tamaño."""
+        while True:
+            with self._cond:
+                if self._cerrado or self._total >= self.min_tamaño:
+                    return
+                self._total += 1
+            conn = self._crear()
+            with self._cond:
+                self._libres.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _crear(self):
+        try:
+            conn = self._fabrica()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["creadas"] += 1
+        return conn
+
+    def _cerrar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["cerradas"] += 1
+
+    def _ping(self, conn) -> bool:
+        with self._cond:
+            self._stats["pings"] += 1
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.sql_ping)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _expulsar_inactivas(self):
+        """Saca (sin cerrar) las conexiones caducadas. Llamar con el lock."""
+        if self.max_inactividad is None:
+            return []
+        limite = time.monotonic() - self.max_inactividad
+        caducadas = []
+        # Las más antiguas están a la izquierda
+        while (self._libres and self._total > self.min_tamaño
+               and self._libres[0][1] < limite):
+            conn, _ = self._libres.popleft()
+            self._total -= 1
+            caducadas.append(conn)
+        return caducadas
+
+    # ------------------------------------------------------------------
+    def obtener(self, timeout=None):
+        """Presta una conexión; lanza PoolAgotado si no hay ninguna a tiempo."""
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        fin = inicio + timeout
+        espero = False
+
+        while True:
+            conn = None
+            devuelta = 0.0
+            crear = False
+            with self._cond:
+                if self._cerrado:
+                    raise PoolAgotado("El pool está cerrado")
+                caducadas = self._expulsar_inactivas()
+                if self._libres:
+                    conn, devuelta = self._libres.pop()
+                elif self._total < self.max_tamaño:
+                    self._total += 1
+                    crear = True
+                else:
+                    restante = fin - time.monotonic()
+                    if restante <= 0:
+                        self._stats["agotamientos"] += 1
+                        raise PoolAgotado(
+                            f"Sin conexiones libres tras {timeout:.1f}s "
+                            f"(max_tamaño={self.max_tamaño})"
+                        )
+                    if not espero:
+                        espero = True
+                        self._stats["esperas"] += 1
+                    self._cond.wait(restante)
+                    continue
+
+            for vieja in caducadas:
+                self._cerrar(vieja)
+
+            if crear:
+                conn = self._crear()
+            elif (self.pre_ping and time.monotonic() - devuelta >= self.ping_tras
+                  and not self._ping(conn)):
+                with self._cond:
+                    self._stats["ping_fallidos"] += 1
+                    self._total -= 1
+                    self._cond.notify()
+                self._cerrar(conn)
+                continue
+
+            with self._cond:
+                self._stats["prestamos"] += 1
+                self._stats["espera_total_s"] += time.monotonic() - inicio
+            return conn
+
+    def devolver(self, conn, descartar=False, error=False):
+        """
+        Devuelve una conexión prestada; si está rota, usar descartar=True.
+        error=True (quien la usó recibió una excepción) la comprueba con
+        `sql_ping` y la descarta si no responde.
+        """
+        if not descartar:
+            try:
+                # Deja la conexión sin transacciones a medias; sqlite3 dice si
+                # hay alguna, los drivers que no lo dicen pagan el rollback
+                if getattr(conn, "in_transaction", True):
+                    conn.rollback()
+            except Exception:
+                descartar = True
+        if error and not descartar and not self._ping(conn):
+            descartar = True
+            with self._cond:
+                self._stats["descartadas_error"] += 1
+
+        with self._cond:
+            if descartar or self._cerrado:
+                self._total -= 1
+                cerrar = True
+            else:
+                self._libres.append((conn, time.monotonic()))
+                cerrar = False
+            caducadas = self._expulsar_inactivas()
+            self._cond.notify()
+
+        if cerrar:
+            self._cerrar(conn)
+        for vieja in caducadas:
+            self._cerrar(vieja)
+
+    @contextmanager
+    def conexion(self, timeout=None):
+        """Uso: `with pool.conexion() as conn: ...`"""
+        conn = self.obtener(timeout)
+        try:
+            yield conn
+        except Exception:
+            self.devolver(conn, error=True)
+            raise
+        except BaseException:  # GeneratorExit, KeyboardInterrupt: no dicen nada de la conexión
+            self.devolver(conn)
+            raise
+        self.devolver(conn)
+
+    def podar(self):
+        """Cierra las conexiones inactivas caducadas."""
+        with self._cond:
+            caducadas = self._expulsar_inactivas()
+        for vieja in caducadas:
+            self._cerrar(vieja)
+
+    def cerrar(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse."""
+        with self._cond:
+            self._cerrado = True
+            libres = [conn for conn, _ in self._libres]
+            self._libres.clear()
+            self._total -= len(libres)
+            self._cond.notify_all()
+        for conn in libres:
+            self._cerrar(conn)
+
+    def estadisticas(self) -> dict:
+        with self._cond:
+            datos = dict(self._stats)
+            datos.update(
+                tamaño=self._total,
+                libres=len(self._libres),
+                en_uso=self._total - len(self._libres),
+                min_tamaño=self.min_tamaño,
+                max_tamaño=self.max_tamaño,
+            )
+        prestamos = datos["prestamos"]
+        datos["espera_media_s"] = datos["espera_total_s"] / prestamos if prestamos else 0.0
+        return datos
@@ -1,14 +1,38 @@
 from argon2 import PasswordHasher
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
 import re
+import secrets
+import threading
+import time
 
-# Configuración del hasher (global al módulo)
-_hasher = PasswordHasher(
-    time_cost=2,
-    memory_cost=65536,
-    parallelism=4,
-    hash_len=32
+# Parámetros de Argon2 si no hay archivo de calibración (ver calibrar_argon2.py)
+PARAMETROS_ARGON2 = {
+    "time_cost": 2,
+    "memory_cost": 65536,
+    "parallelism": 4,
+    "hash_len": 32,
+}
+
+RUTA_CONFIG_ARGON2 = os.environ.get(
+    "HACKATHON_ARGON2_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "argon2.json"),
 )
 
+def cargar_parametros_argon2(ruta: str = RUTA_CONFIG_ARGON2) -> dict:
+    """Parámetros por defecto pisados por los del archivo de calibración, si existe."""
+    parametros = dict(PARAMETROS_ARGON2)
+    if os.path.exists(ruta):
+        with open(ruta, encoding="utf-8") as f:
+            guardados = json.load(f)
+        parametros.update({k: int(guardados[k]) for k in PARAMETROS_ARGON2 if k in guardados})
+    return parametros
+
+# Configuración del hasher (global al módulo)
+_hasher = PasswordHasher(**cargar_parametros_argon2())
+
 def validar_contraseña(contraseña: str) -> bool:
     """
     Valida que la contraseña cumpla con:
@@ -22,6 +46,14 @@ def validar_contraseña(contraseña: str) -> bool:
             re.search(r"[a-z]", contraseña) and
             re.search(r"\d", contraseña))
 
+def normalizar_email(email: str) -> str:
+    """Forma canónica con la que se guarda y se busca un email."""
+    return email.strip().lower()
+
+def validar_email(email: str) -> bool:
+    """Comprobación básica de formato: algo@dominio.tld, sin espacios."""
+    return bool(re.fullmatch(r"[^@\s]+@[^@\s]+\.[^@\s]+", email))
+
 def crear_hash_seguro(contraseña: str) -> str:
    
     if not validar_contraseña(contraseña):
@@ -31,9 +63,162 @@ def crear_hash_seguro(contraseña: str) -> str:
         )
     return _hasher.hash(contraseña)
 
+def _hash_sin_validar(contraseña: str) -> str:
+    return _hasher.hash(contraseña)
+
 def verificar_contraseña(hash_guardado: str, contraseña: str) -> bool:
     """Verifica si una contraseña coincide con su hash almacenado"""
     try:
         return _hasher.verify(hash_guardado, contraseña)
     except:
-        return False
\ No newline at end of file
+        return False
+
+_hash_ficticio = None
+_hash_ficticio_lock = threading.Lock()
+
+def hash_ficticio() -> str:
+    """
+    Hash de una contraseña al azar, hecho una sola vez con los parámetros
+    actuales. Se verifica contra él cuando el email no existe, para que
+    ese caso tarde lo mismo que una contraseña incorrecta.
+    """
+    global _hash_ficticio
+    if _hash_ficticio is None:
+        with _hash_ficticio_lock:
+            if _hash_ficticio is None:
+                _hash_ficticio = _hasher.hash(secrets.token_urlsafe(32))
+    return _hash_ficticio
+
+def precalentar():
+    """Deja listo lo que no conviene calcular en el primer login."""
+    hash_ficticio()
+
+def necesita_rehash(hash_guardado: str) -> bool:
+    """True si el hash se hizo con parámetros distintos a los de `_hasher`."""
+    try:
+        return _hasher.check_needs_rehash(hash_guardado)
+    except Exception:
+        return False
+
+
+class SaturacionHash(Exception):
+    """El ejecutor de hashes tiene la cola llena y no admitió la operación a tiempo."""
+
+
+class EjecutorHash:
+    """
+    Pool acotado de hilos para Argon2 (argon2-cffi suelta el GIL).
+
+    - hilos: hashes simultáneos; se recorta para que hilos * memory_cost
+      no pase de `memoria_max` bytes, así el pico de RAM queda acotado
+    - max_pendientes: operaciones admitidas (en cola + en curso); pasado
+      ese número se espera hasta `timeout_admision` y luego SaturacionHash
+    """
+
+    def __init__(self, hilos=None, memoria_max=None, max_pendientes=None, timeout_admision=None):
+        por_hash = _hasher.memory_cost * 1024
+        hilos = hilos or os.cpu_count() or 1
+        if memoria_max is not None:
+            hilos = min(hilos, max(1, memoria_max // por_hash))
+        self.hilos = hilos
+        self.memoria_max = hilos * por_hash
+        self.max_pendientes = max_pendientes or hilos * 4
+        self.timeout_admision = timeout_admision
+        self._admision = threading.BoundedSemaphore(self.max_pendientes)
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="argon2")
+        self._lock = threading.Lock()
+        self._stats = {"pendientes": 0, "completadas": 0, "rechazadas": 0}
+
+    def _admitir(self, timeout):
+        if not self._admision.acquire(timeout=timeout):
+            with self._lock:
+                self._stats["rechazadas"] += 1
+            raise SaturacionHash(f"Cola de hashing llena ({self.max_pendientes} pendientes)")
+        with self._lock:
+            self._stats["pendientes"] += 1
+
+    def _liberar(self, _futuro=None):
+        with self._lock:
+            self._stats["pendientes"] -= 1
+            self._stats["completadas"] += 1
+        self._admision.release()
+
+    def _enviar(self, funcion, *args, timeout=None, admitido=False, esperar=False):
+        if not admitido:
+            # esperar=True: sin límite de espera (contrapresión para lotes)
+            self._admitir(None if esperar else self.timeout_admision if timeout is None else timeout)
+        try:
+            futuro = self._pool.submit(funcion, *args)
+        except BaseException:
+            self._liberar()
+            raise
+        futuro.add_done_callback(self._liberar)
+        return futuro
+
+    # --- interfaz síncrona ---
+    def hash(self, contraseña: str, timeout=None) -> str:
+        return self._enviar(crear_hash_seguro, contraseña, timeout=timeout).result()
+
+    def verificar(self, hash_guardado: str, contraseña: str, timeout=None) -> bool:
+        return self._enviar(verificar_contraseña, hash_guardado, contraseña, timeout=timeout).result()
+
+    def hash_muchos(self, contraseñas, validar=True) -> list:
+        """
+        Hashea en paralelo; espera turno en vez de rechazar si la cola está
+        llena. validar=False para rehashear contraseñas ya aceptadas antes.
+        """
+        funcion = crear_hash_seguro if validar else _hash_sin_validar
+        futuros = [self._enviar(funcion, c, esperar=True) for c in contraseñas]
+        return [f.result() for f in futuros]
+
+    # --- interfaz asyncio ---
+    async def _enviar_async(self, funcion, *args, timeout=None):
+        await self._admitir_async(self.timeout_admision if timeout is None else timeout)
+        # Sin await entre la admisión y el submit: una cancelación no deja el cupo tomado
+        return await asyncio.wrap_future(self._enviar(funcion, *args, admitido=True))
+
+    async def _admitir_async(self, timeout):
+        """
+        Como _admitir pero sondeando desde el loop: un hilo bloqueado en el
+        semáforo lo tomaría aunque quien esperaba ya se hubiese cancelado.
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        pausa = 0.001
+        while not self._admision.acquire(blocking=False):
+            restante = None if limite is None else limite - time.monotonic()
+            if restante is not None and restante <= 0:
+                with self._lock:
+                    self._stats["rechazadas"] += 1
+                raise SaturacionHash(f"Cola de hashing llena ({self.max_pendientes} pendientes)")
+            await asyncio.sleep(pausa if restante is None else min(pausa, restante))
+            pausa = min(pausa * 2, 0.02)
+        with self._lock:
+            self._stats["pendientes"] += 1
+
+    async def hash_async(self, contraseña: str, timeout=None) -> str:
+        return await self._enviar_async(crear_hash_seguro, contraseña, timeout=timeout)
+
+    async def verificar_async(self, hash_guardado: str, contraseña: str, timeout=None) -> bool:
+        return await self._enviar_async(verificar_contraseña, hash_guardado, contraseña, timeout=timeout)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._stats)
+        datos.update(hilos=self.hilos, max_pendientes=self.max_pendientes,
+                     memoria_max=self.memoria_max)
+        return datos
+
+    def cerrar(self, esperar=True):
+        self._pool.shutdown(wait=esperar)
+
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+def obtener_ejecutor(**opciones) -> EjecutorHash:
+    """Ejecutor del proceso; `opciones` solo cuentan la primera vez."""
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = EjecutorHash(**opciones)
+        return _ejecutor
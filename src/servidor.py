@@ -0,0 +1,363 @@
+"""
+Servicio HTTP de autenticación (JSON):
+
+    python servidor.py --puerto 8080 --procesos 4
+    HACKATHON_DB=sqlite:///usuarios.db python servidor.py
+
+    POST /registro   {"nombre", "email", "contraseña"}       -> 201
+    POST /login      {"email", "contraseña"}                 -> 200 {"token", ...}
+    GET  /sesion     Authorization: Bearer <token>           -> 200 {"id_usuario", "expira"}
+    GET  /usuarios?orden=fecha&tamaño=50&token=...  (Bearer) -> 200 {"filas", "siguiente"}
+                     (tamaño también como tamano o size)
+    GET  /salud                                              -> 200
+
+El proceso padre abre el socket y hace fork de N trabajadores que
+aceptan sobre ese mismo socket; cada uno tiene su pool de conexiones y
+su ejecutor de Argon2, creados después del fork. Si un trabajador muere
+se lanza otro. Cuando la cola de hashing de un trabajador está llena se
+responde 503 con Retry-After en vez de encolar sin fin (load shedding),
+y los logins frenados por el limitador reciben 429.
+
+Los tokens de sesión valen en cualquier trabajador porque el secreto se
+fija antes del fork; la revocación y el limitador de intentos, en
+cambio, son de cada proceso. Con más de un trabajador no se cachean los
+registros de login: un cambio de contraseña solo invalidaría la caché del
+trabajador que lo atendió. Sin os.fork (Windows) se sirve en un único
+proceso. Con SQLite hace falta una base en archivo, no :memory:.
+
+Los emails repetidos los rechaza el índice único al insertar. Con
+--filtro-emails (ver filtro_bloom.py) los que el filtro no descarta se
+comprueban antes, para no gastar el Argon2 en un duplicado.
+"""
+import argparse
+import json
+import logging
+import os
+import secrets
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import conexion_sql
+from backends import backend_desde_url
+from conexion_sql import EstadoAutenticacion, autenticar, email_registrado, insertar_lote, usar_conexion
+from filtro_bloom import FiltroBloom
+from paginacion import paginar_usuarios
+from pool_conexiones import PoolAgotado
+from security import SaturacionHash, normalizar_email, obtener_ejecutor, precalentar, validar_email
+from sesiones import obtener_gestor_sesiones
+
+log = logging.getLogger("servidor")
+
+MAX_CUERPO = 64 * 1024
+RETRY_SATURADO = 1  # segundos sugeridos al cliente cuando hay 503
+MAX_TAMAÑO_PAGINA = 500
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje, cabeceras=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.cabeceras = cabeceras or {}
+
+
+class ManejadorAuth(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    server_version = "HackathonAuth/1.0"
+
+    def do_GET(self):
+        self._despachar({"/salud": self.salud, "/sesion": self.sesion, "/usuarios": self.usuarios})
+
+    def do_POST(self):
+        self._despachar({"/registro": self.registro, "/login": self.login})
+
+    def _despachar(self, rutas):
+        self._cuerpo_leido = False
+        partes = urlsplit(self.path)
+        accion = rutas.get(partes.path)
+        try:
+            if accion is None:
+                raise ErrorHTTP(404, "Ruta desconocida")
+            estado, datos = accion(parse_qs(partes.query))
+            self._responder(estado, datos)
+        except ErrorHTTP as e:
+            self._responder(e.estado, {"error": str(e)}, e.cabeceras)
+        except (SaturacionHash, PoolAgotado):
+            self._responder(503, {"error": "Servicio saturado, reintenta en un momento"},
+                            {"Retry-After": str(RETRY_SATURADO)})
+        except Exception:
+            log.exception("Error atendiendo %s %s", self.command, self.path)
+            self._responder(500, {"error": "Error interno"})
+
+    def _responder(self, estado, datos, cabeceras=None):
+        self._descartar_cuerpo()
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _largo(self) -> int:
+        try:
+            largo = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            largo = -1
+        if largo < 0 or "Transfer-Encoding" in self.headers:
+            self.close_connection = True  # no se sabe dónde acaba el cuerpo
+            raise ErrorHTTP(400, "Content-Length inválido")
+        return largo
+
+    def _descartar_cuerpo(self):
+        """
+        Con keep-alive, un cuerpo sin leer se tomaría por la siguiente
+        petición: se lee y se tira, o se cierra la conexión si es grande.
+        """
+        if self._cuerpo_leido or self.close_connection:
+            return
+        self._cuerpo_leido = True
+        try:
+            largo = self._largo()
+        except ErrorHTTP:
+            return
+        if largo > MAX_CUERPO:
+            self.close_connection = True
+        elif largo:
+            self.rfile.read(largo)
+
+    def _json(self) -> dict:
+        largo = self._largo()
+        if largo > MAX_CUERPO:
+            self.close_connection = True  # no se lee el cuerpo
+            raise ErrorHTTP(413, "Cuerpo demasiado grande")
+        self._cuerpo_leido = True
+        try:
+            datos = json.loads(self.rfile.read(largo) or b"{}")
+        except ValueError:
+            raise ErrorHTTP(400, "JSON inválido") from None
+        if not isinstance(datos, dict):
+            raise ErrorHTTP(400, "Se esperaba un objeto JSON")
+        return datos
+
+    def _sesion(self):
+        autorizacion = self.headers.get("Authorization", "")
+        if not autorizacion.startswith("Bearer "):
+            raise ErrorHTTP(401, "Falta el token de sesión", {"WWW-Authenticate": "Bearer"})
+        sesion = obtener_gestor_sesiones().validar(autorizacion[len("Bearer "):].strip())
+        if sesion is None:
+            raise ErrorHTTP(401, "Sesión inválida o caducada", {"WWW-Authenticate": "Bearer"})
+        return sesion
+
+    # --- rutas ---
+    def salud(self, _query):
+        return 200, {"ok": True, "pid": os.getpid()}
+
+    def registro(self, _query):
+        datos = self._json()
+        nombre = str(datos.get("nombre", "")).strip()
+        email = normalizar_email(str(datos.get("email", "")))
+        contraseña = str(datos.get("contraseña", ""))
+        if not nombre or not validar_email(email):
+            raise ErrorHTTP(400, "Nombre o email inválido")
+        # Sin filtro decide el índice único al insertar; con él, lo que el
+        # filtro da por nuevo no consulta nada y un duplicado no paga el Argon2
+        if conexion_sql.obtener_filtro_emails() is not None and email_registrado(email):
+            raise ErrorHTTP(409, "El email ya está registrado")
+        try:
+            hash_nuevo = obtener_ejecutor().hash(contraseña)
+        except ValueError as e:
+            raise ErrorHTTP(400, str(e)) from None
+        with usar_conexion() as (conn, backend):
+            fallos = insertar_lote(conn, backend, "Usuarios", [(nombre, email, hash_nuevo, datetime.now())])
+        if fallos:
+            raise ErrorHTTP(409, "No se pudo registrar el usuario")
+        return 201, {"ok": True, "email": email}
+
+    def login(self, _query):
+        datos = self._json()
+        resultado = autenticar(str(datos.get("email", "")), str(datos.get("contraseña", "")),
+                               cliente=self.client_address[0])
+        if resultado.estado is EstadoAutenticacion.BLOQUEADO:
+            espera = max(1, int(resultado.reintentar_en + 0.999))
+            raise ErrorHTTP(429, "Demasiados intentos", {"Retry-After": str(espera)})
+        if not resultado.ok:
+            raise ErrorHTTP(401, "Email o contraseña incorrectos")  # igual para ambos casos
+        gestor = obtener_gestor_sesiones()
+        token = gestor.emitir(resultado.id_usuario)
+        return 200, {"token": token, "id_usuario": resultado.id_usuario, "expira_en": gestor.ttl}
+
+    def sesion(self, _query):
+        sesion = self._sesion()
+        return 200, {"id_usuario": sesion.id_usuario, "expira": sesion.expira}
+
+    def usuarios(self, query):
+        self._sesion()
+        # "tamaño" hay que mandarlo percent-encoded: se aceptan también los alias ASCII
+        crudo = next((query[n][0] for n in ("tamaño", "tamano", "size") if n in query), "50")
+        try:
+            tamaño = int(crudo)
+        except ValueError:
+            tamaño = 0
+        if tamaño < 1:
+            raise ErrorHTTP(400, "El tamaño de página debe ser un entero positivo")
+        try:
+            pagina = paginar_usuarios(
+                orden=query.get("orden", ["fecha"])[0],
+                tamaño=min(tamaño, MAX_TAMAÑO_PAGINA),
+                token=query.get("token", [None])[0],
+            )
+        except ValueError as e:
+            raise ErrorHTTP(400, str(e)) from None
+        return 200, {"columnas": pagina.columnas, "filas": pagina.filas, "siguiente": pagina.siguiente}
+
+    def log_message(self, formato, *args):
+        log.info("%s %s", self.address_string(), formato % args)
+
+
+class ServidorAuth(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def abrir_socket(host, puerto, cola=128) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, puerto))
+    sock.listen(cola)
+    return sock
+
+
+def servir(sock, opciones):
+    """Bucle de un trabajador sobre un socket ya en escucha."""
+    conexion_sql.obtener_pool(max_tamaño=opciones.pool_max)
+    obtener_ejecutor(hilos=opciones.hilos_hash, max_pendientes=opciones.max_pendientes,
+                     timeout_admision=opciones.timeout_admision)
+    servidor = ServidorAuth(sock.getsockname()[:2], ManejadorAuth, bind_and_activate=False)
+    servidor.socket.close()
+    servidor.socket = sock
+
+    def parar(_signum, _frame):
+        threading.Thread(target=servidor.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, parar)
+    log.info("Trabajador %d atendiendo en %s:%d", os.getpid(), *sock.getsockname()[:2])
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        conexion_sql.cerrar_pool()
+        obtener_ejecutor().cerrar(esperar=False)
+
+
+def _lanzar(sock, opciones) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # el padre decide cuándo parar
+        codigo = 0
+        try:
+            servir(sock, opciones)
+        except BaseException:
+            log.exception("Trabajador %d caído", os.getpid())
+            codigo = 1
+        finally:
+            os._exit(codigo)
+    return pid
+
+
+def supervisar(sock, opciones):
+    """Padre: mantiene `opciones.procesos` trabajadores vivos hasta SIGINT/SIGTERM."""
+    trabajadores = {}  # pid -> momento de arranque
+    parando = False
+
+    def parar(_signum, _frame):
+        nonlocal parando
+        parando = True
+        for pid in trabajadores:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, parar)
+    signal.signal(signal.SIGINT, parar)
+    for _ in range(opciones.procesos):
+        trabajadores[_lanzar(sock, opciones)] = time.monotonic()
+
+    while trabajadores:
+        try:
+            pid, estado = os.wait()
+        except ChildProcessError:
+            break
+        arranque = trabajadores.pop(pid, None)
+        if parando or arranque is None:
+            continue
+        log.warning("Trabajador %d terminó (estado %d); lanzando otro", pid, estado)
+        if time.monotonic() - arranque < 1:
+            time.sleep(1)  # no entrar en bucle si muere nada más arrancar
+        trabajadores[_lanzar(sock, opciones)] = time.monotonic()
+    sock.close()
+
+
+def _filtro_emails(ruta):
+    """Se construye en el padre; cada trabajador hereda una copia y le suma sus altas."""
+    if ruta and os.path.exists(ruta):
+        filtro = FiltroBloom.cargar(ruta)
+    else:
+        filtro = FiltroBloom.desde_tabla()
+        conexion_sql.cerrar_pool()  # que los hijos no hereden conexiones abiertas
+        if ruta:
+            filtro.guardar(ruta)
+    log.info("Filtro de emails con %d elementos (error estimado %.4f)", len(filtro), filtro.tasa_error())
+    return filtro
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--db", help="URL de la base (sqlite:///x.db, mssql://...); por defecto HACKATHON_DB")
+    parser.add_argument("--pool-max", type=int, default=10, help="conexiones por trabajador")
+    parser.add_argument("--hilos-hash", type=int, help="hilos de Argon2 por trabajador")
+    parser.add_argument("--max-pendientes", type=int, help="hashes admitidos por trabajador antes de dar 503")
+    parser.add_argument("--timeout-admision", type=float, default=0.1,
+                        help="segundos que se espera cupo en la cola de hashing antes del 503")
+    parser.add_argument("--filtro-emails", metavar="ARCHIVO", nargs="?", const="",
+                        help="comprobar las altas contra un filtro de Bloom; con ARCHIVO se carga de ahí "
+                             "si existe y se guarda al construirlo")
+    opciones = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(message)s")
+
+    if opciones.db:
+        conexion_sql.configurar_backend(backend_desde_url(opciones.db))
+    if opciones.hilos_hash is None:
+        opciones.hilos_hash = max(1, (os.cpu_count() or 1) // max(1, opciones.procesos))
+    # El mismo secreto en todos los trabajadores, para que validen los tokens de los demás
+    obtener_gestor_sesiones(secreto=os.environ.get("HACKATHON_SECRETO_SESION") or secrets.token_bytes(32))
+    precalentar()  # el hash ficticio se calcula una vez y lo heredan los hijos
+    if opciones.filtro_emails is not None:
+        conexion_sql.configurar_filtro_emails(_filtro_emails(opciones.filtro_emails))
+
+    sock = abrir_socket(opciones.host, opciones.puerto)
+    if opciones.procesos <= 1 or not hasattr(os, "fork"):
+        servir(sock, opciones)
+    else:
+        # Un cambio de contraseña en un trabajador no invalidaría la caché de los demás
+        conexion_sql.configurar_cache_usuarios(None)
+        supervisar(sock, opciones)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
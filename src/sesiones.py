@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from conexion_sql import autenticar
+
+
+@dataclass
+class Sesion:
+    id_sesion: str
+    id_usuario: int
+    emitida: int   # epoch en nanosegundos; estrictamente creciente en cada proceso
+    expira: int
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).decode("ascii").rstrip("=")
+
+
+class GestorSesiones:
+    """
+    Tokens de sesión firmados con HMAC-SHA256:
+
+        <id_sesion>.<id_usuario>.<emitida>.<expira>.<firma>
+
+    Validar un token es comprobar la firma y la fecha, sin base de datos
+    ni Argon2. Los tokens ya vistos quedan en un LRU/TTL en memoria para
+    no repetir el trabajo. La revocación (por token o de todas las
+    sesiones de un usuario) vive en memoria de este proceso.
+
+    El secreto sale de HACKATHON_SECRETO_SESION; si no está, se genera
+    uno al azar y los tokens dejan de valer al reiniciar.
+    """
+
+    def __init__(self, secreto=None, ttl=3600, max_sesiones=100_000):
+        if secreto is None:
+            secreto = os.environ.get("HACKATHON_SECRETO_SESION") or secrets.token_bytes(32)
+        self._secreto = secreto.encode("utf-8") if isinstance(secreto, str) else secreto
+        self.ttl = ttl
+        self.max_sesiones = max_sesiones
+        self._lock = threading.Lock()
+        self._sesiones = OrderedDict()     # token -> Sesion (LRU)
+        self._revocadas = {}               # id_sesion -> expira
+        self._revocado_antes = {}          # id_usuario -> marca: anula lo emitido hasta ella
+        self._ultima_marca = 0
+        self._stats = {"emitidas": 0, "validas": 0, "invalidas": 0, "aciertos_cache": 0}
+
+    def _firmar(self, contenido: str) -> str:
+        return _b64(hmac.new(self._secreto, contenido.encode("ascii"), hashlib.sha256).digest())
+
+    def _marca(self) -> int:
+        """Momento en ns, nunca repetido: ordena emisiones y revocaciones. Llamar con el lock."""
+        self._ultima_marca = max(time.time_ns(), self._ultima_marca + 1)
+        return self._ultima_marca
+
+    def emitir(self, id_usuario: int) -> str:
+        with self._lock:
+            emitida = self._marca()
+        sesion = Sesion(secrets.token_urlsafe(16), int(id_usuario), emitida,
+                        emitida // 1_000_000_000 + self.ttl)
+        contenido = f"{sesion.id_sesion}.{sesion.id_usuario}.{sesion.emitida}.{sesion.expira}"
+        token = f"{contenido}.{self._firmar(contenido)}"
+        with self._lock:
+            self._guardar(token, sesion)
+            self._stats["emitidas"] += 1
+        return token
+
+    def _guardar(self, token, sesion):
+        self._sesiones[token] = sesion
+        self._sesiones.move_to_end(token)
+        while len(self._sesiones) > self.max_sesiones:
+            self._sesiones.popitem(last=False)
+
+    def _decodificar(self, token: str):
+        partes = token.split(".")
+        if len(partes) != 5:
+            return None
+        contenido, firma = ".".join(partes[:4]), partes[4]
+        if not hmac.compare_digest(firma, self._firmar(contenido)):
+            return None
+        try:
+            return Sesion(partes[0], int(partes[1]), int(partes[2]), int(partes[3]))
+        except ValueError:
+            return None
+
+    def _vigente(self, sesion, ahora) -> bool:
+        return (sesion.expira > ahora
+                and sesion.id_sesion not in self._revocadas
+                and sesion.emitida > self._revocado_antes.get(sesion.id_usuario, 0))
+
+    def validar(self, token: str):
+        """Devuelve la Sesion si el token es bueno y sigue vigente; si no, None."""
+        ahora = time.time()
+        with self._lock:
+            sesion = self._sesiones.get(token)
+            if sesion is not None:
+                self._sesiones.move_to_end(token)
+                self._stats["aciertos_cache"] += 1
+        if sesion is None:
+            sesion = self._decodificar(token)
+
+        with self._lock:
+            if sesion is None or not self._vigente(sesion, ahora):
+                self._sesiones.pop(token, None)
+                self._stats["invalidas"] += 1
+                return None
+            self._guardar(token, sesion)
+            self._stats["validas"] += 1
+        return sesion
+
+    def revocar(self, token: str) -> bool:
+        sesion = self._decodificar(token)
+        if sesion is None:
+            return False
+        with self._lock:
+            self._sesiones.pop(token, None)
+            self._revocadas[sesion.id_sesion] = sesion.expira
+            self._purgar_revocadas()
+        return True
+
+    def revocar_usuario(self, id_usuario: int):
+        """Anula todas las sesiones emitidas hasta ahora para ese usuario; las siguientes valen."""
+        id_usuario = int(id_usuario)
+        with self._lock:
+            self._revocado_antes.pop(id_usuario, None)  # al final: el dict queda por antigüedad
+            self._revocado_antes[id_usuario] = self._marca()
+            self._purgar_usuarios()
+            for token in [t for t, s in self._sesiones.items() if s.id_usuario == id_usuario]:
+                del self._sesiones[token]
+
+    def _purgar_revocadas(self):
+        ahora = time.time()
+        for id_sesion in [i for i, expira in self._revocadas.items() if expira <= ahora]:
+            del self._revocadas[id_sesion]
+
+    def _purgar_usuarios(self):
+        """Pasado `ttl` desde la revocación ya caducó todo lo que anulaba."""
+        limite = time.time_ns() - self.ttl * 1_000_000_000
+        while self._revocado_antes:
+            id_usuario, marca = next(iter(self._revocado_antes.items()))
+            if marca > limite:
+                break
+            del self._revocado_antes[id_usuario]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._stats)
+            datos.update(en_cache=len(self._sesiones), revocadas=len(self._revocadas),
+                         usuarios_revocados=len(self._revocado_antes))
+        return datos
+
+
+_gestor = None
+_gestor_lock = threading.Lock()
+
+
+def obtener_gestor_sesiones(**opciones) -> GestorSesiones:
+    """Gestor del proceso; `opciones` solo cuentan la primera vez."""
+    global _gestor
+    with _gestor_lock:
+        if _gestor is None:
+            _gestor = GestorSesiones(**opciones)
+        return _gestor
+
+
+def iniciar_sesion(email, contraseña, conexion=None):
+    """Login completo: (ResultadoAutenticacion, token o None)."""
+    resultado = autenticar(email, contraseña, conexion)
+    token = obtener_gestor_sesiones().emitir(resultado.id_usuario) if resultado.ok else None
+    return resultado, token
@@ -0,0 +1,413 @@
+"""
+Reparto de Usuarios entre varias bases por hash consistente del email.
+
+    fragmentador = Fragmentador({"a": SQLiteBackend("a.db"), "b": SQLiteBackend("b.db")})
+    register("Usuarios", fragmentador, nombre, email, contraseña)   # va al fragmento del email
+    autenticar(email, contraseña, fragmentador)                     # idem
+    fragmentador.paginar(orden="email", tamaño=50, token=...)       # todos, en paralelo
+    fragmentador.agregar_fragmento("c", SQLiteBackend("c.db"))      # rebalanceo en caliente
+
+El dueño de cada email sale de un anillo de hash consistente con nodos
+virtuales: al añadir un fragmento solo se mueve ~1/N de los usuarios.
+Un Fragmentador se pasa como `conexion` igual que un pool o un
+Enrutador, pero solo sirve para operaciones con email (la `clave`); los
+listados y estadísticas se piden al propio Fragmentador. Cada fragmento
+puede ser a su vez un Enrutador con réplicas.
+
+Los id son de cada fragmento y se repiten entre fragmentos: al usuario
+lo identifica su email.
+"""
+import base64
+import bisect
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import conexion_sql
+from conexion_sql import ResultadoRegistro, usar_conexion
+from estadisticas import EstadisticasTabla, estadisticas_tabla, invalidar_estadisticas
+from paginacion import COLUMNAS_LISTADO, ORDENES, Pagina, codificar_token, decodificar_token, paginar_usuarios
+from pool_conexiones import PoolConexiones
+from security import normalizar_email
+
+# Todo menos id, que es propio de cada fragmento
+COLUMNAS_COPIA = ("nombre", "Apellidos", "email", "fecha_registro", "Contraseña", "hora_registro")
+
+
+def _hash64(texto: str) -> int:
+    # Estable entre procesos y máquinas, a diferencia de hash()
+    return int.from_bytes(hashlib.blake2b(texto.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class AnilloHash:
+    """Anillo de hash consistente con `vnodos` puntos por nodo."""
+
+    def __init__(self, nodos, vnodos=128):
+        self.nodos = tuple(nodos)
+        self.vnodos = vnodos
+        puntos = sorted((_hash64(f"{nodo}#{i}"), nodo) for nodo in self.nodos for i in range(vnodos))
+        self._puntos = [p for p, _ in puntos]
+        self._dueños = [n for _, n in puntos]
+
+    def nodo(self, clave: str):
+        if not self._puntos:
+            raise ValueError("El anillo no tiene nodos")
+        i = bisect.bisect(self._puntos, _hash64(clave)) % len(self._puntos)
+        return self._dueños[i]
+
+    def con(self, nodo) -> "AnilloHash":
+        return AnilloHash(self.nodos + (nodo,), self.vnodos)
+
+
+class _Fragmento:
+    """
+    Un fragmento visto desde el Fragmentador: sus escrituras con clave se
+    anotan para el rebalanceo. Es lo que recibe register_many.
+    """
+
+    def __init__(self, fragmentador, nombre):
+        self._fragmentador = fragmentador
+        self.nombre = nombre
+        self.fuente = fragmentador.fragmentos[nombre]
+        self.backend = conexion_sql._backend_de(self.fuente)
+
+    @contextmanager
+    def conexion(self, solo_lectura=False, clave=None):
+        if not solo_lectura and clave is not None:
+            self._fragmentador._anotar_escritura(clave)
+        with usar_conexion(self.fuente, solo_lectura=solo_lectura, clave=clave) as (conn, _):
+            yield conn
+
+    def marcar_escritura(self, clave):
+        self._fragmentador._anotar_escritura(clave)
+        marcar = getattr(self.fuente, "marcar_escritura", None)
+        if marcar is not None:
+            marcar(clave)
+
+
+class Fragmentador:
+    """
+    - fragmentos: {nombre: Backend, PoolConexiones o Enrutador}
+    - vnodos: puntos por fragmento en el anillo (más = reparto más parejo)
+    - opciones_pool: para los pools que se creen a partir de backends
+    """
+
+    def __init__(self, fragmentos, vnodos=128, hilos=16, **opciones_pool):
+        if not fragmentos:
+            raise ValueError("Hace falta al menos un fragmento")
+        self._opciones_pool = opciones_pool
+        self.fragmentos = {nombre: self._fuente(f) for nombre, f in fragmentos.items()}
+        self.backend = conexion_sql._backend_de(next(iter(self.fragmentos.values())))
+        self._anillo = AnilloHash(self.fragmentos, vnodos)
+        self._hilos = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="fragmentos")
+        # Pausa de escrituras para el rebalanceo
+        self._cond = threading.Condition()
+        self._escribiendo = 0
+        self._pausado = False
+        self._sucias = None  # emails escritos mientras se copia (None = no se anotan)
+
+    def _fuente(self, fuente):
+        if isinstance(fuente, PoolConexiones) or hasattr(fuente, "conexion"):
+            return fuente
+        return conexion_sql.crear_pool(fuente, **self._opciones_pool)
+
+    # --- enrutado por email ---
+    def fragmento_de(self, email) -> str:
+        return self._anillo.nodo(normalizar_email(email))
+
+    def fuente_de(self, email) -> _Fragmento:
+        return _Fragmento(self, self.fragmento_de(email))
+
+    @contextmanager
+    def _escritura(self):
+        with self._cond:
+            while self._pausado:
+                self._cond.wait()
+            self._escribiendo += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._escribiendo -= 1
+                self._cond.notify_all()
+
+    def marcar_escritura(self, clave):
+        """Para escrituras de `clave` hechas con la conexión pedida para otro email de su fragmento."""
+        self.fuente_de(clave).marcar_escritura(clave)
+
+    def _anotar_escritura(self, clave):
+        with self._cond:
+            if self._sucias is not None:
+                self._sucias.add(normalizar_email(clave))
+
+    @contextmanager
+    def conexion(self, solo_lectura=False, clave=None):
+        """Conexión del fragmento dueño de `clave` (el email); sin clave no hay a dónde ir."""
+        if clave is None:
+            raise ValueError("El Fragmentador necesita el email para elegir fragmento; "
+                             "para listados y estadísticas usa sus propios métodos")
+        if solo_lectura:
+            with self.fuente_de(clave).conexion(solo_lectura=True, clave=clave) as conn:
+                yield conn
+            return
+        with self._escritura():
+            with self.fuente_de(clave).conexion(clave=clave) as conn:
+                yield conn
+
+    # --- operaciones sobre todos los fragmentos ---
+    def _en_todos(self, funcion, nombres=None) -> dict:
+        nombres = list(self.fragmentos) if nombres is None else nombres
+        futuros = {n: self._hilos.submit(funcion, n, self.fragmentos[n]) for n in nombres}
+        return {n: f.result() for n, f in futuros.items()}
+
+    def register_many(self, nombre_tabla, usuarios, **opciones) -> ResultadoRegistro:
+        """conexion_sql.register_many repartido por fragmento, en paralelo."""
+        with self._escritura():
+            por_fragmento = {}
+            for i, usuario in enumerate(usuarios):
+                por_fragmento.setdefault(self.fragmento_de(usuario[1]), []).append((i, usuario))
+
+            def registrar(nombre, _fuente):
+                lista = por_fragmento[nombre]
+                parcial = conexion_sql.register_many(nombre_tabla, _Fragmento(self, nombre),
+                                                     [u for _, u in lista], **opciones)
+                for fallo in parcial.fallos:
+                    fallo.indice = lista[fallo.indice][0]  # posición en la entrada original
+                return parcial
+
+            resultado = ResultadoRegistro()
+            for parcial in self._en_todos(registrar, list(por_fragmento)).values():
+                resultado.insertados += parcial.insertados
+                resultado.fallos.extend(parcial.fallos)
+        resultado.fallos.sort(key=lambda f: f.indice)
+        return resultado
+
+    def estadisticas(self, nombre_tabla="Usuarios", ttl=60.0) -> EstadisticasTabla:
+        """Filas y bytes sumados de todos los fragmentos (columnas del primero)."""
+        partes = list(self._en_todos(lambda _n, fuente: estadisticas_tabla(nombre_tabla, fuente, ttl)).values())
+        tamaños = [p.tamaño_bytes for p in partes]
+        return EstadisticasTabla(
+            tabla=nombre_tabla,
+            filas=sum(p.filas for p in partes),
+            tamaño_bytes=None if None in tamaños else sum(tamaños),
+            columnas=partes[0].columnas,
+            generado_en=min(p.generado_en for p in partes),
+        )
+
+    def paginar(self, orden="fecha", tamaño=50, token=None, columnas=COLUMNAS_LISTADO,
+                nombre_tabla="Usuarios") -> Pagina:
+        """
+        Una página global, ordenada como paginar_usuarios, mezclando una
+        página de cada fragmento pedida en paralelo. El token guarda la
+        posición de cada fragmento por separado.
+        """
+        if orden not in ORDENES:
+            raise ValueError(f"Orden no soportado: {orden!r} (usa {', '.join(ORDENES)})")
+        posiciones, terminados = self._decodificar_token(token, orden) if token else ({}, set())
+        pendientes = [n for n in self.fragmentos if n not in terminados]
+
+        def pagina_de(nombre, fuente):
+            return paginar_usuarios(fuente, orden, tamaño, posiciones.get(nombre), columnas, nombre_tabla)
+
+        paginas = self._en_todos(pagina_de, pendientes)
+        if not paginas:
+            return Pagina(filas=[], columnas=list(columnas), siguiente=None)
+        columnas_reales = next(iter(paginas.values())).columnas
+        principal, desempate = ORDENES[orden]
+        i_p, i_d = columnas_reales.index(principal), columnas_reales.index(desempate)
+
+        # Mezcla de k vías que solo toma la cabeza de cada página: lo que se
+        # consume de un fragmento es siempre un prefijo de su página, así su
+        # posición sigue valiendo aunque su collation no ordene como Python
+        mezcla = heapq.merge(
+            *([(nombre, fila) for fila in pagina.filas] for nombre, pagina in paginas.items()),
+            key=lambda c: (c[1][i_p], c[0], c[1][i_d]),
+        )
+        elegidas = list(itertools.islice(mezcla, tamaño))
+        consumidas = {}
+        for nombre, fila in elegidas:
+            consumidas[nombre] = consumidas.get(nombre, 0) + 1
+            posiciones[nombre] = codificar_token(orden, (fila[i_p], fila[i_d]))
+        for nombre, pagina in paginas.items():
+            if pagina.siguiente is None and consumidas.get(nombre, 0) == len(pagina.filas):
+                terminados.add(nombre)
+
+        siguiente = None
+        if len(terminados) < len(self.fragmentos):
+            siguiente = self._codificar_token(orden, posiciones, terminados)
+        return Pagina(filas=[fila for _, fila in elegidas], columnas=columnas_reales, siguiente=siguiente)
+
+    @staticmethod
+    def _codificar_token(orden, posiciones, terminados) -> str:
+        datos = {"o": orden, "p": posiciones, "t": sorted(terminados)}
+        crudo = json.dumps(datos, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def _decodificar_token(token, orden):
+        try:
+            relleno = "=" * (-len(token) % 4)
+            datos = json.loads(base64.urlsafe_b64decode(token + relleno))
+            if datos["o"] != orden:
+                raise ValueError
+            for posicion in datos["p"].values():
+                decodificar_token(posicion, orden)  # valida cada una
+            return dict(datos["p"]), set(datos["t"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise ValueError("Token de paginación inválido") from None
+
+    # --- rebalanceo ---
+    def agregar_fragmento(self, nombre, fuente, nombre_tabla="Usuarios", lote=1000, informar=None) -> int:
+        """
+        Añade un fragmento sin parar el servicio y le mueve sus usuarios:
+
+        1. copia los que pasan a ser suyos mientras todo sigue funcionando
+           (las escrituras que lleguen se anotan)
+        2. pausa las escrituras, copia de nuevo lo insertado o tocado
+           durante el paso 1 y cambia el anillo; las lecturas no paran
+        3. reanuda y borra las copias viejas de los fragmentos de origen
+
+        Devuelve cuántos usuarios se movieron. Repetirlo tras un fallo en
+        el paso 1 o 2 es seguro (la copia borra antes de insertar).
+        """
+        if nombre in self.fragmentos:
+            raise ValueError(f"El fragmento {nombre!r} ya existe")
+        informar = informar or (lambda _texto: None)
+        destino = self._fuente(fuente)
+        anillo = self._anillo.con(nombre)
+        with self._cond:
+            self._sucias = set()
+
+        # 1. copia en caliente
+        ultimos, movidos = {}, {}
+        try:
+            for origen, fuente_origen in self.fragmentos.items():
+                ultimo = 0
+                for filas in self._lotes(fuente_origen, nombre_tabla, lote):
+                    ultimo = filas[-1][0]
+                    mover = [f[1:] for f in filas if anillo.nodo(f[3]) == nombre]
+                    self._copiar(destino, nombre_tabla, mover)
+                    movidos.setdefault(origen, set()).update(f[2] for f in mover)
+                ultimos[origen] = ultimo
+                informar(f"{origen}: {len(movidos.get(origen, ()))} usuarios copiados a {nombre}")
+
+            # 2. puesta al día con las escrituras pausadas
+            inicio_pausa = time.monotonic()
+            self._pausar()
+            try:
+                for origen, fuente_origen in self.fragmentos.items():
+                    emails = {e for e in self._sucias if anillo.nodo(e) == nombre and self._anillo.nodo(e) == origen}
+                    for filas in self._lotes(fuente_origen, nombre_tabla, lote, desde_id=ultimos[origen]):
+                        emails.update(f[3] for f in filas if anillo.nodo(f[3]) == nombre)
+                    if emails:
+                        self._recopiar(fuente_origen, destino, nombre_tabla, sorted(emails), lote)
+                        movidos.setdefault(origen, set()).update(emails)
+                self.fragmentos[nombre] = destino
+                self._anillo = anillo
+            finally:
+                with self._cond:
+                    self._sucias = None
+                self._reanudar()
+            informar(f"Anillo cambiado; escrituras pausadas {(time.monotonic() - inicio_pausa) * 1e3:.0f} ms")
+        except BaseException:
+            with self._cond:
+                self._sucias = None
+            raise
+
+        # 3. limpieza de los orígenes (ya nadie los lee para estos emails)
+        for origen, emails in movidos.items():
+            self._borrar(self.fragmentos[origen], nombre_tabla, sorted(emails), lote)
+        invalidar_estadisticas(nombre_tabla)  # los conteos de cada fragmento ya no valen
+        total = sum(len(e) for e in movidos.values())
+        informar(f"{total} usuarios movidos a {nombre}")
+        return total
+
+    def _pausar(self):
+        with self._cond:
+            self._pausado = True
+            while self._escribiendo:
+                self._cond.wait()
+
+    def _reanudar(self):
+        with self._cond:
+            self._pausado = False
+            self._cond.notify_all()
+
+    @staticmethod
+    def _lotes(fuente, nombre_tabla, lote, desde_id=0):
+        """Lotes de (id, *COLUMNAS_COPIA) ordenados por id, por keyset."""
+        with usar_conexion(fuente) as (conn, backend):
+            columnas = ", ".join(backend.citar(c) for c in ("id",) + COLUMNAS_COPIA)
+            id_ = backend.citar("id")
+            sql = backend.select(columnas, backend.citar(nombre_tabla), where=f"{id_} > ?",
+                                 orden=id_, limite=lote)
+            cursor = conn.cursor()
+            try:
+                while True:
+                    cursor.execute(sql, (desde_id,))
+                    filas = [tuple(f) for f in cursor.fetchall()]
+                    if not filas:
+                        return
+                    yield filas
+                    desde_id = filas[-1][0]
+            finally:
+                cursor.close()
+
+    @staticmethod
+    def _borrar(fuente, nombre_tabla, emails, lote):
+        with usar_conexion(fuente) as (conn, backend):
+            cursor = conn.cursor()
+            for desde in range(0, len(emails), lote):
+                parte = emails[desde:desde + lote]
+                cursor.execute(
+                    f"DELETE FROM {backend.citar(nombre_tabla)} "
+                    f"WHERE {backend.citar('email')} IN ({backend.marcadores(len(parte))})",
+                    parte,
+                )
+            conn.commit()
+            cursor.close()
+
+    def _copiar(self, destino, nombre_tabla, filas):
+        """Inserta filas (COLUMNAS_COPIA) en destino, reemplazando las que ya estén."""
+        if not filas:
+            return
+        self._borrar(destino, nombre_tabla, [f[2] for f in filas], len(filas))
+        with usar_conexion(destino) as (conn, backend):
+            cursor = conn.cursor()
+            backend.preparar_cursor_masivo(cursor)
+            cursor.executemany(
+                f"INSERT INTO {backend.citar(nombre_tabla)}"
+                f"({', '.join(backend.citar(c) for c in COLUMNAS_COPIA)}) "
+                f"VALUES ({backend.marcadores(len(COLUMNAS_COPIA))})",
+                filas,
+            )
+            conn.commit()
+            cursor.close()
+
+    def _recopiar(self, origen, destino, nombre_tabla, emails, lote):
+        """Vuelve a copiar estos emails desde origen; los que ya no estén se borran del destino."""
+        for desde in range(0, len(emails), lote):
+            parte = emails[desde:desde + lote]
+            with usar_conexion(origen) as (conn, backend):
+                cursor = conn.cursor()
+                cursor.execute(
+                    backend.select(", ".join(backend.citar(c) for c in COLUMNAS_COPIA), backend.citar(nombre_tabla),
+                                   where=f"{backend.citar('email')} IN ({backend.marcadores(len(parte))})"),
+                    parte,
+                )
+                filas = [tuple(f) for f in cursor.fetchall()]
+                cursor.close()
+            self._borrar(destino, nombre_tabla, parte, lote)
+            self._copiar(destino, nombre_tabla, filas)
+
+    def cerrar(self):
+        self._hilos.shutdown(wait=True)
+        for fuente in self.fragmentos.values():
+            cerrar = getattr(fuente, "cerrar", None)
+            if cerrar is not None:
+                cerrar()
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import conexion_sql  # noqa: E402
+from backends import SQLiteBackend  # noqa: E402
+from limitador import configurar_limitador, obtener_limitador  # noqa: E402
+from security import crear_hash_seguro  # noqa: E402
+
+CONTRASEÑA = "Secreto123"
+
+
+@pytest.fixture(autouse=True)
+def aislar_globales():
+    """Sin limitador ni cachés de login: las pruebas miran a dónde va cada consulta."""
+    limitador, cache, negativo = obtener_limitador(), conexion_sql._cache_usuarios, conexion_sql._cache_negativo
+    filtro, cargador = conexion_sql.obtener_filtro_emails(), conexion_sql.obtener_cargador()
+    configurar_limitador(None)
+    conexion_sql.configurar_cache_usuarios(None)
+    conexion_sql.configurar_cache_negativo(None)
+    conexion_sql.configurar_filtro_emails(None)
+    conexion_sql.configurar_cargador(None)
+    yield
+    configurar_limitador(limitador)
+    conexion_sql.configurar_cache_usuarios(cache)
+    conexion_sql.configurar_cache_negativo(negativo)
+    conexion_sql.configurar_filtro_emails(filtro)
+    conexion_sql.configurar_cargador(cargador)
+
+
+@pytest.fixture(scope="session")
+def hash_prueba():
+    return crear_hash_seguro(CONTRASEÑA)
+
+
+@pytest.fixture
+def crear_base(tmp_path):
+    """Fábrica de bases SQLite en archivo con el esquema al día."""
+    def crear(nombre):
+        backend = SQLiteBackend(str(tmp_path / f"{nombre}.db"))
+        conn = backend.conectar()
+        conexion_sql.crear_esquema(conn)
+        conn.close()
+        return backend
+    return crear
@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+import conexion_sql
+from async_sql import AccesoAsync
+from cache_usuarios import CacheNegativo, CacheUsuarios
+from conftest import CONTRASEÑA
+from conexion_sql import (EstadoAutenticacion, autenticar, cambiar_contraseña, crear_pool, insertar_lote,
+                          usar_conexion)
+from limitador import CubetasFragmentadas, LimitadorIntentos, configurar_limitador
+
+
+@pytest.fixture
+def pool(crear_base, hash_prueba):
+    backend = crear_base("usuarios")
+    p = crear_pool(backend, max_tamaño=2)
+    with usar_conexion(p) as (conn, backend):
+        insertar_lote(conn, backend, "Usuarios", [("Real", "real@x.com", hash_prueba, datetime.now())])
+    yield p
+    p.cerrar()
+
+
+@pytest.fixture
+def limitador():
+    # Sin recarga de fichas que cuente: solo se mira el bloqueo por fallos
+    l = LimitadorIntentos(por_email=CubetasFragmentadas(capacidad=100, umbral_bloqueo=5))
+    configurar_limitador(l)
+    return l
+
+
+def test_negativo_caduca_e_invalida():
+    cache = CacheNegativo(ttl=0.05)
+    cache.agregar("nadie@x.com")
+    assert cache.contiene("nadie@x.com")
+    cache.invalidar("nadie@x.com")
+    assert not cache.contiene("nadie@x.com")
+    cache.agregar("nadie@x.com")
+    time.sleep(0.06)
+    assert not cache.contiene("nadie@x.com")
+    assert len(cache) == 0
+
+
+def test_negativo_lru_con_tope():
+    cache = CacheNegativo(max_entradas=2)
+    for email in ("a@x.com", "b@x.com", "c@x.com"):
+        cache.agregar(email)
+    assert not cache.contiene("a@x.com")
+    assert cache.contiene("c@x.com")
+
+
+def test_negativo_desactivado_por_defecto(pool):
+    assert conexion_sql._cache_negativo is None
+    autenticar("nadie@x.com", CONTRASEÑA, pool)
+    autenticar("nadie@x.com", CONTRASEÑA, pool)
+    assert pool.estadisticas()["prestamos"] == 3  # la siembra de la fixture + una por login
+
+
+def test_negativo_ahorra_la_consulta_y_se_invalida_al_registrar(pool):
+    conexion_sql.configurar_cache_negativo(CacheNegativo(ttl=60))
+    for _ in range(3):
+        assert autenticar("nuevo@x.com", CONTRASEÑA, pool).estado is EstadoAutenticacion.USUARIO_DESCONOCIDO
+    assert pool.estadisticas()["prestamos"] == 2  # la siembra de la fixture + la primera búsqueda
+    conexion_sql.register("Usuarios", pool, "Nuevo", "nuevo@x.com", CONTRASEÑA)
+    assert autenticar("nuevo@x.com", CONTRASEÑA, pool).ok
+
+
+def _estados(email, intentos, pool):
+    return [autenticar(email, "Mala12345", pool).estado for _ in range(intentos)]
+
+
+def test_bloqueo_igual_para_email_real_y_desconocido(pool, limitador):
+    """Si solo se bloquearan los emails que existen, el bloqueo los delataría."""
+    conexion_sql.configurar_cache_negativo(CacheNegativo(ttl=60))
+    real = _estados("real@x.com", 8, pool)
+    desconocido = _estados("nadie@x.com", 8, pool)
+    assert real[5:] == desconocido[5:] == [EstadoAutenticacion.BLOQUEADO] * 3
+    assert EstadoAutenticacion.BLOQUEADO not in real[:5] + desconocido[:5]
+
+
+def test_bloqueo_igual_en_async(pool, limitador):
+    conexion_sql.configurar_cache_negativo(CacheNegativo(ttl=60))
+    acceso = AccesoAsync(pool)
+
+    async def intentos(email):
+        return [(await acceso.autenticar(email, "Mala12345")).estado for _ in range(7)]
+
+    try:
+        real = asyncio.run(intentos("real@x.com"))
+        desconocido = asyncio.run(intentos("nadie@x.com"))
+    finally:
+        acceso.cerrar()
+    assert real[5:] == desconocido[5:] == [EstadoAutenticacion.BLOQUEADO] * 2
+
+
+def test_resultado_no_expone_la_cache_negativa(pool):
+    conexion_sql.configurar_cache_negativo(CacheNegativo(ttl=60))
+    autenticar("nadie@x.com", CONTRASEÑA, pool)
+    resultado = autenticar("nadie@x.com", CONTRASEÑA, pool)
+    assert not hasattr(resultado, "cache_negativo")
+
+
+def test_usuarios_guarda_y_caduca():
+    cache = CacheUsuarios(ttl=0.05)
+    assert cache.obtener("a@x.com", lambda: (1, "h")) == (1, "h")
+    assert cache.obtener("a@x.com", lambda: pytest.fail("debía salir de la caché")) == (1, "h")
+    time.sleep(0.06)
+    assert cache.obtener("a@x.com", lambda: (1, "h2")) == (1, "h2")
+    assert cache.estadisticas()["aciertos"] == 1
+
+
+def test_usuarios_no_guarda_inexistentes_ni_errores():
+    cache = CacheUsuarios()
+    assert cache.obtener("nadie@x.com", lambda: None) is None
+    with pytest.raises(RuntimeError):
+        cache.obtener("a@x.com", lambda: (_ for _ in ()).throw(RuntimeError("caída")))
+    assert len(cache) == 0
+
+
+def test_usuarios_lru_con_tope():
+    cache = CacheUsuarios(max_entradas=2)
+    for i in range(3):
+        cache.obtener(f"u{i}@x.com", lambda: (1, "h"))
+    assert len(cache) == 2
+
+
+def test_usuarios_single_flight():
+    cache = CacheUsuarios()
+    cargas, soltar = [], threading.Event()
+
+    def cargar():
+        cargas.append(1)
+        soltar.wait(2)
+        return (1, "h")
+
+    with ThreadPoolExecutor(10) as hilos:
+        futuros = [hilos.submit(cache.obtener, "a@x.com", cargar) for _ in range(10)]
+        while cache.estadisticas()["esperas"] < 9:
+            time.sleep(0.005)
+        soltar.set()
+        assert [f.result() for f in futuros] == [(1, "h")] * 10
+    assert len(cargas) == 1
+
+
+def test_usuarios_error_llega_a_todos_los_que_esperan():
+    cache = CacheUsuarios()
+    soltar = threading.Event()
+
+    def cargar():
+        soltar.wait(2)
+        raise RuntimeError("caída")
+
+    with ThreadPoolExecutor(3) as hilos:
+        futuros = [hilos.submit(cache.obtener, "a@x.com", cargar) for _ in range(3)]
+        while cache.estadisticas()["esperas"] < 2:
+            time.sleep(0.005)
+        soltar.set()
+        for futuro in futuros:
+            with pytest.raises(RuntimeError):
+                futuro.result()
+    assert cache.obtener("a@x.com", lambda: (1, "h")) == (1, "h")  # el error no se guardó
+
+
+def test_usuarios_invalidar_durante_la_carga_no_guarda_lo_viejo():
+    cache = CacheUsuarios()
+
+    def cargar():
+        cache.invalidar("a@x.com")  # p.ej. un cambio de contraseña mientras se leía
+        return (1, "viejo")
+
+    assert cache.obtener("a@x.com", cargar) == (1, "viejo")
+    assert cache.obtener("a@x.com", lambda: (1, "nuevo")) == (1, "nuevo")
+
+
+def test_usuarios_futuro_comparte_el_pedido():
+    cache = CacheUsuarios()
+    pedidos = []
+
+    def pedir():
+        pedido = Future()
+        pedidos.append(pedido)
+        return pedido
+
+    uno, otro = cache.futuro("a@x.com", pedir), cache.futuro("a@x.com", pedir)
+    assert uno is otro and len(pedidos) == 1
+    pedidos[0].set_result((1, "h"))
+    assert uno.result() == (1, "h")
+    assert cache.futuro("a@x.com", pedir).result() == (1, "h") and len(pedidos) == 1
+
+
+def test_login_con_cache_y_cambio_de_contraseña(pool):
+    conexion_sql.configurar_cache_usuarios(CacheUsuarios())
+    prestamos = pool.estadisticas()["prestamos"]
+    for _ in range(3):
+        assert autenticar("real@x.com", CONTRASEÑA, pool).ok
+    assert pool.estadisticas()["prestamos"] - prestamos == 1
+    assert cambiar_contraseña("real@x.com", "Nueva12345", pool)
+    assert not autenticar("real@x.com", CONTRASEÑA, pool).ok  # se invalidó
+    assert autenticar("real@x.com", "Nueva12345", pool).ok
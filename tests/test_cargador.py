@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import conexion_sql
+from cargador import CargadorCredenciales
+from conftest import CONTRASEÑA
+from conexion_sql import autenticar, crear_pool, insertar_lote, usar_conexion
+
+EMAILS = [f"u{i}@x.com" for i in range(8)]
+
+
+@pytest.fixture
+def pool(crear_base, hash_prueba):
+    p = crear_pool(crear_base("cargador"), max_tamaño=4)
+    with usar_conexion(p) as (conn, backend):
+        insertar_lote(conn, backend, "Usuarios", [("U", e, hash_prueba, datetime.now()) for e in EMAILS])
+    yield p
+    p.cerrar()
+
+
+@pytest.fixture
+def crear_cargador(pool):
+    creados = []
+
+    def crear(**opciones):
+        creados.append(CargadorCredenciales(pool, **opciones))
+        return creados[-1]
+    yield crear
+    for cargador in creados:
+        cargador.cerrar()
+
+
+def test_lote_sale_al_llenarse_sin_esperar_la_ventana(crear_cargador, pool, hash_prueba):
+    cargador = crear_cargador(ventana=10, max_lote=4)
+    inicio = time.monotonic()
+    futuros = [cargador.cargar(e) for e in EMAILS]
+    resultados = [f.result(timeout=2) for f in futuros]
+    assert time.monotonic() - inicio < 2
+    assert all(r is not None and r[1] == hash_prueba for r in resultados)
+    stats = cargador.estadisticas()
+    assert stats["lotes"] == 2 and stats["lote_max"] == 4
+
+
+def test_lote_sale_al_cerrarse_la_ventana(crear_cargador):
+    cargador = crear_cargador(ventana=0.1, max_lote=64)
+    inicio = time.monotonic()
+    futuros = [cargador.cargar(e) for e in EMAILS[:3]] + [cargador.cargar("nadie@x.com")]
+    resultados = [f.result(timeout=2) for f in futuros]
+    assert time.monotonic() - inicio >= 0.09
+    assert resultados[3] is None and None not in resultados[:3]
+    assert cargador.estadisticas()["lotes"] == 1
+
+
+def test_mismo_email_comparte_el_future(crear_cargador):
+    cargador = crear_cargador(ventana=0.05)
+    uno, otro = cargador.cargar("u1@x.com"), cargador.cargar(" U1@X.com ")
+    assert uno is otro
+    uno.result(timeout=2)
+    stats = cargador.estadisticas()
+    assert stats["peticiones"] == 2 and stats["emails"] == 1
+
+
+def test_error_llega_a_todo_el_lote(crear_cargador):
+    cargador = crear_cargador(ventana=0.02)
+    cargador.nombre_tabla = "NoExiste"
+    futuros = [cargador.cargar(e) for e in EMAILS[:3]]
+    for futuro in futuros:
+        with pytest.raises(Exception):
+            futuro.result(timeout=2)
+    assert cargador.estadisticas()["errores"] == 1
+
+
+def test_cerrar_resuelve_lo_pendiente(pool):
+    cargador = CargadorCredenciales(pool, ventana=10)
+    futuro = cargador.cargar("u1@x.com")
+    cargador.cerrar()
+    assert futuro.result(timeout=0) is not None
+    with pytest.raises(RuntimeError):
+        cargador.cargar("u2@x.com")
+
+
+def test_desde_asyncio(crear_cargador):
+    cargador = crear_cargador(ventana=0.02)
+
+    async def varios():
+        return await asyncio.gather(*(cargador.obtener_async(e) for e in EMAILS))
+
+    assert None not in asyncio.run(varios())
+    assert cargador.estadisticas()["lotes"] == 1
+
+
+def test_logins_concurrentes_comparten_consulta(crear_cargador, pool):
+    conexion_sql.configurar_cargador(crear_cargador(ventana=0.05))
+    prestamos = pool.estadisticas()["prestamos"]
+    barrera = threading.Barrier(len(EMAILS))
+    resultados = []
+
+    def login(email):
+        barrera.wait()
+        resultados.append(autenticar(email, CONTRASEÑA, pool).ok)
+
+    hilos = [threading.Thread(target=login, args=(e,)) for e in EMAILS]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert resultados == [True] * len(EMAILS)
+    assert pool.estadisticas()["prestamos"] - prestamos == 1
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import pytest
+from argon2 import PasswordHasher
+
+import cola_rehash
+from cola_rehash import ColaRehash, obtener_cola_rehash
+from conftest import CONTRASEÑA
+from conexion_sql import autenticar, buscar_credenciales, insertar_lote, usar_conexion
+from security import necesita_rehash
+from sharding import Fragmentador
+
+EMAILS = [f"u{i}@x.com" for i in range(12)]
+
+
+@pytest.fixture(scope="module")
+def hash_viejo():
+    return PasswordHasher(time_cost=1, memory_cost=8 * 1024, parallelism=1).hash(CONTRASEÑA)
+
+
+@pytest.fixture
+def fragmentador(crear_base, hash_viejo):
+    f = Fragmentador({nombre: crear_base(nombre) for nombre in "ab"})
+    for email in EMAILS:
+        with usar_conexion(f, clave=email) as (conn, backend):
+            insertar_lote(conn, backend, "Usuarios", [("U", email, hash_viejo, datetime.now())])
+    yield f
+    f.cerrar()
+
+
+@pytest.fixture
+def escrituras(monkeypatch):
+    """Cuenta las conexiones que pide la cola para escribir."""
+    contadas = []
+    original = cola_rehash.usar_conexion
+
+    def contar(fuente, *args, **kwargs):
+        contadas.append(fuente)
+        return original(fuente, *args, **kwargs)
+
+    monkeypatch.setattr(cola_rehash, "usar_conexion", contar)
+    return contadas
+
+
+def test_hash_viejo_necesita_rehash(hash_viejo):
+    assert necesita_rehash(hash_viejo)
+
+
+def test_agrupa_por_fragmento_y_no_por_login(fragmentador, hash_viejo, escrituras):
+    ids = {email: buscar_credenciales(email, fragmentador)[0] for email in EMAILS}
+    cola = ColaRehash(tamaño_lote=len(EMAILS), intervalo=0.5)
+    try:
+        for email in EMAILS:
+            assert cola.encolar(ids[email], hash_viejo, CONTRASEÑA, fragmentador.fuente_de(email), email)
+        cola.vaciar()
+    finally:
+        cola.cerrar()
+    assert len(escrituras) == len({fragmentador.fragmento_de(e) for e in EMAILS})  # un executemany por fragmento
+    assert cola.estadisticas()["escritos"] == len(EMAILS)
+    assert not any(necesita_rehash(buscar_credenciales(e, fragmentador)[1]) for e in EMAILS)
+
+
+def test_con_fragmentador_agrupa_por_fragmento(fragmentador, hash_viejo, escrituras):
+    cola = ColaRehash(tamaño_lote=len(EMAILS), intervalo=0.5)
+    try:
+        for email in EMAILS:
+            assert cola.encolar(0, hash_viejo, CONTRASEÑA, fragmentador, email)  # el id no hace falta
+        cola.vaciar()
+    finally:
+        cola.cerrar()
+    assert len(escrituras) == len({fragmentador.fragmento_de(e) for e in EMAILS})
+    assert not any(necesita_rehash(buscar_credenciales(e, fragmentador)[1]) for e in EMAILS)
+
+
+def test_rehash_durante_el_rebalanceo_no_se_pierde(fragmentador, crear_base):
+    copiados = []
+
+    def informar(texto):
+        # Al acabar la copia en caliente: las filas ya copiadas llevan el hash viejo
+        if "copiados" in texto:
+            copiados.append(texto)
+            if len(copiados) == 2:
+                for email in EMAILS:
+                    assert autenticar(email, CONTRASEÑA, fragmentador).ok
+                obtener_cola_rehash().vaciar()
+
+    movidos = fragmentador.agregar_fragmento("c", crear_base("c"), informar=informar)
+    assert movidos > 0
+    assert not any(necesita_rehash(buscar_credenciales(e, fragmentador)[1]) for e in EMAILS)
+
+
+def test_no_pisa_un_cambio_de_contraseña(fragmentador, hash_viejo, hash_prueba):
+    id_usuario, _ = buscar_credenciales("u1@x.com", fragmentador)
+    with usar_conexion(fragmentador, clave="u1@x.com") as (conn, _):
+        conn.execute("UPDATE Usuarios SET Contraseña = ? WHERE email = ?", (hash_prueba, "u1@x.com"))
+        conn.commit()
+    cola = ColaRehash(tamaño_lote=1)
+    try:
+        cola.encolar(id_usuario, hash_viejo, "OtraClave123", fragmentador.fuente_de("u1@x.com"), "u1@x.com")
+        cola.vaciar()
+    finally:
+        cola.cerrar()
+    assert buscar_credenciales("u1@x.com", fragmentador)[1] == hash_prueba
+
+
+def test_no_encola_dos_veces_el_mismo_email(fragmentador, hash_viejo):
+    cola = ColaRehash(tamaño_lote=100, intervalo=0.1)
+    try:
+        assert cola.encolar(1, hash_viejo, CONTRASEÑA, fragmentador.fuente_de("u1@x.com"), "u1@x.com")
+        assert not cola.encolar(1, hash_viejo, CONTRASEÑA, fragmentador.fuente_de("u1@x.com"), "u1@x.com")
+        # El mismo id en otro fragmento es otro usuario
+        assert cola.encolar(1, hash_viejo, CONTRASEÑA, fragmentador.fuente_de("u2@x.com"), "u2@x.com")
+    finally:
+        cola.cerrar()
@@ -0,0 +1,134 @@
+import shutil
+import time
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from backends import SQLiteBackend
+from conftest import CONTRASEÑA
+from conexion_sql import (EstadoAutenticacion, autenticar, buscar_credenciales_lote, crear_pool, insertar_lote,
+                          usar_conexion)
+from enrutador import Enrutador
+
+
+@pytest.fixture
+def rutas(tmp_path, crear_base, hash_prueba):
+    """Primario con un usuario y dos réplicas copiadas de él (ya no se replica más)."""
+    primario = crear_base("primario")
+    conn = primario.conectar()
+    insertar_lote(conn, primario, "Usuarios", [("Base", "base@x.com", hash_prueba, datetime.now())])
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    copias = {}
+    for nombre in ("r1", "r2"):
+        copias[nombre] = str(tmp_path / f"{nombre}.db")
+        shutil.copy(str(tmp_path / "primario.db"), copias[nombre])
+    return str(tmp_path / "primario.db"), copias
+
+
+@pytest.fixture
+def enrutador(rutas):
+    primario, copias = rutas
+    e = Enrutador(SQLiteBackend(primario),
+                  replicas=[(SQLiteBackend(copias["r1"]), 3), SQLiteBackend(copias["r2"])],
+                  ventana=0.3)
+    yield e
+    e.cerrar()
+
+
+def base_de(conn) -> str:
+    """Nombre del archivo al que apunta la conexión."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA database_list")
+    ruta = cursor.fetchone()[2]
+    cursor.close()
+    return ruta.rsplit("/", 1)[-1].split(".")[0]
+
+
+def leer(enrutador, clave=None) -> str:
+    with enrutador.conexion(solo_lectura=True, clave=clave) as conn:
+        return base_de(conn)
+
+
+def insertar(enrutador, email, hash_guardado):
+    with usar_conexion(enrutador, clave=email) as (conn, backend):
+        assert insertar_lote(conn, backend, "Usuarios", [("N", email, hash_guardado, datetime.now())]) == []
+
+
+def test_lecturas_reparto_ponderado_suave(enrutador):
+    orden = [leer(enrutador) for _ in range(8)]
+    assert Counter(orden) == {"r1": 6, "r2": 2}
+    assert "r2r2" not in "".join(orden)  # "suave": no se agrupan
+
+
+def test_escrituras_van_al_primario(enrutador, hash_prueba):
+    with enrutador.conexion() as conn:
+        assert base_de(conn) == "primario"
+    insertar(enrutador, "nuevo@x.com", hash_prueba)
+    with usar_conexion(enrutador.primario) as (conn, _):
+        assert conn.execute("SELECT COUNT(*) FROM Usuarios WHERE email = 'nuevo@x.com'").fetchone()[0] == 1
+
+
+def test_lectura_pegajosa_tras_escritura(enrutador, hash_prueba):
+    insertar(enrutador, "nuevo@x.com", hash_prueba)
+    assert enrutador.pegajosa("nuevo@x.com")
+    assert leer(enrutador, "nuevo@x.com") == "primario"
+    assert leer(enrutador, "otro@x.com") != "primario"
+    # Las réplicas de la prueba no reciben el alta: solo el primario la conoce
+    assert autenticar("nuevo@x.com", CONTRASEÑA, enrutador).estado is EstadoAutenticacion.EXITO
+    assert enrutador.estadisticas()["pegajosas"] >= 2
+
+    time.sleep(0.35)  # pasa la ventana
+    assert not enrutador.pegajosa("nuevo@x.com")
+    assert leer(enrutador, "nuevo@x.com") != "primario"
+    assert autenticar("nuevo@x.com", CONTRASEÑA, enrutador).estado is EstadoAutenticacion.USUARIO_DESCONOCIDO
+
+
+def test_lote_de_credenciales_separa_los_pegajosos(enrutador, hash_prueba):
+    insertar(enrutador, "nuevo@x.com", hash_prueba)
+    encontrados = buscar_credenciales_lote(["nuevo@x.com", "base@x.com", "nadie@x.com"], enrutador)
+    assert set(encontrados) == {"nuevo@x.com", "base@x.com"}
+
+
+def test_replica_caida_se_aparta_y_se_lee_del_resto(rutas, tmp_path):
+    primario, copias = rutas
+    caida = SQLiteBackend(str(tmp_path / "no-existe" / "x.db"))
+    e = Enrutador(SQLiteBackend(primario), replicas=[caida, SQLiteBackend(copias["r2"])], reintento=5)
+    try:
+        assert [leer(e) for _ in range(4)] == ["r2"] * 4
+        stats = e.estadisticas()
+        assert stats["fallos_replica"] == 1  # no se reintenta dentro de `reintento`
+        assert stats["replicas_caidas"] == 1
+    finally:
+        e.cerrar()
+
+
+def test_sin_replicas_disponibles_se_lee_del_primario(rutas, tmp_path):
+    primario, _ = rutas
+    e = Enrutador(SQLiteBackend(primario), replicas=[SQLiteBackend(str(tmp_path / "no-existe" / "x.db"))])
+    try:
+        assert leer(e) == "primario"
+        assert autenticar("base@x.com", CONTRASEÑA, e).estado is EstadoAutenticacion.EXITO
+    finally:
+        e.cerrar()
+
+
+def test_replica_ocupada_no_se_espera_ni_se_aparta(rutas):
+    primario, copias = rutas
+    r1 = crear_pool(SQLiteBackend(copias["r1"]), max_tamaño=1, timeout=30)
+    r2 = crear_pool(SQLiteBackend(copias["r2"]), max_tamaño=1, timeout=30)
+    e = Enrutador(SQLiteBackend(primario), replicas=[r1, r2])
+    try:
+        with r1.conexion():
+            inicio = time.monotonic()
+            assert leer(e) == "r2"
+            with r2.conexion():
+                assert leer(e) == "primario"  # todas ocupadas
+            assert time.monotonic() - inicio < 1
+        stats = e.estadisticas()
+        assert stats["replicas_ocupadas"] == 3
+        assert stats["fallos_replica"] == stats["replicas_caidas"] == 0
+        assert {leer(e), leer(e)} == {"r1", "r2"}  # r1 vuelve al reparto en cuanto se libera
+    finally:
+        e.cerrar()
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+
+import conexion_sql
+from conftest import CONTRASEÑA
+from conexion_sql import crear_pool, insertar_lote, usar_conexion
+from filtro_bloom import FiltroBloom
+from sharding import Fragmentador
+
+EMAILS = [f"u{i}@x.com" for i in range(2000)]
+
+
+def test_sin_falsos_negativos_y_error_acotado():
+    filtro = FiltroBloom(capacidad=len(EMAILS), error=0.01)
+    for email in EMAILS:
+        filtro.agregar(email)
+    assert all(filtro.puede_estar(e) for e in EMAILS)
+    assert "U7@X.COM " in filtro  # se normaliza como el login
+    falsos = sum(filtro.puede_estar(f"otro{i}@x.com") for i in range(20_000))
+    assert falsos / 20_000 < 0.02
+    assert filtro.tasa_error() == pytest.approx(0.01, rel=0.2)
+    assert len(filtro) == len(EMAILS)
+
+
+def test_parametros_inválidos():
+    with pytest.raises(ValueError):
+        FiltroBloom(capacidad=0)
+    with pytest.raises(ValueError):
+        FiltroBloom(error=1)
+
+
+def test_guardar_y_cargar(tmp_path):
+    filtro = FiltroBloom(capacidad=1000)
+    for email in EMAILS[:500]:
+        filtro.agregar(email)
+    ruta = tmp_path / "emails.bloom"
+    filtro.guardar(ruta)
+    assert not (tmp_path / "emails.bloom.tmp").exists()
+    cargado = FiltroBloom.cargar(ruta)
+    assert (cargado.bits, cargado.funciones, len(cargado)) == (filtro.bits, filtro.funciones, 500)
+    assert all(cargado.puede_estar(e) for e in EMAILS[:500])
+    assert [cargado.puede_estar(e) for e in EMAILS[500:]] == [filtro.puede_estar(e) for e in EMAILS[500:]]
+    cargado.agregar("nuevo@x.com")  # sigue siendo modificable
+    assert cargado.puede_estar("nuevo@x.com")
+
+
+def test_cargar_rechaza_archivos_ajenos_o_truncados(tmp_path):
+    ruta = tmp_path / "emails.bloom"
+    FiltroBloom(capacidad=1000).guardar(ruta)
+    datos = ruta.read_bytes()
+    ruta.write_bytes(datos[:-10])
+    with pytest.raises(ValueError, match="truncado"):
+        FiltroBloom.cargar(ruta)
+    ruta.write_bytes(b"XXXX" + datos[4:])
+    with pytest.raises(ValueError, match="no es un filtro"):
+        FiltroBloom.cargar(ruta)
+
+
+def _sembrar(fuente, emails, hash_guardado):
+    with usar_conexion(fuente, clave=emails[0]) as (conn, backend):
+        filas = [("U", e, hash_guardado, datetime.now()) for e in emails]
+        assert insertar_lote(conn, backend, "Usuarios", filas) == []
+
+
+def test_desde_tabla(crear_base, hash_prueba):
+    pool = crear_pool(crear_base("bloom"))
+    try:
+        _sembrar(pool, EMAILS[:300], hash_prueba)
+        filtro = FiltroBloom.desde_tabla(pool, tamaño_lote=64)
+    finally:
+        pool.cerrar()
+    assert len(filtro) == 300 and filtro.capacidad == 100_000
+    assert all(filtro.puede_estar(e) for e in EMAILS[:300])
+
+
+def test_desde_tabla_con_fragmentos(crear_base, hash_prueba):
+    f = Fragmentador({nombre: crear_base(nombre) for nombre in "ab"})
+    try:
+        for email in EMAILS[:50]:
+            _sembrar(f, [email], hash_prueba)
+        filtro = FiltroBloom.desde_tabla(f)
+    finally:
+        f.cerrar()
+    assert len(filtro) == 50 and all(filtro.puede_estar(e) for e in EMAILS[:50])
+
+
+def test_altas_actualizan_el_filtro_y_frenan_duplicados(crear_base, capsys):
+    pool = crear_pool(crear_base("bloom"))
+    filtro = FiltroBloom(capacidad=1000)
+    conexion_sql.configurar_filtro_emails(filtro)
+    try:
+        assert conexion_sql.register("Usuarios", pool, "N", "a@x.com", CONTRASEÑA) is True
+        assert filtro.puede_estar("a@x.com")
+        assert not conexion_sql.email_registrado("b@x.com", pool)
+        assert filtro.estadisticas()["descartados"] >= 1
+        prestamos = pool.estadisticas()["prestamos"]
+        assert conexion_sql.register("Usuarios", pool, "N", "A@x.com", CONTRASEÑA) == []
+        assert pool.estadisticas()["prestamos"] - prestamos == 1  # solo la confirmación
+        assert "ya está registrado" in capsys.readouterr().out
+    finally:
+        pool.cerrar()
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import CONTRASEÑA
+from conexion_sql import EstadoAutenticacion, autenticar, crear_pool, insertar_lote, usar_conexion
+from limitador import CubetasFragmentadas, LimitadorIntentos, configurar_limitador
+
+
+def test_cubeta_gasta_y_recarga():
+    cubetas = CubetasFragmentadas(capacidad=2, recarga_por_s=1)
+    for _ in range(2):
+        assert cubetas.espera("k", 0.0) == 0
+        cubetas.consumir("k", 0.0)
+    assert cubetas.espera("k", 0.0) == pytest.approx(1.0)
+    assert cubetas.espera("k", 1.0) == 0
+
+
+def test_bloqueo_exponencial_con_tope():
+    cubetas = CubetasFragmentadas(capacidad=100, umbral_bloqueo=3, bloqueo_base=1, bloqueo_max=4)
+    for _ in range(2):
+        cubetas.fallo("k", 0.0)
+    assert cubetas.espera("k", 0.0) == 0
+    cubetas.fallo("k", 0.0)
+    assert cubetas.espera("k", 0.0) == pytest.approx(1)
+    cubetas.fallo("k", 0.0)
+    assert cubetas.espera("k", 0.0) == pytest.approx(2)
+    for _ in range(5):
+        cubetas.fallo("k", 0.0)
+    assert cubetas.espera("k", 0.0) == pytest.approx(4)
+    cubetas.exito("k")
+    assert cubetas.espera("k", 0.0) == 0
+
+
+def test_lru_con_tope():
+    cubetas = CubetasFragmentadas(max_claves=4, fragmentos=1)
+    for i in range(10):
+        cubetas.espera(f"k{i}", 0.0)
+    assert len(cubetas) == 4
+
+
+def test_el_exito_perdona_al_email_pero_no_al_cliente():
+    limitador = LimitadorIntentos(
+        por_email=CubetasFragmentadas(capacidad=100, umbral_bloqueo=2),
+        por_cliente=CubetasFragmentadas(capacidad=100, umbral_bloqueo=3),
+    )
+    for email in ("a@x.com", "a@x.com", "b@x.com"):
+        limitador.registrar_fallo(email, "1.2.3.4")
+    limitador.registrar_exito("a@x.com", "1.2.3.4")
+    assert limitador.permitir("c@x.com", "1.2.3.4") > 0  # el cliente ya suma 3 fallos
+    assert limitador.permitir("a@x.com", "5.6.7.8") == 0
+    assert limitador.estadisticas()["rechazados"] == 1
+
+
+@pytest.fixture
+def pool(crear_base, hash_prueba):
+    p = crear_pool(crear_base("limitador"))
+    with usar_conexion(p) as (conn, backend):
+        insertar_lote(conn, backend, "Usuarios", [("U", "a@x.com", hash_prueba, datetime.now())])
+    yield p
+    p.cerrar()
+
+
+def test_login_cuenta_fallos_y_bloquea_sin_tocar_la_base(pool):
+    configurar_limitador(LimitadorIntentos(por_email=CubetasFragmentadas(capacidad=100, umbral_bloqueo=3)))
+    estados = [autenticar("a@x.com", "Mala12345", pool).estado for _ in range(4)]
+    assert estados == [EstadoAutenticacion.CONTRASEÑA_INCORRECTA] * 3 + [EstadoAutenticacion.BLOQUEADO]
+    prestamos = pool.estadisticas()["prestamos"]
+    bloqueado = autenticar("a@x.com", CONTRASEÑA, pool)
+    assert bloqueado.estado is EstadoAutenticacion.BLOQUEADO and bloqueado.reintentar_en > 0
+    assert pool.estadisticas()["prestamos"] == prestamos
+
+
+def test_login_desconocido_cuenta_igual_que_contraseña_incorrecta(pool):
+    configurar_limitador(LimitadorIntentos(por_email=CubetasFragmentadas(capacidad=100, umbral_bloqueo=3)))
+    real = [autenticar("a@x.com", "Mala12345", pool).estado for _ in range(4)]
+    desconocido = [autenticar("nadie@x.com", "Mala12345", pool).estado for _ in range(4)]
+    assert real[3] is desconocido[3] is EstadoAutenticacion.BLOQUEADO
+
+
+def test_login_correcto_reinicia_los_fallos(pool):
+    configurar_limitador(LimitadorIntentos(por_email=CubetasFragmentadas(capacidad=100, umbral_bloqueo=3)))
+    for _ in range(2):
+        autenticar("a@x.com", "Mala12345", pool)
+    assert autenticar("a@x.com", CONTRASEÑA, pool).ok
+    for _ in range(2):
+        assert autenticar("a@x.com", "Mala12345", pool).estado is EstadoAutenticacion.CONTRASEÑA_INCORRECTA
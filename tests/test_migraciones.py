@@ -0,0 +1,65 @@
+from dataclasses import replace
+
+import pytest
+
+from backends import SQLiteBackend
+from conexion_sql import crear_pool, usar_conexion
+from migraciones import MIGRACIONES, MigracionAlterada, estado, migrar
+
+ULTIMA = MIGRACIONES[-1].version
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """Base vacía: sin tabla Usuarios ni schema_version."""
+    p = crear_pool(SQLiteBackend(str(tmp_path / "migraciones.db")))
+    yield p
+    p.cerrar()
+
+
+def _versiones(pool):
+    with usar_conexion(pool) as (conn, _):
+        return [v for v, in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+
+
+def test_aplica_en_orden_y_una_sola_vez(pool):
+    informes = []
+    assert migrar(pool, informar=informes.append) == list(range(1, ULTIMA + 1))
+    assert len(informes) == ULTIMA
+    assert _versiones(pool) == list(range(1, ULTIMA + 1))
+    assert all(aplicada for _, _, aplicada in estado(pool))
+    with usar_conexion(pool) as (conn, _):
+        indices = {n for n, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"UX_Usuarios_email", "IX_Usuarios_fecha_registro"} <= indices
+    assert migrar(pool) == []
+
+
+def test_hasta_limita_y_luego_sigue(pool):
+    assert migrar(pool, hasta=2) == [1, 2]
+    assert [aplicada for _, _, aplicada in estado(pool)] == [v <= 2 for v in range(1, ULTIMA + 1)]
+    assert migrar(pool) == list(range(3, ULTIMA + 1))
+
+
+def test_migracion_editada_tras_aplicarse_se_rechaza(pool):
+    migrar(pool, hasta=2)
+    editada = replace(MIGRACIONES[1], sql=dict(MIGRACIONES[1].sql, sqlite=["SELECT 1"]))
+    migraciones = [MIGRACIONES[0], editada] + MIGRACIONES[2:]
+    with pytest.raises(MigracionAlterada, match="migración 2"):
+        migrar(pool, migraciones=migraciones)
+    assert _versiones(pool) == [1, 2]  # no sigue con las pendientes
+    assert migrar(pool) == list(range(3, ULTIMA + 1))  # la original sigue valiendo
+
+
+def test_migracion_fallida_no_se_anota(pool):
+    migrar(pool, hasta=1)
+    rota = replace(MIGRACIONES[1], sql={"sqlite": ["UPDATE Usuarios SET email = lower(email)", "NO ES SQL"]})
+    with pytest.raises(Exception):
+        migrar(pool, migraciones=[MIGRACIONES[0], rota])
+    assert _versiones(pool) == [1]
+    assert migrar(pool, hasta=2) == [2]
+
+
+def test_sin_sql_para_el_dialecto(pool):
+    solo_sqlserver = replace(MIGRACIONES[0], sql={"sqlserver": ["SELECT 1"]})
+    with pytest.raises(ValueError, match="no tiene SQL para sqlite"):
+        migrar(pool, migraciones=[solo_sqlserver])
@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from conexion_sql import crear_pool
+from pool_conexiones import PoolAgotado, PoolConexiones
+
+
+@pytest.fixture
+def backend(crear_base):
+    return crear_base("pool")
+
+
+@pytest.fixture
+def pool(backend):
+    p = crear_pool(backend, min_tamaño=1, max_tamaño=2, timeout=0.2)
+    yield p
+    p.cerrar()
+
+
+def test_reutiliza_las_conexiones(pool):
+    for _ in range(5):
+        with pool.conexion() as conn:
+            conn.execute("SELECT 1")
+    stats = pool.estadisticas()
+    assert stats["prestamos"] == 5 and stats["creadas"] == 1 and stats["en_uso"] == 0
+
+
+def test_agotado_tras_timeout(pool):
+    uno, dos = pool.obtener(), pool.obtener()
+    inicio = time.monotonic()
+    with pytest.raises(PoolAgotado):
+        pool.obtener()
+    assert 0.15 < time.monotonic() - inicio < 2
+    assert pool.estadisticas()["agotamientos"] == 1
+    pool.devolver(uno)
+    pool.devolver(dos)
+
+
+def test_agotado_espera_a_que_se_devuelva(pool):
+    uno, dos = pool.obtener(), pool.obtener()
+    threading.Timer(0.05, pool.devolver, (uno,)).start()
+    assert pool.obtener(timeout=2) is uno
+    assert pool.estadisticas()["esperas"] == 1
+    pool.devolver(uno)
+    pool.devolver(dos)
+
+
+def test_solo_se_hace_ping_a_las_inactivas(backend):
+    p = crear_pool(backend, max_tamaño=1, ping_tras=0.1)
+    try:
+        for _ in range(5):
+            with p.conexion():
+                pass
+        assert p.estadisticas()["pings"] == 0
+        time.sleep(0.15)
+        with p.conexion():
+            pass
+        assert p.estadisticas()["pings"] == 1
+    finally:
+        p.cerrar()
+
+
+def test_ping_fallido_al_prestar_abre_otra(pool):
+    with pool.conexion() as conn:
+        rota = conn
+    rota.close()
+    pool.ping_tras = 0
+    with pool.conexion() as conn:
+        assert conn is not rota
+        conn.execute("SELECT 1")
+    stats = pool.estadisticas()
+    assert stats["ping_fallidos"] == 1 and stats["creadas"] == 2
+
+
+class _Cortable:
+    """Conexión que deja de responder (como tras un corte de red) pero cuyo rollback no falla."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.cortada = False
+        self.in_transaction = False
+
+    def cursor(self):
+        if self.cortada:
+            raise sqlite3.OperationalError("conexión cortada")
+        return self._conn.cursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+def test_error_con_conexion_cortada_la_descarta(backend):
+    p = PoolConexiones(lambda: _Cortable(backend.conectar()), max_tamaño=1, backend=backend)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            with p.conexion() as conn:
+                conn.cortada = True
+                conn.cursor()
+        stats = p.estadisticas()
+        assert stats["descartadas_error"] == 1 and stats["tamaño"] == 0
+        with p.conexion() as otra:
+            assert otra is not conn
+    finally:
+        p.cerrar()
+
+
+def test_error_con_conexion_cerrada_la_descarta(pool):
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.conexion() as conn:
+            conn.close()
+            conn.execute("SELECT 1")
+    assert pool.estadisticas()["tamaño"] == 0
+    with pool.conexion() as otra:
+        assert otra is not conn
+
+
+def test_error_con_conexion_sana_la_conserva(pool):
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.conexion() as conn:
+            conn.execute("SELECT * FROM no_existe")
+    assert pool.estadisticas()["descartadas_error"] == 0
+    with pool.conexion() as otra:
+        assert otra is conn
+
+
+def test_devolver_deshace_la_transaccion_a_medias(pool, hash_prueba):
+    with pool.conexion() as conn:
+        conn.execute("INSERT INTO Usuarios(nombre, email, Contraseña) VALUES ('U', 'a@x.com', ?)", (hash_prueba,))
+    with pool.conexion() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Usuarios").fetchone()[0] == 0
+
+
+def test_cerrado_no_presta(pool):
+    pool.cerrar()
+    with pytest.raises(PoolAgotado):
+        pool.obtener()
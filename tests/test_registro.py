@@ -0,0 +1,38 @@
+import pytest
+
+import security
+from conftest import CONTRASEÑA
+from conexion_sql import autenticar, crear_pool, register_many
+
+
+@pytest.fixture
+def pool(crear_base):
+    p = crear_pool(crear_base("usuarios"), max_tamaño=2)
+    yield p
+    p.cerrar()
+
+
+def test_register_many_no_ocupa_el_pool_mientras_hashea(pool, monkeypatch):
+    ejecutor = security.obtener_ejecutor()
+    original = ejecutor.hash_muchos
+    en_uso = []
+
+    def hash_muchos(contraseñas, **opciones):
+        en_uso.append(pool.estadisticas()["en_uso"])
+        return original(contraseñas, **opciones)
+
+    monkeypatch.setattr(ejecutor, "hash_muchos", hash_muchos)
+    usuarios = [("U", f"u{i}@x.com", CONTRASEÑA) for i in range(6)]
+    resultado = register_many("Usuarios", pool, usuarios, tamaño_lote=2, lote_min=2, lote_max=2)
+    assert resultado.insertados == 6
+    assert en_uso == [0, 0, 0]
+    assert pool.estadisticas()["prestamos"] == 3  # una por lote, solo para insertar
+
+
+def test_register_many_reporta_fallos_sin_abortar(pool):
+    usuarios = [("U", "a@x.com", CONTRASEÑA), ("U", "no-es-email", CONTRASEÑA),
+                ("U", "b@x.com", "corta"), ("U", "A@x.com", CONTRASEÑA), ("U", "c@x.com", CONTRASEÑA)]
+    resultado = register_many("Usuarios", pool, usuarios, tamaño_lote=10)
+    assert resultado.insertados == 2
+    assert [f.indice for f in resultado.fallos] == [1, 2, 3]
+    assert autenticar("c@x.com", CONTRASEÑA, pool).ok
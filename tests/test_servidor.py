@@ -0,0 +1,83 @@
+import http.client
+import json
+import threading
+from datetime import datetime
+
+import pytest
+
+import conexion_sql
+from conftest import CONTRASEÑA
+from filtro_bloom import FiltroBloom
+from servidor import ManejadorAuth, ServidorAuth
+
+
+@pytest.fixture
+def puerto(crear_base):
+    anterior = conexion_sql._backend
+    conexion_sql.configurar_backend(crear_base("servidor"))
+    servidor = ServidorAuth(("127.0.0.1", 0), ManejadorAuth)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor.server_address[1]
+    servidor.shutdown()
+    servidor.server_close()
+    conexion_sql.configurar_backend(anterior)
+
+
+def pedir(puerto, metodo, ruta, datos=None, cabeceras=None):
+    conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+    try:
+        cuerpo = json.dumps(datos).encode("utf-8") if datos is not None else None
+        conn.request(metodo, ruta, body=cuerpo, headers=cabeceras or {})
+        respuesta = conn.getresponse()
+        return respuesta.status, json.loads(respuesta.read())
+    finally:
+        conn.close()
+
+
+def prestamos():
+    return conexion_sql.obtener_pool().estadisticas()["prestamos"]
+
+
+def alta(puerto, email):
+    return pedir(puerto, "POST", "/registro", {"nombre": "N", "email": email, "contraseña": CONTRASEÑA})
+
+
+def test_registro_sin_filtro_solo_inserta(puerto):
+    assert alta(puerto, "a@x.com")[0] == 201
+    antes = prestamos()
+    assert alta(puerto, "b@x.com")[0] == 201
+    assert alta(puerto, "A@x.com")[0] == 409  # lo rechaza el índice único
+    assert prestamos() - antes == 2  # sin consulta previa
+
+
+def test_registro_con_filtro(puerto):
+    conexion_sql.configurar_filtro_emails(FiltroBloom(capacidad=1000))
+    assert alta(puerto, "a@x.com")[0] == 201
+    antes = prestamos()
+    assert alta(puerto, "b@x.com")[0] == 201  # el filtro dice que no está: solo el insert
+    assert prestamos() - antes == 1
+    assert alta(puerto, "a@x.com") == (409, {"error": "El email ya está registrado"})
+
+
+@pytest.fixture
+def sesion(puerto, hash_prueba):
+    filas = [("U", f"u{i}@x.com", hash_prueba, datetime.now()) for i in range(5)]
+    with conexion_sql.usar_conexion() as (conn, backend):
+        assert conexion_sql.insertar_lote(conn, backend, "Usuarios", filas) == []
+    estado, datos = pedir(puerto, "POST", "/login", {"email": "u0@x.com", "contraseña": CONTRASEÑA})
+    assert estado == 200
+    return {"Authorization": f"Bearer {datos['token']}"}
+
+
+@pytest.mark.parametrize("parametro", ["tama%C3%B1o", "tamano", "size"])
+def test_usuarios_tamaño_y_sus_alias(puerto, sesion, parametro):
+    estado, datos = pedir(puerto, "GET", f"/usuarios?orden=email&{parametro}=2", cabeceras=sesion)
+    assert estado == 200
+    assert len(datos["filas"]) == 2 and datos["siguiente"]
+
+
+@pytest.mark.parametrize("valor", ["abc", "0", "-3", "1.5"])
+def test_usuarios_tamaño_inválido(puerto, sesion, valor):
+    estado, datos = pedir(puerto, "GET", f"/usuarios?size={valor}", cabeceras=sesion)
+    assert (estado, datos) == (400, {"error": "El tamaño de página debe ser un entero positivo"})
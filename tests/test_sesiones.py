@@ -0,0 +1,90 @@
+import time
+from datetime import datetime
+
+import pytest
+
+import sesiones
+from conftest import CONTRASEÑA
+from conexion_sql import EstadoAutenticacion, crear_pool, insertar_lote, usar_conexion
+from sesiones import GestorSesiones, iniciar_sesion
+
+
+@pytest.fixture
+def gestor():
+    return GestorSesiones(secreto="secreto-de-prueba", ttl=60)
+
+
+def test_emitir_y_validar(gestor):
+    token = gestor.emitir(7)
+    sesion = gestor.validar(token)
+    assert sesion.id_usuario == 7
+    assert gestor.validar(token) is not None
+    assert gestor.estadisticas()["aciertos_cache"] == 2
+
+
+def test_vale_en_otro_gestor_con_el_mismo_secreto(gestor):
+    token = gestor.emitir(7)
+    assert GestorSesiones(secreto="secreto-de-prueba").validar(token).id_usuario == 7
+    assert GestorSesiones(secreto="otro").validar(token) is None
+
+
+@pytest.mark.parametrize("cambio", [
+    lambda t: t[:-1] + ("A" if t[-1] != "A" else "B"),          # firma
+    lambda t: t.replace(".7.", ".8.", 1),                        # usuario
+    lambda t: "basura",
+])
+def test_token_manipulado_no_vale(gestor, cambio):
+    assert gestor.validar(cambio(gestor.emitir(7))) is None
+
+
+def test_caduca():
+    gestor = GestorSesiones(secreto="s", ttl=0)
+    assert gestor.validar(gestor.emitir(7)) is None
+
+
+def test_revocar_un_token(gestor):
+    uno, otro = gestor.emitir(7), gestor.emitir(7)
+    gestor.validar(uno)
+    assert gestor.revocar(uno)
+    assert gestor.validar(uno) is None
+    assert gestor.validar(otro) is not None
+    assert not gestor.revocar("basura")
+
+
+def test_revocar_usuario_anula_lo_anterior_y_no_lo_siguiente(gestor):
+    antes, ajeno = gestor.emitir(7), gestor.emitir(8)
+    gestor.validar(antes)
+    gestor.revocar_usuario(7)
+    despues = gestor.emitir(7)  # en el mismo segundo que la revocación
+    assert gestor.validar(antes) is None
+    assert gestor.validar(despues) is not None
+    assert gestor.validar(ajeno) is not None
+
+
+def test_revocaciones_viejas_se_purgan():
+    gestor = GestorSesiones(secreto="s", ttl=0.05)
+    gestor.revocar_usuario(1)
+    time.sleep(0.06)
+    gestor.revocar_usuario(2)
+    assert gestor.estadisticas()["usuarios_revocados"] == 1
+
+
+def test_lru_con_tope():
+    gestor = GestorSesiones(secreto="s", max_sesiones=2)
+    tokens = [gestor.emitir(i) for i in range(3)]
+    assert gestor.estadisticas()["en_cache"] == 2
+    assert gestor.validar(tokens[0]) is not None  # fuera del LRU se valida igual por firma
+
+
+def test_iniciar_sesion(crear_base, hash_prueba, monkeypatch, gestor):
+    monkeypatch.setattr(sesiones, "_gestor", gestor)
+    pool = crear_pool(crear_base("sesiones"))
+    try:
+        with usar_conexion(pool) as (conn, backend):
+            insertar_lote(conn, backend, "Usuarios", [("U", "a@x.com", hash_prueba, datetime.now())])
+        resultado, token = iniciar_sesion("a@x.com", CONTRASEÑA, pool)
+        assert resultado.ok and gestor.validar(token).id_usuario == resultado.id_usuario
+        resultado, token = iniciar_sesion("a@x.com", "Mala12345", pool)
+        assert resultado.estado is EstadoAutenticacion.CONTRASEÑA_INCORRECTA and token is None
+    finally:
+        pool.cerrar()
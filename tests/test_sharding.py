@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from backends import DDL_USUARIOS_SQLITE, SQLiteBackend
+from conftest import CONTRASEÑA
+from conexion_sql import EstadoAutenticacion, autenticar, insertar_lote, usar_conexion
+from pool_conexiones import PoolConexiones
+from sharding import AnilloHash, Fragmentador
+
+EMAILS = [f"u{i}@x.com" for i in range(300)]
+
+
+@pytest.fixture
+def fragmentador(crear_base):
+    f = Fragmentador({nombre: crear_base(nombre) for nombre in "abc"})
+    yield f
+    f.cerrar()
+
+
+def sembrar(fragmentador, emails, hash_guardado, inicio=datetime(2024, 1, 1)):
+    """Inserta directamente en el fragmento dueño de cada email, sin pagar Argon2 por fila."""
+    por_fragmento = {}
+    for i, email in enumerate(emails):
+        fila = ("U", email, hash_guardado, inicio + timedelta(seconds=i))
+        por_fragmento.setdefault(fragmentador.fragmento_de(email), []).append(fila)
+    for nombre, filas in por_fragmento.items():
+        with usar_conexion(fragmentador.fragmentos[nombre]) as (conn, backend):
+            assert insertar_lote(conn, backend, "Usuarios", filas) == []
+
+
+def ubicaciones(fragmentador) -> dict:
+    """email -> fragmentos donde tiene fila."""
+    donde = {}
+    for nombre, fuente in fragmentador.fragmentos.items():
+        with usar_conexion(fuente) as (conn, _):
+            cursor = conn.cursor()
+            cursor.execute("SELECT email FROM Usuarios")
+            for (email,) in cursor.fetchall():
+                donde.setdefault(email, []).append(nombre)
+            cursor.close()
+    return donde
+
+
+def recorrer(fragmentador, orden, tamaño):
+    filas, token = [], None
+    while True:
+        pagina = fragmentador.paginar(orden=orden, tamaño=tamaño, token=token)
+        filas += pagina.filas
+        token = pagina.siguiente
+        if token is None:
+            return filas
+
+
+def test_anillo_reparte_parejo():
+    anillo = AnilloHash(["a", "b", "c", "d"])
+    reparto = Counter(anillo.nodo(f"u{i}@x.com") for i in range(40_000))
+    for nodo in "abcd":
+        assert 0.20 < reparto[nodo] / 40_000 < 0.30
+
+
+def test_anillo_estable_entre_instancias():
+    uno, otro = AnilloHash(["a", "b", "c"]), AnilloHash(["c", "b", "a"])
+    assert all(uno.nodo(e) == otro.nodo(e) for e in EMAILS)
+
+
+def test_agregar_nodo_mueve_un_enesimo_y_solo_hacia_el_nuevo():
+    antes = AnilloHash(["a", "b", "c", "d"])
+    despues = antes.con("e")
+    claves = [f"u{i}@x.com" for i in range(40_000)]
+    movidas = [c for c in claves if antes.nodo(c) != despues.nodo(c)]
+    assert 0.15 < len(movidas) / len(claves) < 0.25
+    assert all(despues.nodo(c) == "e" for c in movidas)
+
+
+def test_escritura_y_login_van_al_fragmento_del_email(fragmentador, hash_prueba):
+    sembrar(fragmentador, EMAILS[:30], hash_prueba)
+    donde = ubicaciones(fragmentador)
+    assert all(donde[e] == [fragmentador.fragmento_de(e)] for e in EMAILS[:30])
+    assert autenticar("U7@X.com", CONTRASEÑA, fragmentador).estado is EstadoAutenticacion.EXITO
+    assert autenticar("u7@x.com", "Mala12345", fragmentador).estado is EstadoAutenticacion.CONTRASEÑA_INCORRECTA
+    assert autenticar("nadie@x.com", CONTRASEÑA, fragmentador).estado is EstadoAutenticacion.USUARIO_DESCONOCIDO
+
+
+def test_conexion_sin_email_falla(fragmentador):
+    with pytest.raises(ValueError):
+        with usar_conexion(fragmentador):
+            pass
+
+
+@pytest.mark.parametrize("orden", ["email", "fecha"])
+def test_paginar_mezcla_los_fragmentos_en_orden(fragmentador, hash_prueba, orden):
+    sembrar(fragmentador, EMAILS, hash_prueba)
+    filas = recorrer(fragmentador, orden, tamaño=23)
+    emails = [fila[3] for fila in filas]
+    assert sorted(emails) == sorted(EMAILS)  # todos, una vez
+    clave = 3 if orden == "email" else 4
+    assert [fila[clave] for fila in filas] == sorted(fila[clave] for fila in filas)
+
+
+def _sin_guiones(a, b):
+    a, b = a.replace("-", ""), b.replace("-", "")
+    return (a > b) - (a < b)
+
+
+def _fragmento_con_collation(ruta):
+    """Fragmento cuyo email ordena ignorando guiones, como un CI_AS de SQL Server."""
+    backend = SQLiteBackend(str(ruta))
+
+    def fabrica():
+        conn = backend.conectar()
+        conn.create_collation("SIN_GUIONES", _sin_guiones)
+        return conn
+
+    conn = fabrica()
+    conn.execute(DDL_USUARIOS_SQLITE.replace("email VARCHAR(100) NOT NULL",
+                                             "email VARCHAR(100) NOT NULL COLLATE SIN_GUIONES"))
+    conn.close()
+    return PoolConexiones(fabrica, max_tamaño=2, backend=backend)
+
+
+def test_paginar_con_collation_distinta_de_python(tmp_path, hash_prueba):
+    emails = [f"u{i:03d}@x.com" if i % 2 else f"u{i // 10}-{i % 10}x@x.com" for i in range(200)]
+    assert sorted(emails) != sorted(emails, key=lambda e: e.replace("-", ""))
+    f = Fragmentador({nombre: _fragmento_con_collation(tmp_path / f"{nombre}.db") for nombre in "abc"})
+    try:
+        sembrar(f, emails, hash_prueba)
+        filas = recorrer(f, "email", tamaño=9)
+    finally:
+        f.cerrar()
+    assert sorted(fila[3] for fila in filas) == sorted(emails)  # no se salta ninguno
+
+
+def test_paginar_rechaza_token_de_otro_orden(fragmentador, hash_prueba):
+    sembrar(fragmentador, EMAILS[:50], hash_prueba)
+    token = fragmentador.paginar(orden="email", tamaño=10).siguiente
+    with pytest.raises(ValueError):
+        fragmentador.paginar(orden="fecha", token=token)
+
+
+def test_rebalanceo_con_escritor_concurrente(fragmentador, crear_base, hash_prueba):
+    sembrar(fragmentador, EMAILS, hash_prueba)
+    escritos, ultimo_nombre = [], [None]
+    parar = threading.Event()
+
+    def escritor():
+        i = 0
+        while not parar.is_set():
+            email = f"w{i}@x.com"
+            with usar_conexion(fragmentador, clave=email) as (conn, backend):
+                insertar_lote(conn, backend, "Usuarios", [("W", email, hash_prueba, datetime.now())])
+            escritos.append(email)
+            nombre = f"cambio{i}"
+            with usar_conexion(fragmentador, clave="u5@x.com") as (conn, _):
+                cursor = conn.cursor()
+                cursor.execute("UPDATE Usuarios SET nombre = ? WHERE email = ?", (nombre, "u5@x.com"))
+                conn.commit()
+                cursor.close()
+            ultimo_nombre[0] = nombre
+            i += 1
+
+    hilo = threading.Thread(target=escritor)
+    hilo.start()
+    try:
+        while len(escritos) < 5:
+            time.sleep(0.01)
+        movidos = fragmentador.agregar_fragmento("d", crear_base("d"), lote=20)
+        time.sleep(0.05)
+    finally:
+        parar.set()
+        hilo.join()
+
+    donde = ubicaciones(fragmentador)
+    assert set(donde) == set(EMAILS) | set(escritos)  # no falta nadie
+    assert all(len(v) == 1 for v in donde.values())  # ni está repetido
+    assert all(v[0] == fragmentador.fragmento_de(e) for e, v in donde.items())  # y cada uno en su dueño
+    en_d = sum(v == ["d"] for v in donde.values())
+    assert movidos >= en_d - len(escritos) and 0.15 < en_d / len(donde) < 0.40
+
+    with usar_conexion(fragmentador, solo_lectura=True, clave="u5@x.com") as (conn, _):
+        cursor = conn.cursor()
+        cursor.execute("SELECT nombre FROM Usuarios WHERE email = ?", ("u5@x.com",))
+        assert cursor.fetchone()[0] == ultimo_nombre[0]  # la escritura concurrente no se perdió
+        cursor.close()
+    assert fragmentador.estadisticas(ttl=0).filas == len(donde)
+    assert fragmentador.estadisticas().filas == len(donde)  # el rebalanceo invalida la caché
+    assert autenticar("u5@x.com", CONTRASEÑA, fragmentador).estado is EstadoAutenticacion.EXITO